@@ -0,0 +1,22 @@
+"""index social_accounts.token_expires_at
+
+Revision ID: e4f7a9c2b1d3
+Revises: d8ce15859554
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'e4f7a9c2b1d3'
+down_revision = 'd8ce15859554'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_social_accounts_token_expires_at', 'social_accounts', ['token_expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_social_accounts_token_expires_at', table_name='social_accounts')
@@ -4,7 +4,9 @@ from ...auth.services.auth_services import get_current_user
 from ...user.models.user import User
 from ..services.agent_service import agent_llm
 from ..services.knowledge_service import search_user_knowledge
+from ..services.embedding_service import embed
 from ..services.memory_service import search_agent_memory
+from ..services import semantic_cache
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from pydantic import BaseModel
 from typing import List, Optional
@@ -33,7 +35,6 @@ async def ai_chat_conversation(
 
     state = {
         "messages": [HumanMessage(content=req.message)],
-        "summary": "",
         "user_id": current_user.id,
         "niche": current_user.niche,
         "route": "",
@@ -81,6 +82,8 @@ class GenerateRequest(BaseModel):
     topic: str
     platforms: List[str] = ["facebook", "instagram"]
     tone: str = "professional"
+    # Skip the semantic cache (e.g. "regenerate" in the dashboard)
+    fresh: bool = False
 
 class SocialSuggestion(BaseModel):
     caption: str
@@ -89,6 +92,8 @@ class SocialSuggestion(BaseModel):
 
 class GenerateResponse(BaseModel):
     suggestions: List[SocialSuggestion]
+    # {"hit", "similarity", "hits", "misses", "hit_rate"} for this user
+    cache: Optional[dict] = None
 
 @ai_router.post("/generate", response_model=GenerateResponse)
 async def generate_ai_content(
@@ -97,11 +102,31 @@ async def generate_ai_content(
 ):
     """Generate high-quality social media content using the AI agent with RAG context."""
     niche = current_user.niche or "General"
-    
+
+    # 0. Semantic cache: near-identical topic, same platforms/tone/niche
+    cached = None
+    try:
+        topic_vector = await embed(req.topic)
+        cached = await semantic_cache.lookup(
+            current_user.id, topic_vector, req.platforms, req.tone, niche, bypass=req.fresh
+        )
+    except Exception as e:
+        print(f"Semantic cache lookup failed: {e}")
+        topic_vector = None
+
+    if cached and cached.hit:
+        return GenerateResponse(
+            suggestions=[SocialSuggestion(**s) for s in cached.suggestions],
+            cache={"hit": True, "similarity": round(cached.similarity, 4),
+                   **await semantic_cache.hit_rate(current_user.id)},
+        )
+
     # 1. Fetch RAG Context (Knowledge Base + Past Memory)
     try:
-        knowledge = await search_user_knowledge(user_id=current_user.id, query=req.topic)
-        memories = await search_agent_memory(user_id=current_user.id, agent_kind="content", query=req.topic)
+        knowledge = await search_user_knowledge(user_id=current_user.id, query=req.topic, vector=topic_vector)
+        memories = await search_agent_memory(
+            user_id=current_user.id, agent_kind="content", query=req.topic, vector=topic_vector
+        )
     except Exception as e:
         print(f"RAG Retrieval failed: {e}")
         knowledge, memories = [], []
@@ -138,10 +163,19 @@ async def generate_ai_content(
             HumanMessage(content=f"Topic: {req.topic}")
         ])
 
-        return GenerateResponse(suggestions=[
+        suggestions = [
             SocialSuggestion(caption=s.caption, hashtags=s.hashtags, platform=s.platform)
             for s in result.results
-        ])
-
+        ]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI Generation failed: {str(e)}")
+
+    cache_info = None
+    if cached:
+        await semantic_cache.store(
+            current_user.id, cached, req.topic, req.platforms, req.tone, niche,
+            [s.model_dump() for s in suggestions],
+        )
+        cache_info = {"hit": False, "similarity": round(cached.similarity, 4),
+                      **await semantic_cache.hit_rate(current_user.id)}
+    return GenerateResponse(suggestions=suggestions, cache=cache_info)
@@ -10,7 +10,7 @@ from ...auth.services.auth_services import get_current_user
 from ...core.database import get_db
 from ..models.post import Post
 from ...user.models.user import User
-from ..services.agent_service import mcp_client
+from ..services.tool_dispatch import invoke_tool
 from ..tasks import publish_scheduled_post_task
 
 post_router = APIRouter(tags=["posts"])
@@ -92,32 +92,13 @@ async def create_instant_post(
             
             start_time = datetime.now()
             try:
-                # Direct tool invocation pattern for langchain-mcp-adapters 0.2+
-                tools = await mcp_client.get_tools()
-                target_tool = next((t for t in tools if t.name == tool_name), None)
-                
-                if not target_tool:
-                    return {"platform": plat, "result": {"success": False, "error": f"Tool {tool_name} not found"}, "latency": 0}
-
-                # Concurrent tool call
-                tool_result = await target_tool.ainvoke({
+                # In-process call for our own tools (native dict, no MCP re-parsing)
+                tool_result = await invoke_tool(tool_name, {
                     "user_id": current_user.id,
                     "image_url": media_url,
                     "caption": content
                 })
 
-                import json
-                # Robust parsing for list returns from MCP adapter
-                if isinstance(tool_result, list):
-                    text_content = next((c.text for c in tool_result if hasattr(c, "text")), None)
-                    if not text_content:
-                        text_content = next((str(c) for c in tool_result), None)
-                    
-                    try:
-                        tool_result = json.loads(text_content) if text_content else {"success": False, "error": "Empty list response"}
-                    except:
-                        tool_result = {"success": True, "raw": text_content}
-
                 latency = (datetime.now() - start_time).total_seconds() * 1000
                 return {"platform": plat, "result": tool_result, "latency": latency}
             except Exception as e:
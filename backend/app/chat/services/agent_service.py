@@ -8,6 +8,7 @@ from __future__ import annotations
 import asyncio
 import sys
 import json
+import time
 from typing import TypedDict, Annotated, Optional, List
 from contextlib import asynccontextmanager, AsyncExitStack
 
@@ -19,9 +20,17 @@ from langchain_openai import ChatOpenAI
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.graph import StateGraph, START, END, add_messages
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from prometheus_client import Counter, Histogram
 
 from ...core.config import settings
+from ...core.waha_client import waha_client
+from ...mcp.graph_http import close_graph_client
 from .memory_service import store_agent_memory
+from .agent_prompt import PROMPT_VERSION, build_prompt
+from .history_compactor import compact_node
+from .mcp_pool import McpSessionPool
+from .tool_dispatch import LocalToolSource, ToolNotFoundError, call_tool
+from .tool_registry import ToolRegistry
 from psycopg_pool import AsyncConnectionPool
 
 # Maintain ChatState name for compatibility with existing routers
@@ -30,7 +39,7 @@ class ChatState(TypedDict):
     user_id: int
     niche: Optional[str]
     ai_tone: Optional[str]
-    summary: Optional[str]  # Kept for compatibility
+    summary: Optional[str]  # Rolling summary of turns compacted out of `messages`
 
 # LLM Setup
 agent_llm = ChatOpenAI(model="gpt-5", temperature=0.7)
@@ -52,80 +61,53 @@ mcp_client = MultiServerMCPClient({
     },
 })
 
+# Warm server sessions, so tool calls don't spawn `app.mcp.server` each time.
+# Not needed when tools run in-process: schemas are listed in-process as well.
+mcp_pool = (
+    McpSessionPool(mcp_client, "social_media")
+    if settings.MCP_POOL_SIZE > 0 and not settings.MCP_INPROCESS_TOOLS
+    else None
+)
+
+# Tools are listed once per process, not on every graph step
+tool_registry = ToolRegistry(
+    LocalToolSource() if settings.MCP_INPROCESS_TOOLS else (mcp_pool or mcp_client)
+)
+
 async def get_tools():
-    try:
-        return await mcp_client.get_tools()
-    except Exception as e:
-        print(f"⚠️ MCP Tool Loading Failed: {e}")
-        return []
+    return await tool_registry.get_tools()
 
 # ── Agent Logic ─────────────────────────────────────────────────────────────
 
+agent_llm_seconds = Histogram(
+    "agent_llm_seconds", "Agent LLM call latency",
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+agent_llm_input_tokens_total = Counter(
+    "agent_llm_input_tokens_total", "Agent LLM input tokens by provider prompt-cache status", ["cache"]
+)
+
+
+def _record_usage(response: AIMessage):
+    usage = getattr(response, "usage_metadata", None) or {}
+    total = usage.get("input_tokens") or 0
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    agent_llm_input_tokens_total.labels(cache="hit").inc(cached)
+    agent_llm_input_tokens_total.labels(cache="miss").inc(max(0, total - cached))
+
+
 async def agent_node(state: ChatState) -> dict:
     """The brain of the agent. Processes history and decides next steps."""
-    
-    tools = await get_tools()
-    
-    system_prompt = f"""
-You are the **EasyPost Social Media Commander** - an AI agent with DIRECT authority to post content to Facebook and Instagram.
-
-## 🎯 YOUR CAPABILITIES
-You have access to these tools:
-1. **post_image_to_facebook** - Post images to Facebook Pages
-2. **post_image_to_instagram** - Post images to Instagram Business accounts  
-3. **post_text_to_facebook** - Post text-only updates to Facebook
-4. **post_image_to_all_platforms** - Post simultaneously to Facebook AND Instagram
-5. **analyze_image** - Generate hashtags and content suggestions from images
-6. **get_user_stats** - Retrieve user account information
-This is the user_id : {user_id}
-## 📋 MEDIA HANDLING RULES
-- **ALWAYS use the S3 Mirrored URL** when posting images (never use localhost URLs)
-- If no S3 URL is provided, ask the user to upload the image again
-- For WhatsApp images, the S3 URL will be in the message (look for "S3 Mirrored URL")
-- Validate that URLs are public (start with https:// and not localhost)
-## SCHEDULE POSTS
-- if user ask to schedule a post, ask for the date and time and then call the schedule_post tool
-- The tool is using celery inorder to schedule posts.
-- Just ask for the date and time and that's it.Time Zone will be automatically managed by celery.
-## 🔧 RESPONSE GUIDELINES
-- If asked to post, CALL THE TOOLS IMMEDIATELY - never claim you lack capability
-- Use the user's Niche ({state.get('niche', 'General')}) and Tone ({state.get('ai_tone', 'Professional')}) for all content
-- Generate engaging captions that match the user's brand voice
-- Suggest relevant hashtags (5-10) based on the image content and niche
-- Be precise, professional, and action-oriented
-- Before final action always ask the user for confirmation.
-## ✅ POSTING WORKFLOW
-1. **Receive media** → Check if S3 URL is provided
-2. **Generate content** → Create caption with user's tone and niche
-3. **Add hashtags** → Research and include relevant hashtags
-4. **Confirm** → always ask the user for confirmation.
-5. **Execute post** → Call the appropriate tool
-6. **Confirm success** → Share the post URL with the user
-
-## ⚠️ ERROR HANDLING
-- If posting fails, explain the error clearly and suggest solutions
-- If media URL is invalid, ask user to provide a public URL
-- If user needs help, guide them through the process step-by-step
-
-## 📊 PLATFORM SPECIFICS
-- **Instagram**: Must have image, max 2200 characters, use relevant hashtags
-- **Facebook**: Can be text-only or with image, longer posts allowed
-- **Both**: Always include a call-to-action when appropriate
-
-## 🎨 CONTENT STYLE
-- Niche: {state.get('niche', 'General')}
-- Tone: {state.get('ai_tone', 'Professional')}
-- Always maintain brand consistency across platforms
-
-Remember: You are the commander. Take decisive action. Make the posts happen.
-"""
-    
-    # We pass the ENTIRE message history so the agent remembers what it just did
-    messages = [SystemMessage(content=system_prompt)] + state["messages"]
-    
-    llm_with_tools = agent_llm.bind_tools(tools)
-    response = await llm_with_tools.ainvoke(messages)
-    
+    # Static instructions first so they form a cacheable prefix (see agent_prompt);
+    # the recent window of the thread follows, older turns live in the summary
+    messages = build_prompt(state) + state["messages"]
+
+    llm_with_tools = await tool_registry.bind(agent_llm)
+    started = time.perf_counter()
+    response = await llm_with_tools.ainvoke(messages, prompt_cache_key=PROMPT_VERSION)
+    agent_llm_seconds.observe(time.perf_counter() - started)
+    _record_usage(response)
+
     return {"messages": [response]}
 
 async def tool_node(state: ChatState) -> dict:
@@ -134,26 +116,23 @@ async def tool_node(state: ChatState) -> dict:
     if not hasattr(last_message, 'tool_calls') or not last_message.tool_calls:
         return {"messages": []}
     
-    tools = await get_tools()
-    tools_by_name = {t.name: t for t in tools}
-    
     results = []
     for tool_call in last_message.tool_calls:
         t_name = tool_call["name"]
         t_args = tool_call["args"]
         print(f"🛠️  Executing Tool: {t_name}")
         
-        if t_name in tools_by_name:
-            try:
-                res = await tools_by_name[t_name].ainvoke(t_args)
-                results.append(ToolMessage(
-                    tool_call_id=tool_call["id"],
-                    content=json.dumps(res) if isinstance(res, dict) else str(res)
-                ))
-            except Exception as e:
-                results.append(ToolMessage(tool_call_id=tool_call["id"], content=f"Error: {e}"))
-        else:
+        try:
+            # In-process for our own tools, MCP for anything else
+            res = await call_tool(t_name, t_args)
+            results.append(ToolMessage(
+                tool_call_id=tool_call["id"],
+                content=json.dumps(res, default=str) if isinstance(res, (dict, list)) else str(res)
+            ))
+        except ToolNotFoundError:
             results.append(ToolMessage(tool_call_id=tool_call["id"], content=f"Tool {t_name} not found"))
+        except Exception as e:
+            results.append(ToolMessage(tool_call_id=tool_call["id"], content=f"Error: {e}"))
             
     return {"messages": results}
 
@@ -167,39 +146,85 @@ def should_continue(state: ChatState):
 
 async def build_agent_graph():
     builder = StateGraph(ChatState)
+    builder.add_node("compact", compact_node)
     builder.add_node("agent", agent_node)
     builder.add_node("tools", tool_node)
     
-    builder.add_edge(START, "agent")
+    builder.add_edge(START, "compact")
+    builder.add_edge("compact", "agent")
     builder.add_conditional_edges("agent", should_continue, {"tools": "tools", END: END})
     builder.add_edge("tools", "agent")
     
     return builder
 
+async def open_agent_graph(exit_stack: AsyncExitStack, max_pool_size: int = 20):
+    """
+    Compile the agent graph with a Postgres checkpointer whose connection pool
+    is owned by `exit_stack`. Shared by the API lifespan and Celery workers.
+    """
+    # 1. Create a persistent connection pool
+    pool = await exit_stack.enter_async_context(
+        AsyncConnectionPool(
+            psycopg_conn_string,
+            max_size=max_pool_size,
+            min_size=1,
+            max_idle=300,
+            check=AsyncConnectionPool.check_connection,
+            kwargs={"sslmode": "require"} if "sslmode=require" in psycopg_conn_string else {}
+        )
+    )
+
+    # 2. Initialize the checkpointer using the pool
+    # We don't 'enter' this as a context manager because the pool is already managed above
+    checkpointer = AsyncPostgresSaver(pool)
+    await checkpointer.setup()
+
+    graph_builder = await build_agent_graph()
+    return graph_builder.compile(checkpointer=checkpointer)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("⏳ Initializing Simple Agent with Postgres Connection Pool...")
     exit_stack = AsyncExitStack()
     try:
-        # 1. Create a persistent connection pool
-        pool = await exit_stack.enter_async_context(
-            AsyncConnectionPool(
-                psycopg_conn_string,
-                max_size=20,
-                min_size=1,
-                max_idle=300,
-                check=AsyncConnectionPool.check_connection,
-                kwargs={"sslmode": "require"} if "sslmode=require" in psycopg_conn_string else {}
-            )
-        )
-        
-        # 2. Initialize the checkpointer using the pool
-        # We don't 'enter' this as a context manager because the pool is already managed above
-        checkpointer = AsyncPostgresSaver(pool)
-        await checkpointer.setup()
-        
-        graph_builder = await build_agent_graph()
-        app.state.graph = graph_builder.compile(checkpointer=checkpointer)
+        # 1-2. Postgres pool + checkpointer + compiled graph
+        app.state.graph = await open_agent_graph(exit_stack)
+
+        # 3. Shared keep-alive pool for all WAHA traffic
+        await waha_client.start()
+        exit_stack.push_async_callback(waha_client.aclose)
+        exit_stack.push_async_callback(close_graph_client)
+
+        # Warm MCP sessions + list tools once up front so the first turn doesn't pay for it
+        if mcp_pool:
+            await mcp_pool.start()
+            exit_stack.push_async_callback(mcp_pool.aclose)
+        await tool_registry.reload()
+
+        # 4. WhatsApp turns: serialized per thread, bounded globally.
+        # In "celery" mode the scheduler only hands turns to the agent workers.
+        from .agent_turn import enqueue_agent_turn, run_agent_turn
+        from .turn_scheduler import TurnScheduler
+
+        if settings.WHATSAPP_AGENT_EXECUTION == "celery":
+            app.state.turn_scheduler = TurnScheduler(enqueue_agent_turn)
+        else:
+            app.state.turn_scheduler = TurnScheduler(lambda turn: run_agent_turn(app.state.graph, turn))
+        exit_stack.push_async_callback(app.state.turn_scheduler.aclose)
+
+        # 5. Start WAHA queue consumers when webhooks are ingested asynchronously
+        if settings.WAHA_INGEST_MODE == "queue":
+            from app.core.database import AsyncSessionLocal
+            from .waha_queue import WahaQueueConsumer
+            from .whatsapp_handler import handle_waha_event
+
+            async def _handle_queued(data: dict) -> dict:
+                async with AsyncSessionLocal() as db:
+                    return await handle_waha_event(app.state.turn_scheduler, data, db, retryable=True)
+
+            consumer = WahaQueueConsumer(_handle_queued)
+            await consumer.start()
+            exit_stack.push_async_callback(consumer.stop)
         
         print("✅ Simple Agent Online & Pool Ready.")
         yield
@@ -0,0 +1,179 @@
+# app/chat/services/agent_turn.py
+"""
+A single WhatsApp agent turn: stream the graph for one thread and send the
+reply back through WAHA.
+
+The sender sees the WAHA "typing" presence immediately, a short "working on
+it" note if the turn is slow, and one line per tool round while the agent
+works, instead of silence until the whole tool loop has finished.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Optional
+
+from langchain_core.messages import HumanMessage, AIMessage
+
+from app.chat.services.waha_queue import RETRYABLE_ERRORS
+from app.chat.services.whatsapp_formatter import md_to_wa, tool_progress, typing_indicator
+from app.chat.services.whatsapp_service import send_text, start_typing, stop_typing
+from app.core.celery_app import celery_app
+from app.core.config import settings
+
+
+@dataclass
+class AgentTurn:
+    user_id: int
+    thread_id: str
+    chat_id: str
+    content: str
+    niche: Optional[str] = None
+    ai_tone: Optional[str] = None
+    default_reply: str = "Protocol Executed."
+    error_reply: str = "⚠️ AI Agent encountered a processing error. Please try again in a moment."
+    # Raise transient errors that hit before the agent did anything, so the
+    # WAHA queue can deliver the message again (instead of error_reply)
+    retryable: bool = False
+
+
+def _interrupt_message(result: dict) -> str:
+    interrupt_data = result["__interrupt__"][0]
+    # Handle both object and dict types for LangGraph versions
+    if hasattr(interrupt_data, "value"):
+        interrupt_val = interrupt_data.value
+    else:
+        interrupt_val = interrupt_data.get("value", {})
+    return interrupt_val.get("message", "Waiting for approval.")
+
+
+class TurnProgress:
+    """Typing presence and throttled progress messages for one running turn."""
+
+    # WhatsApp drops the typing indicator after ~25s without a refresh
+    TYPING_REFRESH_SECONDS = 20
+
+    def __init__(self, chat_id: str):
+        self.chat_id = chat_id
+        self.enabled = settings.WHATSAPP_PROGRESS_MESSAGES
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+        self._last_sent = 0.0
+        self._announced: set[str] = set()
+
+    async def start(self):
+        await start_typing(self.chat_id)
+        self._task = asyncio.create_task(self._keepalive())
+
+    async def _keepalive(self):
+        delay = settings.WHATSAPP_PROGRESS_DELAY_SECONDS
+        if self.enabled and delay < self.TYPING_REFRESH_SECONDS:
+            await asyncio.sleep(delay)
+            if not self._last_sent:
+                await self._send(typing_indicator())
+            await start_typing(self.chat_id)
+        while True:
+            await asyncio.sleep(self.TYPING_REFRESH_SECONDS)
+            await start_typing(self.chat_id)
+
+    async def tools(self, tool_names: list[str]):
+        """Announce a tool round (each tool once per turn, rate limited)."""
+        fresh = [n for n in tool_names if n not in self._announced]
+        if not self.enabled or not fresh:
+            return
+        if time.monotonic() - self._last_sent < settings.WHATSAPP_PROGRESS_MIN_INTERVAL_SECONDS:
+            return
+        self._announced.update(fresh)
+        await self._send(tool_progress(fresh))
+        # Sending a message clears the indicator on the user's side
+        await start_typing(self.chat_id)
+
+    async def _send(self, text: str):
+        self._last_sent = time.monotonic()
+        await send_text(self.chat_id, text)
+
+    async def stop(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await stop_typing(self.chat_id)
+
+
+async def run_agent_turn(graph, turn: AgentTurn) -> dict:
+    """Run the agent for one (possibly coalesced) turn and reply to the sender."""
+    config = {"configurable": {"thread_id": turn.thread_id}}
+    progress = TurnProgress(turn.chat_id)
+    await progress.start()
+    try:
+        last_ai = None
+        async for update in graph.astream(
+            {
+                "messages": [HumanMessage(content=turn.content)],
+                "user_id": turn.user_id,
+                "niche": turn.niche,
+                "ai_tone": turn.ai_tone,
+            },
+            config=config,
+            stream_mode="updates",
+        ):
+            if "__interrupt__" in update:
+                await progress.stop()
+                await send_text(turn.chat_id, _interrupt_message(update))
+                return {"status": "awaiting_approval"}
+
+            for delta in update.values():
+                if not isinstance(delta, dict):
+                    continue
+                for message in delta.get("messages") or []:
+                    if not isinstance(message, AIMessage):
+                        continue
+                    last_ai = message
+                    if message.tool_calls:
+                        await progress.tools([c["name"] for c in message.tool_calls])
+
+        await progress.stop()
+        reply = md_to_wa(last_ai.content) if last_ai and last_ai.content else turn.default_reply
+        await send_text(turn.chat_id, reply)
+        return {"status": "ok"}
+    except Exception as e:
+        if turn.retryable and last_ai is None and isinstance(e, RETRYABLE_ERRORS):
+            # No model output yet, so no tool ran and nothing was sent
+            print(f"⚠️ WAHA Agent transient error ({turn.thread_id}), retrying later: {e}")
+            await progress.stop()
+            raise
+        print(f"❌ WAHA Agent Error ({turn.thread_id}): {type(e).__name__}: {e}")
+        traceback.print_exc()
+        await progress.stop()
+        await send_text(turn.chat_id, turn.error_reply)
+        return {"status": "agent_error"}
+    finally:
+        await progress.stop()
+
+
+def _send_turn_task(thread_id: str):
+    return celery_app.send_task("run_agent_turn", args=[thread_id], queue=settings.AGENT_TASK_QUEUE)
+
+
+async def enqueue_agent_turn(turn: AgentTurn) -> dict:
+    """
+    Hand a turn to the Celery agent workers (WHATSAPP_AGENT_EXECUTION=celery).
+
+    The turn goes into the thread's mailbox (turn_mailbox); a task is only
+    sent when no worker is already draining that thread, so turns of one
+    conversation run in order and arrive coalesced. The worker runs the graph
+    and replies to the sender itself.
+    """
+    from app.chat.services import turn_mailbox
+
+    if not await turn_mailbox.push(turn):
+        print(f"📥 Agent turn for {turn.thread_id} added to the running thread")
+        return {"status": "queued"}
+    # Broker publish is blocking; keep it off the event loop
+    result = await asyncio.to_thread(_send_turn_task, turn.thread_id)
+    print(f"📤 Agent turn for {turn.thread_id} queued as task {result.id}")
+    return {"status": "queued", "task_id": result.id}
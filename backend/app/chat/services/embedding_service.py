@@ -0,0 +1,123 @@
+# app/chat/services/embedding_service.py
+#
+# Cached, batched text embeddings.
+#
+# Every embedding is cached in Redis under emb:{model}:{sha256(text)} as raw
+# float32 bytes, so re-indexing the same document, repeating a search query or
+# embedding a topic that /generate already embedded costs no API call.
+# embed_many() de-duplicates its inputs, serves what it can from the cache
+# and sends the rest to OpenAI EMBED_BATCH_SIZE inputs per request, with at
+# most EMBED_CONCURRENCY requests in flight.
+#
+# The OpenAI client is injectable: EmbeddingService(client=FakeClient()).
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+from openai import AsyncOpenAI
+from prometheus_client import Counter, Histogram
+
+from app.core.config import settings
+from app.core.redis_client import redis_binary_client
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+embedding_cache_total = Counter("embedding_cache_total", "Embedding cache lookups", ["result"])
+embedding_request_seconds = Histogram(
+    "embedding_request_seconds", "OpenAI embeddings request latency",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+
+class EmbeddingService:
+    def __init__(self, client=None, model: str = EMBEDDING_MODEL, redis=redis_binary_client,
+                 batch_size: int = settings.EMBED_BATCH_SIZE,
+                 concurrency: int = settings.EMBED_CONCURRENCY,
+                 ttl: int = settings.EMBED_CACHE_TTL_SECONDS):
+        self._client = client
+        self.model = model
+        self._redis = redis
+        self._batch_size = max(1, batch_size)
+        self._concurrency = max(1, concurrency)
+        self._ttl = ttl
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        return self._client
+
+    def _key(self, text: str) -> str:
+        return f"emb:{self.model}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+    async def _cached(self, keys: List[str]) -> List[Optional[bytes]]:
+        try:
+            return await self._redis.mget(keys)
+        except Exception as e:
+            print(f"Redis Embedding Cache Error: {e}")
+            return [None] * len(keys)
+
+    async def _remember(self, items: dict[str, List[float]]):
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key, vector in items.items():
+                    pipe.set(key, np.asarray(vector, dtype=np.float32).tobytes(), ex=self._ttl)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Redis Embedding Cache Set Error: {e}")
+
+    async def _request(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        try:
+            resp = await self.client.embeddings.create(model=self.model, input=texts)
+        finally:
+            embedding_request_seconds.observe(time.perf_counter() - started)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    async def embed_many(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embeddings for `texts`, in order."""
+        unique = list(dict.fromkeys(texts))
+        if not unique:
+            return []
+        keys = [self._key(t) for t in unique]
+        found: dict[str, List[float]] = {}
+        for text, raw in zip(unique, await self._cached(keys)):
+            if raw:
+                found[text] = np.frombuffer(raw, dtype=np.float32).tolist()
+        missing = [t for t in unique if t not in found]
+        embedding_cache_total.labels(result="hit").inc(len(found))
+        embedding_cache_total.labels(result="miss").inc(len(missing))
+
+        if missing:
+            semaphore = asyncio.Semaphore(self._concurrency)
+            batches = [missing[i:i + self._batch_size] for i in range(0, len(missing), self._batch_size)]
+
+            async def _run(batch: List[str]) -> List[List[float]]:
+                async with semaphore:
+                    return await self._request(batch)
+
+            results = await asyncio.gather(*(_run(b) for b in batches))
+            fresh = {t: v for batch, vectors in zip(batches, results) for t, v in zip(batch, vectors)}
+            await self._remember({self._key(t): v for t, v in fresh.items()})
+            found.update(fresh)
+
+        return [found[t] for t in texts]
+
+    async def embed(self, text: str) -> List[float]:
+        return (await self.embed_many([text]))[0]
+
+
+embedding_service = EmbeddingService()
+
+
+async def embed(text: str) -> List[float]:
+    return await embedding_service.embed(text)
+
+
+async def embed_many(texts: Sequence[str]) -> List[List[float]]:
+    return await embedding_service.embed_many(texts)
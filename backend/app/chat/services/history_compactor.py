@@ -0,0 +1,161 @@
+# app/chat/services/history_compactor.py
+"""
+History compaction for the checkpointed agent.
+
+WhatsApp threads are keyed on the sender forever, so without compaction every
+LLM call would carry the whole thread. `compact_node` runs at the start of
+each turn and:
+  - shortens ToolMessage payloads from earlier turns (the agent already
+    acted on them; a preview keeps ids/links around),
+  - once the history exceeds AGENT_HISTORY_TOKEN_BUDGET, folds the oldest
+    turns into the rolling `summary` and removes them from the checkpoint,
+    keeping roughly AGENT_HISTORY_KEEP_TOKENS of recent turns.
+
+The kept window always starts at a HumanMessage, so tool calls and their
+results are never split.
+"""
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+from langchain_core.messages import (
+    AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_openai import ChatOpenAI
+from prometheus_client import Counter, Histogram
+
+from ...core.config import settings
+
+summary_llm = ChatOpenAI(model=settings.AGENT_SUMMARY_MODEL, temperature=0)
+
+history_compactions_total = Counter(
+    "agent_history_compactions_total", "Agent history compactions", ["result"]
+)
+history_tokens = Histogram(
+    "agent_history_tokens",
+    "Approximate history tokens sent to the agent after compaction",
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000),
+)
+summary_seconds = Histogram(
+    "agent_history_summary_seconds", "Latency of history summarization calls",
+    buckets=(0.5, 1, 2, 5, 10, 20, 60),
+)
+
+SUMMARY_PROMPT = """You maintain the running memory of a chat between a social media \
+assistant and a user. Merge the earlier summary with the new conversation excerpt into \
+one concise summary (max ~250 words). Keep facts that matter later: the user's goals and \
+preferences, drafted or approved captions, posts published or scheduled (with ids/links), \
+pending questions and decisions. Drop greetings and tool chatter."""
+
+
+def _text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(
+        part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+    )
+
+
+def _render(messages: list[BaseMessage]) -> str:
+    lines = []
+    for m in messages:
+        if isinstance(m, HumanMessage):
+            lines.append(f"User: {_text(m)}")
+        elif isinstance(m, AIMessage):
+            if _text(m):
+                lines.append(f"Assistant: {_text(m)}")
+            for call in m.tool_calls:
+                lines.append(f"Assistant called {call['name']}({call['args']})")
+        elif isinstance(m, ToolMessage):
+            lines.append(f"Tool result: {_text(m)[:300]}")
+    return "\n".join(lines)
+
+
+def _last_human_index(messages: list[BaseMessage]) -> int:
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return i
+    return 0
+
+
+def _window_start(messages: list[BaseMessage], keep_tokens: int) -> int:
+    """Index of the first kept message: a turn boundary within `keep_tokens` of the end."""
+    last_turn = _last_human_index(messages)
+    start = last_turn
+    used = count_tokens_approximately(messages[last_turn:])
+    for i in range(last_turn - 1, -1, -1):
+        used += count_tokens_approximately([messages[i]])
+        if used > keep_tokens:
+            break
+        if isinstance(messages[i], HumanMessage):
+            start = i
+    return start
+
+
+TRUNCATION_MARKER = " …[truncated]"
+
+
+def _elide_tool_results(messages: list[BaseMessage], max_chars: int) -> list[BaseMessage]:
+    """Shortened copies (same ids, so they replace the originals) of stale tool results."""
+    keep = max(0, max_chars - len(TRUNCATION_MARKER))
+    updates = []
+    for m in messages:
+        if (
+            isinstance(m, ToolMessage)
+            and isinstance(m.content, str)
+            and len(m.content) > max_chars
+            and not m.content.endswith(TRUNCATION_MARKER)
+        ):
+            updates.append(m.model_copy(update={"content": m.content[:keep] + TRUNCATION_MARKER}))
+    return updates
+
+
+async def summarize(previous: Optional[str], messages: list[BaseMessage]) -> str:
+    excerpt = _render(messages)
+    started = time.perf_counter()
+    try:
+        response = await summary_llm.ainvoke([
+            SystemMessage(content=SUMMARY_PROMPT),
+            HumanMessage(content=f"Earlier summary:\n{previous or '(none)'}\n\nNew excerpt:\n{excerpt}"),
+        ])
+    finally:
+        summary_seconds.observe(time.perf_counter() - started)
+    return _text(response).strip()
+
+
+async def compact_node(state: dict) -> dict:
+    """Graph node: trim and summarize history before the agent sees it."""
+    messages: list[BaseMessage] = state.get("messages") or []
+    last_turn = _last_human_index(messages)
+    updates: dict = {}
+
+    # Tool payloads of finished turns
+    replaced = _elide_tool_results(messages[:last_turn], settings.AGENT_TOOL_RESULT_MAX_CHARS)
+    if replaced:
+        by_id = {m.id: m for m in replaced}
+        messages = [by_id.get(m.id, m) for m in messages]
+        updates["messages"] = replaced
+
+    if count_tokens_approximately(messages) > settings.AGENT_HISTORY_TOKEN_BUDGET:
+        start = _window_start(messages, settings.AGENT_HISTORY_KEEP_TOKENS)
+        if start > 0:
+            try:
+                summary = await summarize(state.get("summary"), messages[:start])
+            except Exception as e:
+                # Keep the history rather than lose it; retried next turn
+                print(f"⚠️ History summarization failed: {e}")
+                history_compactions_total.labels(result="error").inc()
+            else:
+                dropped = {m.id for m in messages[:start]}
+                updates["messages"] = [
+                    m for m in updates.get("messages", []) if m.id not in dropped
+                ] + [RemoveMessage(id=m_id) for m_id in dropped]
+                updates["summary"] = summary
+                messages = messages[start:]
+                history_compactions_total.labels(result="ok").inc()
+
+    history_tokens.observe(count_tokens_approximately(messages))
+    return updates
@@ -6,63 +6,115 @@
 import uuid
 import json
 import hashlib
-from typing import List
+from typing import List, Optional
 from sqlalchemy import text
-from redis import asyncio as aioredis
-from app.core.config import settings
 from app.core.database import engine
-from .memory_service import _embed  # Reuse the embedding helper
-
-# Global Redis Pool
-redis_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+from app.core.redis_client import redis_client
+from .embedding_service import embed, embed_many
+from .semantic_cache import invalidate_generation_cache
 
 async def _get_cache_key(user_id: int, query: str) -> str:
     """Generate a stable cache key for a specific query."""
     query_hash = hashlib.md5(query.strip().lower().encode()).hexdigest()
     return f"rag_cache:{user_id}:{query_hash}"
 
+_INSERT_KNOWLEDGE = text("""
+    INSERT INTO ai_agent_memory (id, user_id, agent_kind, content, embedding)
+    VALUES (:id, :user_id, :agent_kind, :content, CAST(:embedding AS vector))
+""")
+
+_COPY_COLUMNS = ["id", "user_id", "agent_kind", "content", "embedding"]
+
+
+async def _copy_rows(conn, rows: List[tuple]) -> bool:
+    """
+    Binary COPY through the underlying asyncpg connection (the vector codec is
+    registered on connect, see app.core.database). False if the driver can't COPY.
+    """
+    raw = (await conn.get_raw_connection()).driver_connection
+    if not hasattr(raw, "copy_records_to_table"):
+        return False
+    await raw.copy_records_to_table("ai_agent_memory", records=rows, columns=_COPY_COLUMNS)
+    return True
+
+
+async def _invalidate_knowledge_caches(user_id: int) -> None:
+    # Invalidate all RAG cache for this user
+    try:
+        keys = [key async for key in redis_client.scan_iter(f"rag_cache:{user_id}:*")]
+        if keys:
+            await redis_client.delete(*keys)
+    except Exception as re:
+        print(f"Redis Cache Invalidation Warning (non-fatal): {re}")
+    # Cached generations were built from the old knowledge
+    await invalidate_generation_cache(user_id)
+
+
+async def store_user_knowledge_bulk(
+    user_id: int,
+    category: str,
+    contents: List[str],
+    vectors: Optional[List[List[float]]] = None,
+) -> int:
+    """
+    Store many knowledge chunks (e.g. one document) in a single transaction
+    and invalidate the user's caches once. Embeds `contents` in one batched
+    pass unless `vectors` are given. Returns the number of rows written.
+    """
+    if not contents:
+        return 0
+    if vectors is None:
+        vectors = await embed_many(contents)
+
+    agent_kind = f"knowledge_{category}"
+    rows = [(uuid.uuid4(), user_id, agent_kind, c, [float(x) for x in v]) for c, v in zip(contents, vectors)]
+
+    async with engine.begin() as conn:
+        if not await _copy_rows(conn, rows):
+            # Other drivers: one executemany in the same transaction
+            await conn.execute(_INSERT_KNOWLEDGE, [
+                {"id": str(r[0]), "user_id": r[1], "agent_kind": r[2], "content": r[3], "embedding": r[4]}
+                for r in rows
+            ])
+
+    await _invalidate_knowledge_caches(user_id)
+    return len(rows)
+
+
 async def store_user_knowledge(
     user_id: int,
     category: str, # e.g., "brand_voice", "audience", "guidelines"
     content: str,
+    vector: Optional[List[float]] = None,
 ) -> None:
-    """Store general user knowledge for RAG and invalidate cache."""
-    print(f"Creating embedding for content (len: {len(content)})")
-    vector = await _embed(content)
-    print(f"Embedding created (dim: {len(vector)})")
-    
+    """
+    Store general user knowledge for RAG and invalidate cache.
+    Pass `vector` when the content embedding is already known.
+    """
+    if vector is None:
+        vector = await embed(content)
+
     async with engine.begin() as conn:
-        print(f"Inserting knowledge into DB for user {user_id}")
-        await conn.execute(
-            text("""
-                INSERT INTO ai_agent_memory (id, user_id, agent_kind, content, embedding)
-                VALUES (:id, :user_id, :agent_kind, :content, CAST(:embedding AS vector))
-            """),
-            {
-                "id":         str(uuid.uuid4()),
-                "user_id":    user_id,
-                "agent_kind": f"knowledge_{category}",
-                "content":    content,
-                "embedding":  str(vector),
-            },
-        )
-        print("Knowledge inserted successfully")
-    
-    # Invalidate all RAG cache for this user
-    try:
-        print(f"Invalidating Redis cache for user {user_id}")
-        async for key in redis_client.scan_iter(f"rag_cache:{user_id}:*"):
-            await redis_client.delete(key)
-        print("Cache invalidation complete")
-    except Exception as re:
-        print(f"Redis Cache Invalidation Warning (non-fatal): {re}")
+        await conn.execute(_INSERT_KNOWLEDGE, {
+            "id":         str(uuid.uuid4()),
+            "user_id":    user_id,
+            "agent_kind": f"knowledge_{category}",
+            "content":    content,
+            "embedding":  list(vector),
+        })
+
+    await _invalidate_knowledge_caches(user_id)
 
 async def search_user_knowledge(
     user_id: int,
     query: str,
     limit: int = 5,
+    vector: Optional[List[float]] = None,
 ) -> List[str]:
-    """Retrieve relevant knowledge context for the user with Redis caching."""
+    """
+    Retrieve relevant knowledge context for the user with Redis caching.
+    Pass `vector` when the query embedding is already known.
+    """
     cache_key = await _get_cache_key(user_id, query)
     
     # 1. Try Cache First
@@ -74,7 +126,8 @@ async def search_user_knowledge(
         print(f"Redis Cache Error: {e}")
 
     # 2. Database Fallback (Vector Search)
-    vector = await _embed(query)
+    if vector is None:
+        vector = await embed(query)
     async with engine.begin() as conn:
         result = await conn.execute(
             text("""
@@ -87,7 +140,7 @@ async def search_user_knowledge(
             """),
             {
                 "user_id":    user_id,
-                "embedding":  str(vector),
+                "embedding":  list(vector),
                 "limit":      limit,
             },
         )
@@ -0,0 +1,164 @@
+# app/chat/services/mcp_pool.py
+"""
+Pool of warm, long-lived MCP server sessions.
+
+Without it every tool call made through MultiServerMCPClient opens a fresh
+session, which with the stdio transport means spawning
+`python -m app.mcp.server` and importing its whole dependency tree. The pool
+keeps N sessions (N server processes) open for the life of the event loop,
+health-checks them with MCP pings, restarts crashed ones, and dispatches
+tool calls round-robin across the healthy ones.
+
+Owned by the FastAPI lifespan; Celery workers start it lazily on their
+persistent per-process loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+from typing import Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+from langchain_mcp_adapters.tools import load_mcp_tools
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+
+mcp_pool_ready_sessions = Gauge("mcp_pool_ready_sessions", "Healthy pooled MCP sessions")
+mcp_pool_restarts_total = Counter("mcp_pool_restarts_total", "Pooled MCP sessions restarted after a failure")
+
+# Seconds to wait for a healthy session before a tool call fails
+ACQUIRE_TIMEOUT = 30
+RESTART_BACKOFF_MAX = 30
+
+
+class _Slot:
+    def __init__(self, index: int):
+        self.index = index
+        self.session = None
+        self.tools: dict[str, BaseTool] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.session is not None
+
+
+class McpSessionPool:
+    def __init__(self, client, server: str, size: int = settings.MCP_POOL_SIZE,
+                 healthcheck_interval: float = settings.MCP_HEALTHCHECK_INTERVAL):
+        self._client = client
+        self._server = server
+        self._size = max(1, size)
+        self._interval = healthcheck_interval
+        self._slots: list[_Slot] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._changed: Optional[asyncio.Condition] = None
+        self._rr = itertools.count()
+
+    # ── lifecycle ────────────────────────────────────────────────────────────
+
+    async def start(self):
+        """Start the session slots on the running loop (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._slots:
+            return
+        # A pool left on a closed loop (e.g. a finished Celery loop) is dropped
+        self._loop = loop
+        self._stopping = asyncio.Event()
+        self._changed = asyncio.Condition()
+        self._slots = [_Slot(i) for i in range(self._size)]
+        for slot in self._slots:
+            slot.task = asyncio.create_task(self._run_slot(slot))
+        print(f"🔌 MCP session pool starting ({self._size} x {self._server})")
+
+    async def aclose(self):
+        if not self._slots or self._loop is not asyncio.get_running_loop():
+            self._slots = []
+            return
+        self._stopping.set()
+        await asyncio.gather(*(s.task for s in self._slots), return_exceptions=True)
+        self._slots = []
+        mcp_pool_ready_sessions.set(0)
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+        mcp_pool_ready_sessions.set(sum(s.ready for s in self._slots))
+
+    async def _run_slot(self, slot: _Slot):
+        backoff = 1
+        while not self._stopping.is_set():
+            try:
+                # The session context must be entered and exited in this task
+                async with self._client.session(self._server) as session:
+                    tools = await load_mcp_tools(session)
+                    slot.session, slot.tools = session, {t.name: t for t in tools}
+                    await self._notify()
+                    backoff = 1
+                    while not self._stopping.is_set():
+                        try:
+                            await asyncio.wait_for(self._stopping.wait(), timeout=self._interval)
+                        except asyncio.TimeoutError:
+                            await asyncio.wait_for(session.send_ping(), timeout=10)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ MCP session {slot.index} failed: {type(e).__name__}: {e}")
+                mcp_pool_restarts_total.inc()
+            finally:
+                slot.session, slot.tools = None, {}
+                await self._notify()
+            if not self._stopping.is_set():
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=backoff)
+                except asyncio.TimeoutError:
+                    pass
+                backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+
+    # ── dispatch ─────────────────────────────────────────────────────────────
+
+    async def _acquire(self) -> _Slot:
+        await self.start()
+
+        def _pick():
+            ready = [s for s in self._slots if s.ready]
+            return ready[next(self._rr) % len(ready)] if ready else None
+
+        async with self._changed:
+            slot = _pick()
+            if slot is None:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: any(s.ready for s in self._slots)),
+                    timeout=ACQUIRE_TIMEOUT,
+                )
+                slot = _pick()
+        return slot
+
+    async def get_tools(self) -> list[BaseTool]:
+        """
+        Tools that dispatch each call to the next healthy pooled session.
+        Same names and schemas as MultiServerMCPClient.get_tools().
+        """
+        slot = await self._acquire()
+        return [self._pooled_tool(t) for t in slot.tools.values()]
+
+    def _pooled_tool(self, template: BaseTool) -> BaseTool:
+        name = template.name
+
+        async def _call(**arguments):
+            slot = await self._acquire()
+            tool = slot.tools.get(name)
+            if tool is None:
+                raise ValueError(f"Tool {name} not available on MCP session {slot.index}")
+            return await tool.coroutine(**arguments)
+
+        return StructuredTool(
+            name=name,
+            description=template.description,
+            args_schema=template.args_schema,
+            coroutine=_call,
+            response_format=template.response_format,
+            metadata=template.metadata,
+        )
@@ -18,23 +18,13 @@
 from __future__ import annotations
 
 import uuid
-from typing import List
+from typing import List, Optional
 
 from sqlalchemy import text
-from openai import AsyncOpenAI
 
-from app.core.config import settings
 from app.core.database import engine          # your existing async SQLAlchemy engine
-
-_openai = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-
-
-async def _embed(text_input: str) -> List[float]:
-    resp = await _openai.embeddings.create(
-        model="text-embedding-3-small",
-        input=text_input,
-    )
-    return resp.data[0].embedding
+from .embedding_service import embed
+from .semantic_cache import invalidate_generation_cache
 
 
 async def store_agent_memory(
@@ -43,7 +33,7 @@ async def store_agent_memory(
     content: str,
 ) -> None:
     """Persist a text chunk with its embedding, scoped to user + agent."""
-    vector = await _embed(content)
+    vector = await embed(content)
     async with engine.begin() as conn:
         await conn.execute(
             text("""
@@ -55,9 +45,12 @@ async def store_agent_memory(
                 "user_id":    user_id,
                 "agent_kind": agent_kind,
                 "content":    content,
-                "embedding":  str(vector),
+                "embedding":  list(vector),
             },
         )
+    if agent_kind == "content":
+        # /generate pulls "content" memories into its context
+        await invalidate_generation_cache(user_id)
 
 
 async def search_agent_memory(
@@ -65,12 +58,15 @@ async def search_agent_memory(
     agent_kind: str,
     query: str,
     limit: int = 3,
+    vector: Optional[List[float]] = None,
 ) -> List[str]:
     """
     Retrieve the top-k most semantically similar memory chunks
     for a specific user + agent combination.
+    Pass `vector` when the query embedding is already known.
     """
-    vector = await _embed(query)
+    if vector is None:
+        vector = await embed(query)
     async with engine.begin() as conn:
         result = await conn.execute(
             text("""
@@ -84,7 +80,7 @@ async def search_agent_memory(
             {
                 "user_id":    user_id,
                 "agent_kind": agent_kind,
-                "embedding":  str(vector),
+                "embedding":  list(vector),
                 "limit":      limit,
             },
         )
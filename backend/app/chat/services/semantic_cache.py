@@ -0,0 +1,164 @@
+# app/chat/services/semantic_cache.py
+#
+# Per-user semantic cache for /api/ai/generate.
+#
+# A generation is reused when the same user asks again with the same
+# platforms, tone and niche for a topic whose embedding is at least
+# GEN_CACHE_SIMILARITY (cosine) close to a cached one. Entries live in one
+# Redis hash per user (gen_cache:{user_id}) that expires GEN_CACHE_TTL_SECONDS
+# after the last write and is dropped whenever the user's knowledge changes.
+# Embeddings are stored as base64 float32 to keep the hash small.
+
+from __future__ import annotations
+
+import base64
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+gen_cache_total = Counter("gen_cache_total", "Semantic generation cache lookups", ["result"])
+
+STATS_TTL_SECONDS = 30 * 86400
+
+
+def _key(user_id: int) -> str:
+    return f"gen_cache:{user_id}"
+
+
+def _stats_key(user_id: int) -> str:
+    return f"gen_cache_stats:{user_id}"
+
+
+def _scope(platforms: List[str], tone: str, niche: Optional[str]) -> dict:
+    return {
+        "platforms": sorted({p.strip().lower() for p in platforms}),
+        "tone": (tone or "").strip().lower(),
+        "niche": (niche or "").strip().lower(),
+    }
+
+
+def _encode(vector: np.ndarray) -> str:
+    return base64.b64encode(vector.astype(np.float32).tobytes()).decode()
+
+
+def _decode(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+
+def _normalize(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+@dataclass
+class CacheLookup:
+    hit: bool
+    similarity: float = 0.0
+    suggestions: Optional[list] = None
+    vector: Optional[np.ndarray] = field(default=None, repr=False)
+
+
+async def lookup(user_id: int, topic_vector: List[float], platforms: List[str], tone: str,
+                 niche: Optional[str], bypass: bool = False) -> CacheLookup:
+    """
+    Best cached generation for this request, if it is similar enough.
+    With `bypass` the cache is not consulted (the result can still be stored).
+    """
+    vector = _normalize(topic_vector)
+    if bypass:
+        return CacheLookup(hit=False, vector=vector)
+    scope = _scope(platforms, tone, niche)
+    best, best_sim = None, 0.0
+    try:
+        entries = await redis_client.hvals(_key(user_id))
+    except Exception as e:
+        print(f"Redis Cache Error: {e}")
+        entries = []
+
+    now = time.time()
+    candidates, vectors = [], []
+    for raw in entries:
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            continue
+        if entry.get("scope") != scope or now - entry.get("ts", 0) > settings.GEN_CACHE_TTL_SECONDS:
+            continue
+        candidates.append(entry)
+        vectors.append(_decode(entry["v"]))
+
+    if candidates:
+        # Stored vectors are unit length, so the dot product is the cosine
+        sims = np.stack(vectors) @ vector
+        i = int(np.argmax(sims))
+        best, best_sim = candidates[i], float(sims[i])
+
+    hit = best is not None and best_sim >= settings.GEN_CACHE_SIMILARITY
+    await _count(user_id, hit)
+    return CacheLookup(
+        hit=hit,
+        similarity=best_sim,
+        suggestions=best["suggestions"] if hit else None,
+        vector=vector,
+    )
+
+
+async def store(user_id: int, lookup_result: CacheLookup, topic: str, platforms: List[str], tone: str,
+                niche: Optional[str], suggestions: list) -> None:
+    """Remember a fresh generation (the oldest entries go beyond GEN_CACHE_MAX_ENTRIES)."""
+    entry = {
+        "v": _encode(lookup_result.vector),
+        "scope": _scope(platforms, tone, niche),
+        "topic": topic,
+        "suggestions": suggestions,
+        "ts": time.time(),
+    }
+    key = _key(user_id)
+    try:
+        await redis_client.hset(key, uuid.uuid4().hex, json.dumps(entry))
+        await redis_client.expire(key, settings.GEN_CACHE_TTL_SECONDS)
+        if await redis_client.hlen(key) > settings.GEN_CACHE_MAX_ENTRIES:
+            items = await redis_client.hgetall(key)
+            by_age = sorted(items, key=lambda f: json.loads(items[f]).get("ts", 0))
+            stale = by_age[: len(by_age) - settings.GEN_CACHE_MAX_ENTRIES]
+            if stale:
+                await redis_client.hdel(key, *stale)
+    except Exception as e:
+        print(f"Redis Set Error: {e}")
+
+
+async def invalidate_generation_cache(user_id: int) -> None:
+    try:
+        await redis_client.delete(_key(user_id))
+    except Exception as e:
+        print(f"Redis Cache Invalidation Warning (non-fatal): {e}")
+
+
+async def _count(user_id: int, hit: bool):
+    gen_cache_total.labels(result="hit" if hit else "miss").inc()
+    try:
+        key = _stats_key(user_id)
+        await redis_client.hincrby(key, "hits" if hit else "misses", 1)
+        await redis_client.expire(key, STATS_TTL_SECONDS)
+    except Exception as e:
+        print(f"Redis Stats Error: {e}")
+
+
+async def hit_rate(user_id: int) -> dict:
+    """Hits, misses and hit rate of this user's lookups (last 30 days of activity)."""
+    try:
+        stats = await redis_client.hgetall(_stats_key(user_id))
+    except Exception:
+        stats = {}
+    hits, misses = int(stats.get("hits", 0)), int(stats.get("misses", 0))
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 3) if total else 0.0}
@@ -0,0 +1,122 @@
+# app/chat/services/tool_dispatch.py
+"""
+Dispatch for calls to the Easy-Post MCP tools.
+
+Every tool in app/mcp/server.py is our own coroutine, so the API and the
+Celery workers call it directly (server.local_tools, filled in by the @tool
+decorator) and get the native dict back: no JSON-RPC, no stdio hop, no
+re-parsing of MCP content blocks. Tools that are not registered locally (or
+MCP_INPROCESS_TOOLS=false) still go through the MCP client, which also
+remains the transport for external agents. In-process mode lists the tool
+schemas in-process too (LocalToolSource), so no MCP server is started.
+
+`tool_call_seconds{path=inprocess|mcp}` records per-call latency of both paths.
+"""
+from __future__ import annotations
+
+import json
+import time
+from typing import Any
+
+from langchain_core.tools import BaseTool, StructuredTool
+from prometheus_client import Histogram
+
+from app.core.config import settings
+
+tool_call_seconds = Histogram(
+    "tool_call_seconds",
+    "Agent/publisher tool call latency by dispatch path",
+    ["tool", "path"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+class ToolNotFoundError(LookupError):
+    """No tool with this name exists in-process or on the MCP server."""
+
+
+def _local_tool(name: str):
+    if not settings.MCP_INPROCESS_TOOLS:
+        return None
+    from app.mcp.server import local_tools
+
+    return local_tools.get(name)
+
+
+class LocalToolSource:
+    """
+    Tool schemas for the agent, listed from the FastMCP server object itself.
+
+    With MCP_INPROCESS_TOOLS on, every call is dispatched in-process, so the
+    registry lists tools through this instead of a stdio server.
+    """
+
+    async def get_tools(self) -> list[BaseTool]:
+        from app.mcp.server import local_tools, mcp
+
+        return [_as_langchain_tool(t, local_tools[t.name]) for t in await mcp.list_tools() if t.name in local_tools]
+
+
+def _as_langchain_tool(spec, fn) -> BaseTool:
+    async def run(**arguments):
+        result = await fn(**arguments)
+        return json.dumps(result, default=str) if isinstance(result, (dict, list)) else str(result)
+
+    return StructuredTool(
+        name=spec.name,
+        description=spec.description or "",
+        args_schema=spec.inputSchema,
+        coroutine=run,
+    )
+
+
+def parse_tool_content(result: Any) -> Any:
+    """Turn an MCP tool result (text or content blocks) back into JSON data."""
+    if isinstance(result, list):
+        text = next((c.text for c in result if hasattr(c, "text")), None)
+        if text is None:
+            text = next((c.get("text") for c in result if isinstance(c, dict) and "text" in c), None)
+        if text is None:
+            text = next((str(c) for c in result), None)
+        result = text
+    if isinstance(result, str):
+        if not result:
+            return {"success": False, "error": "Empty response"}
+        try:
+            return json.loads(result)
+        except ValueError:
+            return {"success": True, "raw": result}
+    return result
+
+
+async def call_tool(name: str, arguments: dict) -> Any:
+    """
+    Run a tool and return its native result, in-process when possible.
+    Raises ToolNotFoundError if no tool with that name exists on either path.
+    """
+    started = time.perf_counter()
+    local = _local_tool(name)
+    if local is not None:
+        try:
+            return await local(**arguments)
+        finally:
+            tool_call_seconds.labels(tool=name, path="inprocess").observe(time.perf_counter() - started)
+
+    from app.chat.services.agent_service import tool_registry
+
+    tool = await tool_registry.get_tool(name)
+    if tool is None:
+        raise ToolNotFoundError(name)
+    try:
+        return parse_tool_content(await tool.ainvoke(arguments))
+    finally:
+        tool_call_seconds.labels(tool=name, path="mcp").observe(time.perf_counter() - started)
+
+
+async def invoke_tool(name: str, arguments: dict) -> dict:
+    """call_tool() for the publishing paths: always a result dict."""
+    try:
+        result = await call_tool(name, arguments)
+    except ToolNotFoundError:
+        return {"success": False, "error": f"Tool {name} not found"}
+    return result if isinstance(result, dict) else {"success": True, "result": result}
@@ -0,0 +1,92 @@
+# app/chat/services/tool_registry.py
+"""
+Process-wide cache of the MCP tool list.
+
+MultiServerMCPClient.get_tools() opens a session (with the stdio transport:
+spawns `python -m app.mcp.server`) and lists tools on every call. The agent
+graph needs the list twice per step and the publishing paths once per post,
+so tools are listed once here and only re-listed on an explicit reload or
+when a lookup misses. Names still unknown after that re-list are remembered
+for MISSING_TTL_SECONDS, so a bad tool name cannot force a re-list per call.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Optional
+
+from cachetools import TTLCache
+from langchain_core.tools import BaseTool
+
+MISSING_TTL_SECONDS = 300
+
+
+class ToolRegistry:
+    def __init__(self, client):
+        self._client = client
+        self._tools: Optional[list[BaseTool]] = None
+        self._by_name: dict[str, BaseTool] = {}
+        self._bound: dict[int, Any] = {}
+        self._missing: TTLCache = TTLCache(maxsize=1024, ttl=MISSING_TTL_SECONDS)
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Celery tasks may run on different loops; a Lock belongs to one loop
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def get_tools(self) -> list[BaseTool]:
+        if self._tools is not None:
+            return self._tools
+        async with self._get_lock():
+            if self._tools is None:
+                await self._load()
+        return self._tools or []
+
+    async def _load(self):
+        try:
+            tools = await self._client.get_tools()
+        except Exception as e:
+            # Not cached: the next call retries
+            print(f"⚠️ MCP Tool Loading Failed: {e}")
+            return
+        # Stable order keeps the tool schema part of the prompt identical across calls
+        self._tools = sorted(tools, key=lambda t: t.name)
+        self._by_name = {t.name: t for t in self._tools}
+        self._bound.clear()
+        print(f"🧰 MCP tools loaded: {len(self._tools)}")
+
+    async def tools_by_name(self) -> dict[str, BaseTool]:
+        await self.get_tools()
+        return self._by_name
+
+    async def get_tool(self, name: str) -> Optional[BaseTool]:
+        """Look a tool up by name, re-listing once if it is unknown."""
+        tools = await self.tools_by_name()
+        if name not in tools and name not in self._missing:
+            await self.reload()
+            tools = self._by_name
+            if name not in tools:
+                self._missing[name] = True
+        return tools.get(name)
+
+    async def bind(self, llm):
+        """`llm.bind_tools(tools)`, cached per model instance."""
+        tools = await self.get_tools()
+        key = id(llm)
+        if key not in self._bound:
+            self._bound[key] = llm.bind_tools(tools)
+        return self._bound[key]
+
+    def invalidate(self):
+        self._tools = None
+        self._by_name = {}
+        self._bound.clear()
+        self._missing.clear()
+
+    async def reload(self) -> list[BaseTool]:
+        self.invalidate()
+        return await self.get_tools()
@@ -0,0 +1,71 @@
+# app/chat/services/turn_mailbox.py
+"""
+Per-thread mailboxes for agent turns run by Celery workers
+(WHATSAPP_AGENT_EXECUTION=celery).
+
+Each WhatsApp thread has a Redis list of queued turns and at most one active
+`run_agent_turn` task. The API pushes a turn and only sends a task when none
+is active for the thread; the task drains everything queued so far as one
+coalesced turn (coalesce_turns), then either keeps going with what arrived
+meanwhile or marks the thread idle. Turns of a thread therefore run one at a
+time and in arrival order, without workers blocking on a lock.
+
+The active marker expires after AGENT_TASK_TIME_LIMIT + ACTIVE_GRACE_SECONDS,
+so a worker killed mid-turn does not stall the thread for good: the next
+message for it starts a new task that also picks up what was left.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import asdict
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from .agent_turn import AgentTurn
+
+ACTIVE_GRACE_SECONDS = 60
+
+# Atomically: if nothing is queued, mark the thread idle (0); otherwise keep
+# it active for another turn (1). A producer that pushes after the DEL sees
+# no active marker and starts a new task, so nothing is stranded.
+_RELEASE = redis_client.register_script("""
+if redis.call('LLEN', KEYS[1]) == 0 then
+    redis.call('DEL', KEYS[2])
+    return 0
+end
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 1
+""")
+
+
+def _queue_key(thread_id: str) -> str:
+    return f"agent_turn_queue:{thread_id}"
+
+
+def _active_key(thread_id: str) -> str:
+    return f"agent_turn_active:{thread_id}"
+
+
+def _active_ttl() -> int:
+    return settings.AGENT_TASK_TIME_LIMIT + ACTIVE_GRACE_SECONDS
+
+
+async def push(turn: AgentTurn) -> bool:
+    """Queue a turn; True if the caller must start a task for the thread."""
+    await redis_client.rpush(_queue_key(turn.thread_id), json.dumps(asdict(turn)))
+    return bool(await redis_client.set(_active_key(turn.thread_id), "1", nx=True, ex=_active_ttl()))
+
+
+async def take(thread_id: str) -> list[AgentTurn]:
+    """Everything queued for the thread, oldest first."""
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.lrange(_queue_key(thread_id), 0, -1)
+        pipe.delete(_queue_key(thread_id))
+        pipe.expire(_active_key(thread_id), _active_ttl())
+        queued, *_ = await pipe.execute()
+    return [AgentTurn(**json.loads(item)) for item in queued]
+
+
+async def release(thread_id: str) -> bool:
+    """Mark the thread idle unless more turns arrived; True if they did."""
+    return bool(await _RELEASE(keys=[_queue_key(thread_id), _active_key(thread_id)], args=[_active_ttl()]))
@@ -0,0 +1,94 @@
+# app/chat/services/turn_scheduler.py
+"""
+Per-conversation ordered execution for agent turns.
+
+Turns for the same thread_id run strictly one after another (the
+AsyncPostgresSaver checkpoint is not safe against concurrent writers), turns
+for different threads run in parallel up to a global limit. Messages that pile
+up for a thread while it is busy are coalesced into a single agent turn.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+from typing import Awaitable, Callable
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+from .agent_turn import AgentTurn
+from .waha_queue import RETRY_STATUS, RETRYABLE_ERRORS
+
+agent_turns_total = Counter("agent_turns_total", "Agent turns executed by the turn scheduler")
+agent_turns_coalesced_total = Counter(
+    "agent_turns_coalesced_total",
+    "Messages folded into another message's agent turn instead of running their own",
+)
+agent_turns_running = Gauge("agent_turns_running", "Agent turns currently executing")
+
+
+def coalesce_turns(turns: list[AgentTurn]) -> AgentTurn:
+    """Merge queued messages for one thread into a single turn (latest profile wins)."""
+    if len(turns) == 1:
+        return turns[0]
+    latest = turns[-1]
+    return replace(latest, content="\n\n".join(t.content for t in turns if t.content))
+
+
+class TurnScheduler:
+    """Keyed scheduler: serial per thread_id, parallel across threads."""
+
+    def __init__(
+        self,
+        runner: Callable[[AgentTurn], Awaitable[dict]],
+        max_concurrency: int = settings.AGENT_MAX_CONCURRENT_TURNS,
+    ):
+        self._runner = runner
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._pending: dict[str, list[tuple[AgentTurn, asyncio.Future]]] = {}
+        self._workers: dict[str, asyncio.Task] = {}
+
+    async def submit(self, turn: AgentTurn) -> dict:
+        """Queue a turn for its thread and wait for the (possibly coalesced) result."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(turn.thread_id, []).append((turn, future))
+        if turn.thread_id not in self._workers:
+            self._workers[turn.thread_id] = asyncio.create_task(self._drain(turn.thread_id))
+        # A disconnecting webhook caller must not cancel a turn other messages share
+        return await asyncio.shield(future)
+
+    async def _drain(self, thread_id: str):
+        try:
+            while self._pending.get(thread_id):
+                async with self._semaphore:
+                    # Take the batch only once a slot is free so that everything
+                    # that arrived while waiting joins the same turn.
+                    batch = self._pending.pop(thread_id, [])
+                    if not batch:
+                        break
+                    if len(batch) > 1:
+                        print(f"🧵 Coalescing {len(batch)} messages for thread {thread_id}")
+                        agent_turns_coalesced_total.inc(len(batch) - 1)
+
+                    agent_turns_total.inc()
+                    agent_turns_running.inc()
+                    try:
+                        result = await self._runner(coalesce_turns([t for t, _ in batch]))
+                    except RETRYABLE_ERRORS as e:
+                        print(f"⚠️ Turn scheduler transient error ({thread_id}): {type(e).__name__}: {e}")
+                        result = {"status": RETRY_STATUS, "error": str(e)}
+                    except Exception as e:
+                        print(f"❌ Turn scheduler error ({thread_id}): {type(e).__name__}: {e}")
+                        result = {"status": "agent_error"}
+                    finally:
+                        agent_turns_running.dec()
+
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._workers.pop(thread_id, None)
+
+    async def aclose(self):
+        """Wait for in-flight threads to finish (used on shutdown)."""
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
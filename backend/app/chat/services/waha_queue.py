@@ -0,0 +1,223 @@
+# app/chat/services/waha_queue.py
+"""
+Durable ingestion queue for WAHA webhooks.
+
+The webhook XADDs the raw event to a Redis stream and returns 202 straight
+away. A pool of async consumers (started from the FastAPI lifespan) reads the
+stream through a consumer group, runs the event handler and ACKs.
+
+While an event is being handled its consumer keeps re-claiming it (XCLAIM
+JUSTID), so it never looks idle. Entries left pending by a crashed or
+stopped consumer go idle and are taken over (XAUTOCLAIM, every
+WAHA_QUEUE_CLAIM_INTERVAL_SECONDS) once idle for WAHA_QUEUE_CLAIM_IDLE_MS.
+Events are acknowledged when handled, or when they fail for a reason a retry
+would not fix. Transient failures (RETRYABLE_ERRORS raised by the handler, or
+a {"status": "retry"} result) leave the event pending for another delivery;
+after WAHA_QUEUE_MAX_DELIVERIES it is moved to the `<stream>:dead` stream.
+
+Handled events are also marked done under their WAHA message id
+(webhook_dedup), so an event that is re-delivered after it was handled (e.g.
+the process died before the ACK) is acknowledged without running it again.
+On shutdown the consumers stop reading and wait up to
+WAHA_QUEUE_DRAIN_SECONDS for the events they hold to finish.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Awaitable, Callable
+
+from prometheus_client import Gauge, Histogram
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import ResponseError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from .webhook_dedup import is_waha_event_done, mark_waha_event_done
+
+CONSUMER_GROUP = "waha-consumers"
+READ_BLOCK_MS = 5_000
+
+# Failures worth another delivery (infrastructure blips); anything else is
+# treated as a poison event and acknowledged
+RETRYABLE_ERRORS = (ConnectionError, TimeoutError, RedisConnectionError, RedisTimeoutError)
+# Handler result asking for another delivery
+RETRY_STATUS = "retry"
+
+waha_queue_depth = Gauge(
+    "waha_queue_depth",
+    "WAHA events waiting in (or being processed from) the ingestion stream",
+)
+waha_queue_wait_seconds = Histogram(
+    "waha_queue_wait_seconds",
+    "Time a WAHA event spent in the ingestion stream before a consumer picked it up",
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+
+async def enqueue_waha_event(data: dict) -> str:
+    """Persist a raw webhook event to the stream. Returns the stream entry id."""
+    entry_id = await redis_client.xadd(
+        settings.WAHA_QUEUE_STREAM,
+        {"data": json.dumps(data), "enqueued_at": f"{time.time():.6f}"},
+        maxlen=settings.WAHA_QUEUE_MAXLEN,
+        approximate=True,
+    )
+    waha_queue_depth.inc()
+    return entry_id
+
+
+class WahaQueueConsumer:
+    """Pool of stream consumers feeding events to an async handler."""
+
+    def __init__(self, handler: Callable[[dict], Awaitable[dict]], concurrency: int = settings.WAHA_QUEUE_CONCURRENCY):
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.stream = settings.WAHA_QUEUE_STREAM
+        self.dead_letter_stream = f"{self.stream}:dead"
+        self._prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    async def start(self):
+        try:
+            await redis_client.xgroup_create(self.stream, CONSUMER_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        await self._refresh_depth()
+        self._tasks = [
+            asyncio.create_task(self._consume(f"{self._prefix}-{i}"))
+            for i in range(self.concurrency)
+        ]
+        print(f"📥 WAHA queue consumers online ({self.concurrency}x on '{self.stream}')")
+
+    async def stop(self):
+        """Stop reading and let in-flight events finish (and be acked) first."""
+        self._stopping.set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=settings.WAHA_QUEUE_DRAIN_SECONDS)
+            if pending:
+                print(f"⚠️ WAHA queue: {len(pending)} consumer(s) still busy at shutdown, left pending")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _refresh_depth(self):
+        try:
+            waha_queue_depth.set(await redis_client.xlen(self.stream))
+        except Exception as e:
+            print(f"⚠️ WAHA queue depth refresh failed: {e}")
+
+    async def _claim_stale(self, consumer: str) -> list:
+        """Take over entries a dead consumer read but never acknowledged."""
+        _, entries, *_ = await redis_client.xautoclaim(
+            self.stream, CONSUMER_GROUP, consumer,
+            min_idle_time=settings.WAHA_QUEUE_CLAIM_IDLE_MS, start_id="0-0", count=1,
+        )
+        return entries
+
+    async def _consume(self, consumer: str):
+        next_claim = 0.0
+        while not self._stopping.is_set():
+            try:
+                entries = []
+                if time.monotonic() >= next_claim:
+                    entries = await self._claim_stale(consumer)
+                    if not entries:
+                        next_claim = time.monotonic() + settings.WAHA_QUEUE_CLAIM_INTERVAL_SECONDS
+                if not entries:
+                    response = await redis_client.xreadgroup(
+                        CONSUMER_GROUP, consumer, {self.stream: ">"},
+                        count=1, block=READ_BLOCK_MS,
+                    )
+                    entries = response[0][1] if response else []
+
+                for entry_id, fields in entries:
+                    await self._process(consumer, entry_id, fields)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ WAHA queue consumer {consumer} error: {e}")
+                await asyncio.sleep(1)
+
+    async def _keep_claimed(self, consumer: str, entry_id: str):
+        """Reset the entry's idle time while it is being handled."""
+        interval = settings.WAHA_QUEUE_CLAIM_IDLE_MS / 3000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await redis_client.xclaim(
+                    self.stream, CONSUMER_GROUP, consumer,
+                    min_idle_time=0, message_ids=[entry_id], justid=True,
+                )
+            except Exception as e:
+                print(f"⚠️ WAHA queue claim refresh failed ({entry_id}): {e}")
+
+    async def _deliveries(self, entry_id: str) -> int:
+        try:
+            pending = await redis_client.xpending_range(
+                self.stream, CONSUMER_GROUP, min=entry_id, max=entry_id, count=1,
+            )
+            return int(pending[0]["times_delivered"]) if pending else 1
+        except Exception:
+            return 1
+
+    async def _ack(self, entry_id: str):
+        await redis_client.xack(self.stream, CONSUMER_GROUP, entry_id)
+        await redis_client.xdel(self.stream, entry_id)
+        await self._refresh_depth()
+
+    async def _dead_letter(self, entry_id: str, fields: dict, error):
+        try:
+            await redis_client.xadd(
+                self.dead_letter_stream,
+                {**fields, "entry_id": entry_id, "error": str(error)},
+                maxlen=settings.WAHA_QUEUE_MAXLEN,
+                approximate=True,
+            )
+        except Exception as e:
+            print(f"⚠️ WAHA dead-letter write failed ({entry_id}): {e}")
+
+    async def _process(self, consumer: str, entry_id: str, fields: dict):
+        enqueued_at = float(fields.get("enqueued_at") or time.time())
+        waha_queue_wait_seconds.observe(max(0.0, time.time() - enqueued_at))
+        data = json.loads(fields["data"])
+        deliveries = await self._deliveries(entry_id)
+        if deliveries > 1 and await is_waha_event_done(data):
+            # Handled before, the ACK was lost
+            await self._ack(entry_id)
+            return
+
+        keepalive = asyncio.create_task(self._keep_claimed(consumer, entry_id))
+        retry_error = None
+        try:
+            result = await self.handler(data)
+            if isinstance(result, dict) and result.get("status") == RETRY_STATUS:
+                retry_error = result.get("error") or "retry requested"
+            else:
+                await mark_waha_event_done(data)
+        except RETRYABLE_ERRORS as e:
+            retry_error = e
+        except Exception as e:
+            # The handler reports failures to the user itself; a poison event
+            # must not block the stream, so it is acknowledged.
+            print(f"❌ WAHA queued event {entry_id} failed: {type(e).__name__}: {e}")
+        finally:
+            keepalive.cancel()
+        # Not reached on cancellation: the entry stays pending and another
+        # consumer takes it over
+
+        if retry_error is not None:
+            if deliveries < settings.WAHA_QUEUE_MAX_DELIVERIES:
+                # Left pending: re-delivered by XAUTOCLAIM once idle
+                print(f"⚠️ WAHA queued event {entry_id} failed (attempt {deliveries}), will retry: {retry_error}")
+                return
+            print(f"❌ WAHA queued event {entry_id} dead-lettered after {deliveries} attempts: {retry_error}")
+            await self._dead_letter(entry_id, fields, retry_error)
+        await self._ack(entry_id)
@@ -0,0 +1,92 @@
+# app/chat/services/webhook_dedup.py
+"""
+Idempotency store for WAHA webhooks.
+
+WAHA redelivers an event when our response times out, so every message id is
+claimed once before any DB or LLM work happens. An in-process TTL cache
+answers hot retries without a network hop; Redis (SET NX EX) is the shared
+source of truth across API replicas.
+
+Queue consumers additionally mark an event done once it has been handled
+(waha_done:{id}), so a queued event re-delivered after that is skipped.
+"""
+from cachetools import TTLCache
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+waha_dedup_hits_total = Counter(
+    "waha_dedup_hits_total", "WAHA events dropped as duplicates", ["layer"]
+)
+waha_dedup_misses_total = Counter(
+    "waha_dedup_misses_total", "WAHA events seen for the first time"
+)
+
+_local_seen: TTLCache = TTLCache(maxsize=50_000, ttl=settings.WAHA_DEDUP_TTL_SECONDS)
+
+
+def waha_message_id(data: dict) -> str | None:
+    """Stable id for a WAHA message event (payload.id, e.g. 'false_123@c.us_ABCD')."""
+    payload = data.get("payload") or {}
+    message_id = payload.get("id")
+    if isinstance(message_id, dict):  # some engines send {"_serialized": "..."}
+        message_id = message_id.get("_serialized")
+    return f"{data.get('session', '')}:{message_id}" if message_id else None
+
+
+async def claim_waha_event(data: dict) -> bool:
+    """
+    Returns True if this is the first delivery of the event, False if it is a
+    duplicate that must be dropped. Events without an id are always processed.
+    """
+    key = waha_message_id(data)
+    if not key:
+        return True
+
+    if key in _local_seen:
+        waha_dedup_hits_total.labels(layer="local").inc()
+        return False
+    _local_seen[key] = True
+
+    try:
+        first = await redis_client.set(
+            f"waha_dedup:{key}", "1", nx=True, ex=settings.WAHA_DEDUP_TTL_SECONDS
+        )
+    except Exception as e:
+        # Redis down: the local cache still catches same-replica retries
+        print(f"⚠️ WAHA dedup store unavailable: {e}")
+        first = True
+
+    if not first:
+        waha_dedup_hits_total.labels(layer="redis").inc()
+        return False
+
+    waha_dedup_misses_total.inc()
+    return True
+
+
+def _done_key(key: str) -> str:
+    return f"waha_done:{key}"
+
+
+async def mark_waha_event_done(data: dict) -> None:
+    """Record that the event has been handled (best effort)."""
+    key = waha_message_id(data)
+    if not key:
+        return
+    try:
+        await redis_client.set(_done_key(key), "1", ex=settings.WAHA_DEDUP_TTL_SECONDS)
+    except Exception as e:
+        print(f"⚠️ WAHA completion marker write failed: {e}")
+
+
+async def is_waha_event_done(data: dict) -> bool:
+    key = waha_message_id(data)
+    if not key:
+        return False
+    try:
+        return bool(await redis_client.exists(_done_key(key)))
+    except Exception as e:
+        print(f"⚠️ WAHA completion marker lookup failed: {e}")
+        return False
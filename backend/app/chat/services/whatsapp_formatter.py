@@ -175,3 +175,12 @@ def caption_preview(platform: str, caption: str, hashtags: list[str]) -> str:
 def typing_indicator() -> str:
     """Lightweight 'thinking' message to send before a slow response."""
     return "⏳ _Working on it…_"
+
+
+def tool_progress(tool_names: list[str]) -> str:
+    """
+    Short status line while the agent runs tools, e.g.
+        ⚙️ _Post image to instagram…_
+    """
+    labels = ", ".join(name.replace("_", " ").capitalize() for name in tool_names)
+    return f"⚙️ _{labels}…_"
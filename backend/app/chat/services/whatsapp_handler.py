@@ -0,0 +1,284 @@
+# app/chat/services/whatsapp_handler.py
+"""
+WAHA event processing shared by the inline webhook and the queue consumers.
+
+The webhook only validates the event; everything that touches the database,
+S3 or the agent graph lives here so it can run either inside the request or
+in a background consumer.
+
+Sender numbers, message bodies and payload details are only logged at DEBUG.
+"""
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.chat.services.agent_turn import AgentTurn
+from app.chat.services.turn_scheduler import TurnScheduler
+from app.chat.services.waha_queue import RETRYABLE_ERRORS
+from app.chat.services.whatsapp_service import send_text
+from app.core.config import settings
+from app.core.s3_service import s3_service
+from app.core.waha_client import waha_client
+from app.platforms.media_mirror import mirror_whatsapp_media
+from app.platforms.whatsapp_downloader import MediaTooLargeError, UnsupportedMediaError
+from app.user.services.sender_cache import SenderIdentity, get_sender, set_sender
+from app.user.services.user_service import (
+    get_user,
+    get_user_by_number,
+    get_user_by_number_or_lid,
+    save_whatsapp_lid,
+    verify_user
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_processable_event(data: dict) -> tuple[bool, dict]:
+    """
+    Cheap validation done before an event is accepted.
+    Returns (accepted, response_body_if_rejected).
+    """
+    event = data.get("event")
+    if event != "message":
+        return False, {"status": "ignored", "event": event}
+
+    payload = data.get("payload") or {}
+
+    # Ignore messages sent by the bot itself
+    if payload.get("fromMe"):
+        return False, {"status": "ignored", "reason": "from_me"}
+
+    if not payload.get("from"):
+        return False, {"status": "ignored", "reason": "no_sender"}
+
+    return True, {}
+
+
+async def _resolve_sender(sender_full: str, db: AsyncSession, payload: dict = {}) -> tuple[SenderIdentity | None, str]:
+    """
+    Resolve a WAHA sender through the sender cache, falling back to the
+    full lookup below on a miss. Unknown senders are cached as well, so
+    repeat messages from them skip the payload scan and the WAHA call.
+    """
+    sender_raw = sender_full.split("@")[0]
+    hit, identity = await get_sender(sender_raw)
+    if hit:
+        return identity, identity.sender if identity else sender_raw
+
+    user, sender = await _lookup_sender(sender_full, db, payload)
+    identity = SenderIdentity.from_user(user, sender) if user else None
+    await set_sender(sender_raw, identity)
+    return identity, sender
+
+
+async def _lookup_sender(sender_full: str, db: AsyncSession, payload: dict = {}):
+    """
+    Permanently resolve a WAHA sender to a User.
+
+    WAHA can send messages using either:
+      - Real phone number: "923332112684@c.us"
+      - WhatsApp internal LID: "255799712591939@lid"
+
+    According to WAHA docs, each user has BOTH a real @c.us ID and a hidden @lid.
+    The webhook may include the real number in other payload fields.
+
+    Resolution priority:
+      1. Fast DB lookup by raw identifier (phone or cached LID)
+      2. Scan other payload fields for a @c.us companion to the LID
+      3. Call WAHA contacts API to resolve LID → real phone
+      4. On success, store the LID on user for instant future lookups
+    """
+    sender_raw = sender_full.split("@")[0]
+    sender_type = sender_full.split("@")[1] if "@" in sender_full else "c.us"
+
+    # ── Step 1: Fast path — direct DB lookup ─────────────────────────────────
+    user = await get_user_by_number_or_lid(db, sender_raw)
+    if user:
+        return user, sender_raw
+
+    # ── Step 2: Not a LID — just not registered ───────────────────────────────
+    if sender_type != "lid":
+        return None, sender_raw
+
+    logger.debug("Unknown LID %s, scanning payload for a @c.us partner", sender_raw)
+
+    # ── Step 3: Scan all payload fields for a real @c.us phone number ─────────
+    # Per WAHA docs: each user has a regular @c.us ID alongside their @lid
+    # It may appear in chatId, _data subfields, or other locations
+    def extract_cus_numbers(obj, found=None):
+        """Recursively find all @c.us IDs in the payload."""
+        if found is None:
+            found = set()
+        if isinstance(obj, dict):
+            for k, v in obj.items():
+                if isinstance(v, str) and "@c.us" in v:
+                    found.add(v.split("@")[0])
+                elif isinstance(v, str) and "@s.whatsapp.net" in v:
+                    # docs say convert @s.whatsapp.net → @c.us
+                    found.add(v.split("@")[0])
+                else:
+                    extract_cus_numbers(v, found)
+        elif isinstance(obj, list):
+            for item in obj:
+                extract_cus_numbers(item, found)
+        return found
+
+    cus_numbers = extract_cus_numbers(payload)
+    logger.debug("@c.us candidates in payload: %s", cus_numbers)
+
+    for candidate in cus_numbers:
+        user = await get_user_by_number(db, candidate)
+        if user:
+            logger.debug("Resolved LID via payload scan: %s -> %s", sender_raw, candidate)
+            await save_whatsapp_lid(db, user, sender_raw)
+            return user, candidate
+
+    # ── Step 4: Call WAHA contacts API ────────────────────────────────────────
+    logger.debug("No match in payload, querying WAHA contacts API")
+    try:
+        resp = await waha_client.request(
+            "GET", "/api/contacts", endpoint="contacts",
+            params={"contactId": sender_full, "session": settings.WAHA_SESSION},
+        )
+        if resp.status_code == 200:
+            contact = resp.json()
+            logger.debug("WAHA contacts response: %s", contact)
+            real_id = contact.get("id") or contact.get("number") or ""
+            candidate = real_id.split("@")[0]
+            if candidate and candidate.isdigit():
+                user = await get_user_by_number(db, candidate)
+                if user:
+                    logger.debug("Resolved LID via WAHA API: %s -> %s", sender_raw, candidate)
+                    await save_whatsapp_lid(db, user, sender_raw)
+                    return user, candidate
+        else:
+            logger.warning("WAHA contacts API returned %s", resp.status_code)
+    except Exception as e:
+        logger.warning("WAHA contacts API error: %s", e)
+
+    logger.info("Could not resolve a WhatsApp LID to a registered number")
+    logger.debug("Unresolved LID: %s", sender_raw)
+    return None, sender_raw
+
+
+async def _reject_media(chat_id: str, reason: str) -> dict:
+    """Tell the sender their media can't be used, without running the agent."""
+    logger.info("WhatsApp media rejected: %s", reason)
+    await send_text(
+        chat_id,
+        f"⚠️ *Media Not Supported*\n\n{reason}.\n\n"
+        "Please send a JPEG, PNG, WebP or GIF image within the size limit.",
+    )
+    return {"status": "media_rejected", "reason": reason}
+
+
+async def handle_waha_event(scheduler: TurnScheduler, data: dict, db: AsyncSession,
+                            retryable: bool = False) -> dict:
+    """
+    Process a single WAHA "message" event end to end.
+    Self-healing: automatically resolves & caches WhatsApp LIDs on first contact.
+
+    With `retryable` (queue consumers) transient infrastructure errors are
+    raised, or come back as {"status": "retry"} from the agent turn, instead of
+    being swallowed, so the queue delivers the event again.
+    """
+    try:
+        payload = data.get("payload", {})
+
+        sender_full = payload.get("from", "")
+        body        = payload.get("body", "")
+        has_media   = payload.get("hasMedia", False)
+        media       = payload.get("media") if has_media else None
+
+        logger.debug("Incoming from %s | body: %.60s | media: %s", sender_full, body, media)
+        user, sender = await _resolve_sender(sender_full, db, payload)
+        if not user:
+            logger.info("Message from an unregistered WhatsApp sender ignored")
+            logger.debug("Unregistered sender: %s", sender_full)
+            return {"status": "unauthorized"}
+
+        # ── Step 2: Handle Phone Verification Flow ────────────────────────────
+        if user.verification_status == "pending":
+            # The cache only holds a snapshot; verification needs the row
+            user = await get_user(db, user.id)
+            if body.strip().upper() == "DONE":
+                # Capture the precise LID (sender_full) if it's a @lid address
+                # sender_raw would be just the ID part.
+                # verify_user stores sender_raw as the LID.
+                sender_raw = sender_full.split("@")[0]
+                await verify_user(db, user, sender_raw)
+                await send_text(sender_full, "✅ *Verification Successful!*\n\nYour WhatsApp account is now linked to Easy-Post. You can now start sending messages or media to the AI agent.")
+                return {"status": "verified"}
+            else:
+                await send_text(sender_full, "⚠️ *Account Not Verified*\n\nPlease reply with *DONE* to verify your phone number and activate your account.")
+                return {"status": "pending_verification"}
+
+        # Turns are serialized per thread by the scheduler (one checkpoint writer at a time)
+        thread_id = user.whatsapp_number
+
+        # ── Handle Media (Images) ─────────────────────────────────────────────
+        if has_media and media:
+            media_id  = media.get("id")
+            media_url = media.get("url")
+            mimetype  = media.get("mimetype", "image/jpeg")
+
+            # --- FIXED: Mirror to S3 before passing to agent ---
+            # Facebook cannot reach localhost:3000, so we mirror to a public S3 bucket
+            s3_url = None
+            if mimetype.startswith("image/"):
+                if mimetype not in s3_service.ALLOWED_MIME_TYPES:
+                    return await _reject_media(sender_full, f"Unsupported media type: {mimetype}")
+                try:
+                    logger.debug("Mirroring WhatsApp media %s to S3", media_id or media_url)
+                    # Indexed by media id, so the posting tools reuse this copy
+                    s3_url = (await mirror_whatsapp_media(media_id or media_url, user.id)).url
+                    logger.debug("Mirrored to S3: %s", s3_url)
+                except (UnsupportedMediaError, MediaTooLargeError) as e:
+                    # Not publishable from any URL; tell the sender instead
+                    return await _reject_media(sender_full, str(e))
+                except Exception as e:
+                    logger.warning("Media mirroring failed: %s", e)
+                    # Fallback to local URL if S3 fails (though it might still fail at FB side)
+                    s3_url = media_url
+
+            logger.debug("Media %s (%s): WAHA %s, S3 %s", media_id, mimetype, media_url, s3_url)
+
+            if mimetype.startswith("image/"):
+                agent_msg = (
+                    f"USER REQUEST: {body}\n\n"
+                    f"📸 WhatsApp Media URL: {media_url}\n"
+                    f"📸 S3 Mirrored URL: {s3_url or media_url}\n"
+                    f"📸 Platform Media ID: {media_id or media_url}\n"
+                    f"📸 MIME Type: {mimetype}\n\n"
+                    "Please help the user with this media asset."
+                )
+                return await scheduler.submit(AgentTurn(
+                    user_id=user.id,
+                    thread_id=thread_id,
+                    chat_id=sender_full,
+                    content=agent_msg,
+                    niche=user.niche,
+                    ai_tone=user.ai_tone,
+                    default_reply="✅ Asset Pipeline Triggered.",
+                    error_reply="⚠️ System Failure: Could not process media asset. Please try again.",
+                    retryable=retryable,
+                ))
+
+        # ── Handle Text ───────────────────────────────────────────────────────
+        if body:
+            return await scheduler.submit(AgentTurn(
+                user_id=user.id,
+                thread_id=thread_id,
+                chat_id=sender_full,
+                content=body,
+                niche=user.niche,
+                ai_tone=user.ai_tone,
+                retryable=retryable,
+            ))
+
+        return {"status": "no_content"}
+    except Exception as e:
+        if retryable and isinstance(e, RETRYABLE_ERRORS):
+            raise
+        logger.exception("WAHA event processing failed: %s", e)
+        return {"status": "critical_failure"}
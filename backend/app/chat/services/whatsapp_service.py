@@ -1,11 +1,8 @@
-import requests
 import os
-import httpx
 from ...core.config import settings
+from ...core.waha_client import waha_client
 
-WAHA_URL = settings.WAHA_URL
 WAHA_SESSION = settings.WAHA_SESSION
-WAHA_API_KEY = settings.WAHA_API_KEY
 
 MEDIA_DIR = "media"
 os.makedirs(MEDIA_DIR, exist_ok=True)
@@ -18,30 +15,23 @@ async def send_text(to: str, text: str):
     """
     Send text via WAHA /api/sendText
     """
-    url = f"{WAHA_URL}/api/sendText"
-    
     # Handle both plain numbers and full JIDs
     chat_id = to if "@" in to else f"{to}@c.us"
-    
+
     payload = {
         "chatId": chat_id,
         "text": text,
         "session": WAHA_SESSION
     }
-    
-    headers = {}
-    if WAHA_API_KEY:
-        headers["X-Api-Key"] = WAHA_API_KEY
-
-    async with httpx.AsyncClient(headers=headers) as client:
-        try:
-            r = await client.post(url, json=payload, timeout=30)
-            r.raise_for_status()
-            print(f"✅ WAHA Text Sent to {chat_id}: {r.status_code}")
-            return r.json()
-        except Exception as e:
-            print(f"❌ WAHA sendText Failed: {e}")
-            return None
+
+    try:
+        r = await waha_client.request("POST", "/api/sendText", endpoint="sendText", json=payload)
+        r.raise_for_status()
+        print(f"✅ WAHA Text Sent to {chat_id}: {r.status_code}")
+        return r.json()
+    except Exception as e:
+        print(f"❌ WAHA sendText Failed: {e}")
+        return None
 
 
 # ======================== #
@@ -52,11 +42,9 @@ async def send_file(to: str, file_url: str, caption: str = ""):
     Send media/file via WAHA /api/sendFile
     Works for images, audio, video.
     """
-    url = f"{WAHA_URL}/api/sendFile"
-    
     # Handle both plain numbers and full JIDs
     chat_id = to if "@" in to else f"{to}@c.us"
-    
+
     payload = {
         "chatId": chat_id,
         "file": {
@@ -65,20 +53,41 @@ async def send_file(to: str, file_url: str, caption: str = ""):
         "caption": caption,
         "session": WAHA_SESSION
     }
-    
-    headers = {}
-    if WAHA_API_KEY:
-        headers["X-Api-Key"] = WAHA_API_KEY
-
-    async with httpx.AsyncClient(headers=headers) as client:
-        try:
-            r = await client.post(url, json=payload, timeout=45)
-            r.raise_for_status()
-            print(f"✅ WAHA File Sent to {to}: {r.status_code}")
-            return r.json()
-        except Exception as e:
-            print(f"❌ WAHA sendFile Failed: {e}")
-            return None
+
+    try:
+        r = await waha_client.request("POST", "/api/sendFile", endpoint="sendFile", json=payload)
+        r.raise_for_status()
+        print(f"✅ WAHA File Sent to {to}: {r.status_code}")
+        return r.json()
+    except Exception as e:
+        print(f"❌ WAHA sendFile Failed: {e}")
+        return None
+
+
+# ======================== #
+#         PRESENCE         #
+# ======================== #
+async def _set_typing(to: str, typing: bool):
+    chat_id = to if "@" in to else f"{to}@c.us"
+    path = "/api/startTyping" if typing else "/api/stopTyping"
+    try:
+        r = await waha_client.request(
+            "POST", path, endpoint="presence",
+            json={"chatId": chat_id, "session": WAHA_SESSION},
+        )
+        r.raise_for_status()
+    except Exception as e:
+        # Presence is cosmetic — never fail a turn over it
+        print(f"⚠️ WAHA {path} Failed: {e}")
+
+
+async def start_typing(to: str):
+    """Show the "typing…" indicator in the user's chat."""
+    await _set_typing(to, True)
+
+
+async def stop_typing(to: str):
+    await _set_typing(to, False)
 
 
 # ======================== #
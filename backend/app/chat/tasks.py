@@ -3,12 +3,16 @@ import asyncio
 import io
 import fitz
 from ..core.celery_app import celery_app
-from .services.knowledge_service import store_user_knowledge
-from .services.agent_service import mcp_client
+from ..core.config import settings
+from .services.knowledge_service import store_user_knowledge_bulk
+from .services.agent_service import mcp_pool
+from .services.tool_dispatch import invoke_tool
 from .models.post import Post
 from ..core.database import AsyncSessionLocal
 from sqlalchemy import select, func
 from datetime import datetime
+from contextlib import AsyncExitStack
+from celery.signals import worker_process_shutdown
 
 def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 100):
     chunks = []
@@ -16,6 +20,39 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 100):
         chunks.append(text[i:i + chunk_size])
     return chunks
 
+# ── Worker event loop ────────────────────────────────────────────────────────
+# Each worker process keeps one event loop alive for all its tasks, so
+# loop-bound resources (pooled MCP sessions, DB pools, HTTP clients) survive
+# between tasks instead of being rebuilt by asyncio.run() every time.
+
+_worker_loop = None
+
+
+def _run_async(coro):
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(coro)
+
+
+@worker_process_shutdown.connect
+def _close_worker_resources(**kwargs):
+    if _worker_loop is None or _worker_loop.is_closed():
+        return
+
+    async def _close():
+        from ..mcp.graph_http import close_graph_client
+
+        await close_graph_client()
+        if mcp_pool:
+            await mcp_pool.aclose()
+        if _worker_stack:
+            await _worker_stack.aclose()
+
+    _worker_loop.run_until_complete(_close())
+    _worker_loop.close()
+
 @celery_app.task(name="index_knowledge_file")
 def index_knowledge_file_task(user_id: int, file_content: bytes, filename: str):
     """Background task to index a file into the vector database."""
@@ -35,13 +72,7 @@ def index_knowledge_file_task(user_id: int, file_content: bytes, filename: str):
         chunks = chunk_text(content)
         
         # We need to run the async database operations in the sync Celery worker
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # This shouldn't happen in a Celery worker but good to be safe
-            future = asyncio.ensure_future(_store_chunks(user_id, chunks, filename))
-            loop.run_until_complete(future)
-        else:
-            asyncio.run(_store_chunks(user_id, chunks, filename))
+        _run_async(_store_chunks(user_id, chunks, filename))
 
         return f"Successfully indexed {len(chunks)} chunks from {filename}"
 
@@ -49,12 +80,12 @@ def index_knowledge_file_task(user_id: int, file_content: bytes, filename: str):
         return f"Failed to index {filename}: {str(e)}"
 
 async def _store_chunks(user_id: int, chunks: list, filename: str):
-    for chunk in chunks:
-        await store_user_knowledge(
-            user_id=user_id,
-            category=f"file_{filename[:30]}",
-            content=chunk
-        )
+    # One batched embedding pass, one transaction and one cache flush per file
+    await store_user_knowledge_bulk(
+        user_id=user_id,
+        category=f"file_{filename[:30]}",
+        contents=chunks,
+    )
 
 @celery_app.task(name="publish_scheduled_post")
 def publish_scheduled_post_task(post_id: int):
@@ -85,8 +116,6 @@ def publish_scheduled_post_task(post_id: int):
                     "instagram": "create_instagram_post"
                 }
 
-                tools = await mcp_client.get_tools()
-                
                 results_summary = []
                 success_count = 0
                 
@@ -105,23 +134,8 @@ def publish_scheduled_post_task(post_id: int):
 
                     if not tool_name: continue
 
-                    target_tool = next((t for t in tools if t.name == tool_name), None)
-                    if not target_tool:
-                        results_summary.append({"platform": plat, "error": f"Tool {tool_name} not found"})
-                        continue
-
                     print(f"📡 Worker: Deploying to {plat} via {tool_name}...")
-                    tool_result = await target_tool.ainvoke(tool_args)
-
-                    import json
-                    # Robust parsing
-                    if isinstance(tool_result, list):
-                        text_content = next((c.text for c in tool_result if hasattr(c, "text")), None)
-                        if not text_content: text_content = next((str(c) for c in tool_result), None)
-                        try:
-                            tool_result = json.loads(text_content) if text_content else {"success": False, "error": "Empty response"}
-                        except:
-                            tool_result = {"success": True, "raw": text_content}
+                    tool_result = await invoke_tool(tool_name, tool_args)
 
                     if tool_result.get("success"):
                         success_count += 1
@@ -151,20 +165,21 @@ def publish_scheduled_post_task(post_id: int):
                 await local_engine.dispose()
                 return f"Error publishing post {post_id}: {str(e)}"
 
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            return loop.run_until_complete(_publish())
-        else:
-            return asyncio.run(_publish())
-    except RuntimeError:
-        return asyncio.run(_publish())
+    return _run_async(_publish())
+
+@celery_app.task(name="refresh_expiring_tokens")
+def refresh_expiring_tokens_task():
+    """Refresh platform tokens that expire soon, ahead of any publish."""
+    from ..oauth.services.token_refresh_service import refresh_expiring_tokens
+
+    stats = _run_async(refresh_expiring_tokens())
+    print(f"🔑 Token refresh: {stats}")
+    return stats
 
 @celery_app.task(name="sync_social_feed")
 def sync_social_feed_task(user_id: int):
     """Sync existing posts from Meta platforms to Content Hub."""
     from ..oauth.models.social import SocialAccount
-    import json
 
     async def _sync():
         from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
@@ -185,8 +200,6 @@ def sync_social_feed_task(user_id: int):
                 await local_engine.dispose()
                 return "No linked accounts found."
 
-            tools = await mcp_client.get_tools()
-            
             total_synced = 0
             for account in accounts:
                 tool_name = {
@@ -197,20 +210,13 @@ def sync_social_feed_task(user_id: int):
                 if not tool_name:
                     continue
 
-                target_tool = next((t for t in tools if t.name == tool_name), None)
-                if not target_tool:
-                    print(f"⚠️ Tool {tool_name} not found")
-                    continue
-
                 print(f"📡 Pulling {account.platform} posts...")
                 try:
-                    tool_result = await target_tool.ainvoke({"user_id": user_id})
-                    
-                    # Tool returns a JSON string usually
-                    if isinstance(tool_result, str):
-                        data = json.loads(tool_result)
-                    else:
-                        data = tool_result
+                    # Insights for every post come back in one batched Graph call
+                    tool_args = {"user_id": user_id, "include_insights": True}
+                    data = await invoke_tool(tool_name, tool_args)
+                    if not data.get("success", True):
+                        print(f"⚠️ {tool_name} failed: {data.get('error')}")
 
                     posts_data = data.get("posts", [])
 
@@ -247,11 +253,65 @@ def sync_social_feed_task(user_id: int):
             await local_engine.dispose()
             return f"Synced {total_synced} new posts for user {user_id}"
 
+    return _run_async(_sync())
+
+
+# ── WhatsApp agent turns (WHATSAPP_AGENT_EXECUTION=celery) ───────────────────
+#
+# Run with a dedicated pool so API replicas and agent workers scale apart:
+#   celery -A app.core.celery_app worker -Q agent_turns -c 8
+#
+# The Postgres pool and the compiled graph are built once per worker process
+# (on the persistent worker loop) instead of once per task.
+
+_worker_graph = None
+_worker_stack = None
+
+
+async def _get_worker_graph():
+    global _worker_graph, _worker_stack
+    if _worker_graph is None:
+        from .services.agent_service import open_agent_graph
+
+        _worker_stack = AsyncExitStack()
+        # One turn at a time per process, so a small pool is enough
+        _worker_graph = await open_agent_graph(_worker_stack, max_pool_size=4)
+    return _worker_graph
+
+
+async def _run_turn(thread: str | dict):
+    from .services import turn_mailbox
+    from dataclasses import replace
+
+    from .services.agent_turn import AgentTurn, _send_turn_task, run_agent_turn
+    from .services.turn_scheduler import coalesce_turns
+
+    if isinstance(thread, dict):
+        # Task sent with a whole turn (before per-thread mailboxes)
+        turn = AgentTurn(**thread)
+        if not await turn_mailbox.push(turn):
+            return {"status": "queued"}
+        thread = turn.thread_id
+
+    # This task is the only one active for the thread (see turn_mailbox), so
+    # turns of one conversation never write the same checkpoint concurrently
+    # and run in the order they arrived.
+    result = {"status": "empty"}
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            return loop.run_until_complete(_sync())
-        else:
-            return asyncio.run(_sync())
-    except RuntimeError:
-        return asyncio.run(_sync())
+        turns = await turn_mailbox.take(thread)
+        if turns:
+            graph = await _get_worker_graph()
+            # No queue redelivery here: failures are reported to the sender
+            result = await run_agent_turn(graph, replace(coalesce_turns(turns), retryable=False))
+    finally:
+        # One batch per task keeps each task within AGENT_TASK_TIME_LIMIT;
+        # whatever arrived meanwhile goes to a follow-up task
+        if await turn_mailbox.release(thread):
+            _send_turn_task(thread)
+    return result
+
+
+@celery_app.task(name="run_agent_turn", time_limit=settings.AGENT_TASK_TIME_LIMIT)
+def run_agent_turn_task(thread: str | dict):
+    """Run the queued WhatsApp agent turns of one thread and reply via WAHA."""
+    return _run_async(_run_turn(thread))
@@ -21,4 +21,19 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     worker_prefetch_multiplier=1, # One task at a time per worker for heavy AI
+    # WhatsApp agent turns get their own queue so they can be scaled apart
+    # from publishing/indexing work:
+    #   celery -A app.core.celery_app worker -Q agent_turns -c 8
+    #   celery -A app.core.celery_app worker -Q celery -c 2
+    task_routes={
+        "run_agent_turn": {"queue": os.getenv("AGENT_TASK_QUEUE", "agent_turns")},
+    },
+    # Periodic jobs; run the scheduler alongside the workers:
+    #   celery -A app.core.celery_app beat
+    beat_schedule={
+        "refresh-expiring-tokens": {
+            "task": "refresh_expiring_tokens",
+            "schedule": float(os.getenv("TOKEN_REFRESH_INTERVAL_SECONDS", 3600)),
+        },
+    },
 )
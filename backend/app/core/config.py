@@ -29,6 +29,15 @@ class Settings(BaseSettings):
     WAHA_API_KEY: Optional[str] = os.getenv("WAHA_API_KEY", None)
     VERIFY_TOKEN : str = os.getenv("VERIFY_TOKEN", "zeeshanaftab")
     WAHA_AUTHENTICATION_REQUIRED: bool = os.getenv("WAHA_AUTHENTICATION_REQUIRED", False)
+    WAHA_MAX_CONNECTIONS: int = int(os.getenv("WAHA_MAX_CONNECTIONS", 50))
+    WAHA_MAX_KEEPALIVE: int = int(os.getenv("WAHA_MAX_KEEPALIVE", 20))
+    # WAHA downloads above the cap for their content type are aborted
+    # mid-stream: images at the largest platform image limit, videos at
+    # WAHA_MEDIA_MAX_VIDEO_BYTES, anything else (documents, audio) at
+    # WAHA_MEDIA_MAX_BYTES
+    WAHA_MEDIA_MAX_IMAGE_BYTES: int = int(os.getenv("WAHA_MEDIA_MAX_IMAGE_BYTES", 10_485_760))
+    WAHA_MEDIA_MAX_VIDEO_BYTES: int = int(os.getenv("WAHA_MEDIA_MAX_VIDEO_BYTES", 104_857_600))
+    WAHA_MEDIA_MAX_BYTES: int = int(os.getenv("WAHA_MEDIA_MAX_BYTES", 104_857_600))
     GOOGLE_API_KEY : str = os.getenv("GOOGLE_API_KEY")
     OPENAI_API_KEY : str = os.getenv("OPENAI_API_KEY")
     # Facebook OAuth - Make optional for now
@@ -48,6 +57,8 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
     AWS_S3_BUCKET_NAME: str = os.getenv("AWS_S3_BUCKET_NAME", "")
+    # Optional S3-compatible endpoint, e.g. http://localhost:9000 for MinIO
+    AWS_S3_ENDPOINT_URL: Optional[str] = os.getenv("AWS_S3_ENDPOINT_URL", None)
     CLOUDINARY_CLOUD_NAME: str = os.getenv("CLOUDINARY_CLOUD_NAME", "")
     CLOUDINARY_API_KEY: str = os.getenv("CLOUDINARY_API_KEY", "")
     CLOUDINARY_API_SECRET: str = os.getenv("CLOUDINARY_API_SECRET", "")
@@ -55,6 +66,97 @@ class Settings(BaseSettings):
     CORS_ORIGINS: list = ["http://localhost:5173", "http://127.0.0.1:5173"]
     
     FACEBOOK_GRAPH_VERSION: str = os.getenv("FACEBOOK_GRAPH_VERSION", "v19.0")
+    # Connection pool size for Graph API calls (per process)
+    GRAPH_MAX_CONNECTIONS: int = int(os.getenv("GRAPH_MAX_CONNECTIONS", 100))
+    # Client-side Graph API rate limits (calls/second per process) before they
+    # are scaled down by the usage Meta reports; burst = rate * BURST_SECONDS
+    GRAPH_RATE_APP_PER_SECOND: float = float(os.getenv("GRAPH_RATE_APP_PER_SECOND", 20))
+    GRAPH_RATE_PAGE_PER_SECOND: float = float(os.getenv("GRAPH_RATE_PAGE_PER_SECOND", 4))
+    GRAPH_RATE_IG_PER_SECOND: float = float(os.getenv("GRAPH_RATE_IG_PER_SECOND", 2))
+    GRAPH_RATE_BURST_SECONDS: float = float(os.getenv("GRAPH_RATE_BURST_SECONDS", 5))
+    # Throttled calls are retried with exponential backoff; calls that would
+    # have to wait longer than MAX_WAIT get the throttle error instead
+    GRAPH_THROTTLE_MAX_RETRIES: int = int(os.getenv("GRAPH_THROTTLE_MAX_RETRIES", 3))
+    GRAPH_THROTTLE_BACKOFF_SECONDS: float = float(os.getenv("GRAPH_THROTTLE_BACKOFF_SECONDS", 5))
+    GRAPH_THROTTLE_MAX_WAIT_SECONDS: float = float(os.getenv("GRAPH_THROTTLE_MAX_WAIT_SECONDS", 120))
+    # How long a user's resolved page id / IG business id stay cached per process
+    IG_CLIENT_CACHE_TTL_SECONDS: int = int(os.getenv("IG_CLIENT_CACHE_TTL_SECONDS", 900))
+    # How long to wait for Instagram to finish processing a media container
+    IG_CONTAINER_TIMEOUT_SECONDS: float = float(os.getenv("IG_CONTAINER_TIMEOUT_SECONDS", 300))
+    # Upper bound on how long decoded platform credentials stay cached per process
+    CREDENTIAL_CACHE_TTL_SECONDS: int = int(os.getenv("CREDENTIAL_CACHE_TTL_SECONDS", 600))
+    # Cached credentials are dropped this long before the stored token expires
+    TOKEN_REFRESH_MARGIN_SECONDS: int = int(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS", 300))
+    # Beat job that refreshes tokens ahead of expiry: how often it runs, how far
+    # ahead it looks, rows per scan batch and concurrent refresh calls
+    TOKEN_REFRESH_INTERVAL_SECONDS: int = int(os.getenv("TOKEN_REFRESH_INTERVAL_SECONDS", 3600))
+    TOKEN_REFRESH_WINDOW_SECONDS: int = int(os.getenv("TOKEN_REFRESH_WINDOW_SECONDS", 7 * 24 * 3600))
+    TOKEN_REFRESH_BATCH_SIZE: int = int(os.getenv("TOKEN_REFRESH_BATCH_SIZE", 100))
+    TOKEN_REFRESH_CONCURRENCY: int = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", 5))
+
+    # WhatsApp webhook ingestion
+    # "inline" runs the agent inside the webhook request, "queue" persists the
+    # event to a Redis stream and lets background consumers drive the agent.
+    WAHA_INGEST_MODE: str = os.getenv("WAHA_INGEST_MODE", "inline")
+    WAHA_QUEUE_STREAM: str = os.getenv("WAHA_QUEUE_STREAM", "waha:events")
+    WAHA_QUEUE_CONCURRENCY: int = int(os.getenv("WAHA_QUEUE_CONCURRENCY", 8))
+    WAHA_QUEUE_MAXLEN: int = int(os.getenv("WAHA_QUEUE_MAXLEN", 100000))
+    # Pending entries idle this long belong to a dead consumer and are taken
+    # over; keep it well above the longest turn (AGENT_TASK_TIME_LIMIT,
+    # IG_CONTAINER_TIMEOUT_SECONDS). Live consumers refresh their claim at 1/3 of it.
+    WAHA_QUEUE_CLAIM_IDLE_MS: int = int(os.getenv("WAHA_QUEUE_CLAIM_IDLE_MS", 600_000))
+    # How often each consumer looks for such entries
+    WAHA_QUEUE_CLAIM_INTERVAL_SECONDS: float = float(os.getenv("WAHA_QUEUE_CLAIM_INTERVAL_SECONDS", 30))
+    # Deliveries of an event failing with a transient error before it is dropped
+    WAHA_QUEUE_MAX_DELIVERIES: int = int(os.getenv("WAHA_QUEUE_MAX_DELIVERIES", 3))
+    # On shutdown, how long consumers wait for the events they hold to finish
+    # before leaving them pending for another replica
+    WAHA_QUEUE_DRAIN_SECONDS: float = float(os.getenv("WAHA_QUEUE_DRAIN_SECONDS", 120))
+    # How long a WAHA message id is remembered for webhook de-duplication
+    WAHA_DEDUP_TTL_SECONDS: int = int(os.getenv("WAHA_DEDUP_TTL_SECONDS", 86400))
+    # Max agent turns running at once across all WhatsApp threads
+    AGENT_MAX_CONCURRENT_TURNS: int = int(os.getenv("AGENT_MAX_CONCURRENT_TURNS", 16))
+    # Where WhatsApp agent turns run: "api" (in the web process) or "celery"
+    # (enqueued to AGENT_TASK_QUEUE and executed by dedicated workers)
+    WHATSAPP_AGENT_EXECUTION: str = os.getenv("WHATSAPP_AGENT_EXECUTION", "api")
+    AGENT_TASK_QUEUE: str = os.getenv("AGENT_TASK_QUEUE", "agent_turns")
+    # Hard cap for one agent turn on a worker (also bounds how long a thread
+    # stays marked busy if its worker dies, see turn_mailbox)
+    AGENT_TASK_TIME_LIMIT: int = int(os.getenv("AGENT_TASK_TIME_LIMIT", 300))
+    # Progress feedback while an agent turn runs: WAHA "typing" presence is
+    # always sent; these control the extra "working on it" / tool messages.
+    WHATSAPP_PROGRESS_MESSAGES: bool = os.getenv("WHATSAPP_PROGRESS_MESSAGES", "true").lower() == "true"
+    WHATSAPP_PROGRESS_DELAY_SECONDS: float = float(os.getenv("WHATSAPP_PROGRESS_DELAY_SECONDS", 3))
+    WHATSAPP_PROGRESS_MIN_INTERVAL_SECONDS: float = float(os.getenv("WHATSAPP_PROGRESS_MIN_INTERVAL_SECONDS", 5))
+    # Warm MCP server sessions kept open per process (0 = open a session per call);
+    # only used with MCP_INPROCESS_TOOLS=false
+    MCP_POOL_SIZE: int = int(os.getenv("MCP_POOL_SIZE", 2))
+    MCP_HEALTHCHECK_INTERVAL: float = float(os.getenv("MCP_HEALTHCHECK_INTERVAL", 30))
+    # Call first-party MCP tools directly in-process instead of over stdio JSON-RPC
+    MCP_INPROCESS_TOOLS: bool = os.getenv("MCP_INPROCESS_TOOLS", "true").lower() == "true"
+    # Agent history compaction: above BUDGET approximate tokens the oldest turns
+    # are summarized until about KEEP tokens of recent turns remain; tool results
+    # from earlier turns are cut to TOOL_RESULT_MAX_CHARS
+    AGENT_HISTORY_TOKEN_BUDGET: int = int(os.getenv("AGENT_HISTORY_TOKEN_BUDGET", 8000))
+    AGENT_HISTORY_KEEP_TOKENS: int = int(os.getenv("AGENT_HISTORY_KEEP_TOKENS", 4000))
+    AGENT_TOOL_RESULT_MAX_CHARS: int = int(os.getenv("AGENT_TOOL_RESULT_MAX_CHARS", 500))
+    AGENT_SUMMARY_MODEL: str = os.getenv("AGENT_SUMMARY_MODEL", "gpt-4o-mini")
+    # OpenAI embeddings: inputs per request, concurrent requests, and how long
+    # an embedding stays in the Redis cache
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", 256))
+    EMBED_CONCURRENCY: int = int(os.getenv("EMBED_CONCURRENCY", 4))
+    EMBED_CACHE_TTL_SECONDS: int = int(os.getenv("EMBED_CACHE_TTL_SECONDS", 30 * 86400))
+    # Semantic cache for /api/ai/generate: min cosine similarity of the topic
+    # embedding for a hit, entry lifetime and entries kept per user
+    GEN_CACHE_SIMILARITY: float = float(os.getenv("GEN_CACHE_SIMILARITY", 0.95))
+    GEN_CACHE_TTL_SECONDS: int = int(os.getenv("GEN_CACHE_TTL_SECONDS", 86400))
+    GEN_CACHE_MAX_ENTRIES: int = int(os.getenv("GEN_CACHE_MAX_ENTRIES", 50))
+    # WhatsApp sender → user resolution cache (Redis TTL, unknown-sender TTL,
+    # and the per-process tier, kept short because it is not invalidated remotely)
+    SENDER_CACHE_TTL_SECONDS: int = int(os.getenv("SENDER_CACHE_TTL_SECONDS", 3600))
+    SENDER_NEGATIVE_TTL_SECONDS: int = int(os.getenv("SENDER_NEGATIVE_TTL_SECONDS", 300))
+    SENDER_LOCAL_TTL_SECONDS: int = int(os.getenv("SENDER_LOCAL_TTL_SECONDS", 30))
+
     class Config:
         env_file = ".env"
         case_sensitive = False
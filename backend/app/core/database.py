@@ -1,7 +1,9 @@
 # app/core/database.py
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy import event
 import os
+import struct
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,6 +25,38 @@ engine = create_async_engine(
     pool_recycle=3600,  # Recycle connections after 1 hour
 )
 
+
+# pgvector binary codec: dim (int16), unused (int16), dim x float4, big-endian.
+# Registered once per pooled asyncpg connection, so vector parameters are
+# plain float lists (no "[...]" strings) and bulk COPY works.
+def encode_vector(vector) -> bytes:
+    values = list(vector)
+    return struct.pack(f">HH{len(values)}f", len(values), 0, *values)
+
+
+def decode_vector(data: bytes) -> list:
+    dim, _ = struct.unpack_from(">HH", data)
+    return list(struct.unpack_from(f">{dim}f", data, 4))
+
+
+async def _register_vector_codec(conn):
+    schema = await conn.fetchval(
+        "SELECT n.nspname FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace "
+        "WHERE t.typname = 'vector'"
+    )
+    if schema:  # extension not installed yet (e.g. before migrations)
+        await conn.set_type_codec(
+            "vector", schema=schema, format="binary",
+            encoder=encode_vector, decoder=decode_vector,
+        )
+
+
+if engine.dialect.driver == "asyncpg":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.run_async(_register_vector_codec)
+
+
 # Use async_sessionmaker instead of sessionmaker for async
 AsyncSessionLocal = async_sessionmaker(
     engine,
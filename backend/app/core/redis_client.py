@@ -0,0 +1,8 @@
+# app/core/redis_client.py
+from redis import asyncio as aioredis
+from app.core.config import settings
+
+# Global Redis Pool (shared by caches, queues and dedup stores)
+redis_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+# Same server, raw bytes in and out (binary payloads such as embeddings)
+redis_binary_client = aioredis.from_url(settings.REDIS_URL, decode_responses=False)
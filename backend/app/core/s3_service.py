@@ -1,39 +1,188 @@
 # app/core/s3_service.py
+import asyncio
 import boto3
+import hashlib
 import uuid
-from botocore.exceptions import ClientError
+from dataclasses import dataclass
+from typing import AsyncIterator
+from botocore.exceptions import BotoCoreError, ClientError
 from botocore.config import Config
 from app.core.config import settings
 
 
+@dataclass
+class StoredObject:
+    url: str
+    key: str
+    sha256: str
+    size: int
+    # True when a content-addressed object already existed and nothing new was written
+    deduplicated: bool = False
+
+
 class S3Service:
     ALLOWED_MIME_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif", "application/pdf", "text/plain"}
     EXT_MAP = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif", "application/pdf": ".pdf", "text/plain": ".txt"}
+    # Multipart part size (S3 minimum is 5 MiB for all but the last part).
+    # Bounds the memory a streamed upload holds at once.
+    PART_SIZE = 8 * 1024 * 1024
 
     def __init__(self):
         self.bucket  = settings.AWS_S3_BUCKET_NAME
         self.region  = settings.AWS_REGION
+        # Optional S3-compatible endpoint (MinIO / moto server) for local runs
+        self.endpoint_url = settings.AWS_S3_ENDPOINT_URL or None
         self.client  = boto3.client(
             "s3",
             region_name=self.region,
+            endpoint_url=self.endpoint_url,
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
             config=Config(signature_version="s3v4"),
         )
 
-    async def upload_image(self, image_bytes: bytes, mime_type: str = "image/jpeg", folder: str = "uploads") -> str | None:
+    def _new_key(self, mime_type: str, folder: str, name: str | None = None) -> str:
         if mime_type not in self.ALLOWED_MIME_TYPES:
             raise ValueError(f"Unsupported MIME type: {mime_type}")
-        key = f"{folder}/{uuid.uuid4().hex}{self.EXT_MAP.get(mime_type, '.jpg')}"
+        return f"{folder}/{name or uuid.uuid4().hex}{self.EXT_MAP.get(mime_type, '.jpg')}"
+
+    async def _exists(self, key: str) -> bool:
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def public_url(self, key: str) -> str:
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+
+    async def upload_image(self, image_bytes: bytes, mime_type: str = "image/jpeg", folder: str = "uploads") -> str | None:
+        key = self._new_key(mime_type, folder)
         try:
-            self.client.put_object(
+            # boto3 is synchronous — keep it off the event loop
+            await asyncio.to_thread(
+                self.client.put_object,
                 Bucket=self.bucket, Key=key, Body=image_bytes,
                 ContentType=mime_type,
             )
-            return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+            return self.public_url(key)
         except ClientError as e:
             print(f"[S3] Upload failed: {e}")
             return None
 
+    async def put_stream(self, chunks: AsyncIterator[bytes], mime_type: str = "image/jpeg", folder: str = "uploads", content_addressed: bool = False) -> StoredObject | None:
+        """
+        Upload an async byte stream without buffering the whole object.
+
+        Small objects (under one part) become a single put_object; larger ones
+        use a multipart upload where the next part is read while the previous
+        one is uploading, so at most two parts are held in memory. Errors raised
+        by the source stream abort the upload and propagate.
+
+        With content_addressed=True the object is stored under its SHA-256
+        (`{folder}/{sha256}{ext}`) and identical content is written only once.
+        Multipart objects are staged under a random key and copied server-side
+        once the digest is known.
+        """
+        key = self._new_key(mime_type, folder)
+        digest = hashlib.sha256()
+        size = 0
+        buffer = bytearray()
+        upload_id = None
+        parts: list[dict] = []
+        in_flight: asyncio.Task | None = None
+        part_number = 0
+
+        async def _upload_part(number: int, body: bytes):
+            resp = await asyncio.to_thread(
+                self.client.upload_part,
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+                PartNumber=number, Body=body,
+            )
+            parts.append({"PartNumber": number, "ETag": resp["ETag"]})
+
+        async def _flush(body: bytes):
+            nonlocal in_flight, part_number
+            if in_flight:
+                await in_flight
+            part_number += 1
+            in_flight = asyncio.create_task(_upload_part(part_number, body))
+
+        try:
+            async for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                buffer.extend(chunk)
+                while len(buffer) >= self.PART_SIZE:
+                    if upload_id is None:
+                        created = await asyncio.to_thread(
+                            self.client.create_multipart_upload,
+                            Bucket=self.bucket, Key=key, ContentType=mime_type,
+                        )
+                        upload_id = created["UploadId"]
+                    body = bytes(buffer[:self.PART_SIZE])
+                    del buffer[:self.PART_SIZE]
+                    await _flush(body)
+
+            sha256 = digest.hexdigest()
+            if upload_id is None:
+                if content_addressed:
+                    key = self._new_key(mime_type, folder, name=sha256)
+                    if await self._exists(key):
+                        return StoredObject(self.public_url(key), key, sha256, size, deduplicated=True)
+                await asyncio.to_thread(
+                    self.client.put_object,
+                    Bucket=self.bucket, Key=key, Body=bytes(buffer),
+                    ContentType=mime_type,
+                )
+            else:
+                if buffer:
+                    await _flush(bytes(buffer))
+                if in_flight:
+                    await in_flight
+                parts.sort(key=lambda p: p["PartNumber"])
+                await asyncio.to_thread(
+                    self.client.complete_multipart_upload,
+                    Bucket=self.bucket, Key=key, UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+                if content_addressed:
+                    final_key = self._new_key(mime_type, folder, name=sha256)
+                    existed = await self._promote(key, final_key)
+                    return StoredObject(self.public_url(final_key), final_key, sha256, size, deduplicated=existed)
+            return StoredObject(self.public_url(key), key, sha256, size)
+        except BaseException as e:
+            if in_flight and not in_flight.done():
+                in_flight.cancel()
+            if upload_id:
+                try:
+                    await asyncio.to_thread(
+                        self.client.abort_multipart_upload,
+                        Bucket=self.bucket, Key=key, UploadId=upload_id,
+                    )
+                except (BotoCoreError, ClientError) as abort_error:
+                    print(f"[S3] Abort multipart failed: {abort_error}")
+            if isinstance(e, (BotoCoreError, ClientError)):
+                print(f"[S3] Streamed upload failed: {e}")
+                return None
+            raise
+
+    async def _promote(self, staging_key: str, final_key: str) -> bool:
+        """
+        Move a staged upload to its content-addressed key (server-side copy).
+        Returns True if the final key already held the content.
+        """
+        existed = await self._exists(final_key)
+        if not existed:
+            await asyncio.to_thread(
+                self.client.copy_object,
+                Bucket=self.bucket, Key=final_key,
+                CopySource={"Bucket": self.bucket, "Key": staging_key},
+            )
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=staging_key)
+        return existed
+
 
-s3_service = S3Service()
\ No newline at end of file
+s3_service = S3Service()
@@ -0,0 +1,139 @@
+# app/core/waha_client.py
+"""
+Shared, pooled HTTP client for all WAHA traffic.
+
+One keep-alive connection pool per process (owned by the FastAPI lifespan,
+created lazily anywhere else) instead of a fresh httpx.AsyncClient — and a
+fresh TCP/TLS handshake — per WAHA call.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+from prometheus_client import Gauge, Histogram
+
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401  (HTTP/2 is only enabled when the extra is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Per-endpoint timeouts (connect stays short so a dead WAHA fails fast)
+ENDPOINT_TIMEOUTS = {
+    "sendText": httpx.Timeout(30, connect=5),
+    "sendFile": httpx.Timeout(45, connect=5),
+    "contacts": httpx.Timeout(10, connect=5),
+    "files":    httpx.Timeout(60, connect=5),
+    "presence": httpx.Timeout(5, connect=2),
+}
+DEFAULT_TIMEOUT = httpx.Timeout(30, connect=5)
+
+waha_request_seconds = Histogram(
+    "waha_request_seconds",
+    "WAHA request latency (time to response headers)",
+    ["endpoint", "status"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+waha_pool_in_flight = Gauge("waha_pool_in_flight", "WAHA requests currently holding a pooled connection")
+waha_pool_utilisation = Gauge("waha_pool_utilisation", "In-flight WAHA requests / max pool connections")
+
+
+class WahaClient:
+    def __init__(self):
+        self.base_url = settings.WAHA_URL or "http://localhost:3000"
+        self.max_connections = settings.WAHA_MAX_CONNECTIONS
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = 0
+
+    @property
+    def auth_headers(self) -> dict:
+        return {"X-Api-Key": settings.WAHA_API_KEY} if settings.WAHA_API_KEY else {}
+
+    def _build(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=HTTP2_AVAILABLE,
+            follow_redirects=True,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=settings.WAHA_MAX_KEEPALIVE,
+                keepalive_expiry=30,
+            ),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Connections are bound to the loop that opened them (Celery runs its
+        # own loops), so a new pool is built if the running loop changed.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = self._build()
+            self._loop = loop
+        return self._client
+
+    async def start(self):
+        _ = self.client
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+    def _track(self, delta: int):
+        self._in_flight += delta
+        waha_pool_in_flight.set(self._in_flight)
+        waha_pool_utilisation.set(self._in_flight / self.max_connections)
+
+    async def request(self, method: str, url: str, *, endpoint: str, headers: Optional[dict] = None, **kwargs) -> httpx.Response:
+        """
+        Send a WAHA request. `url` may be a path ("/api/sendText") or an absolute
+        URL; `headers` defaults to the X-Api-Key auth header.
+        """
+        timeout = kwargs.pop("timeout", ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+        started = time.perf_counter()
+        status = "error"
+        self._track(1)
+        try:
+            resp = await self.client.request(
+                method, url,
+                headers=self.auth_headers if headers is None else headers,
+                timeout=timeout, **kwargs,
+            )
+            status = str(resp.status_code)
+            return resp
+        finally:
+            self._track(-1)
+            waha_request_seconds.labels(endpoint=endpoint, status=status).observe(time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, *, endpoint: str, headers: Optional[dict] = None, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Streaming variant of request(); the connection is held until the block exits."""
+        timeout = kwargs.pop("timeout", ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+        started = time.perf_counter()
+        status = "error"
+        self._track(1)
+        try:
+            async with self.client.stream(
+                method, url,
+                headers=self.auth_headers if headers is None else headers,
+                timeout=timeout, **kwargs,
+            ) as resp:
+                status = str(resp.status_code)
+                waha_request_seconds.labels(endpoint=endpoint, status=status).observe(time.perf_counter() - started)
+                yield resp
+        finally:
+            self._track(-1)
+            if status == "error":
+                waha_request_seconds.labels(endpoint=endpoint, status=status).observe(time.perf_counter() - started)
+
+
+waha_client = WahaClient()
@@ -0,0 +1,145 @@
+# app/mcp/credential_cache.py
+"""
+Per-process cache of decoded platform credentials, keyed by (user_id, platform).
+
+Entries live for at most `max_ttl` seconds and never past the stored token's
+expiry (minus `refresh_margin`), so an entry is dropped before its token goes
+stale and the next lookup goes back to the loader, which refreshes it.
+
+Every process (API, Celery workers, stdio MCP servers) has its own cache, so
+invalidation goes through a per-user version counter in Redis
+(cred_version:{user_id}): invalidate() bumps it and every hit checks it, so
+a re-link or unlink takes effect everywhere on the next lookup. If Redis
+cannot be reached, entries are not trusted and credentials are reloaded.
+
+Lookups are single-flight: concurrent misses for the same key share one
+loader call (one DB read, at most one token refresh). Loader errors are not
+cached; if the loading caller is cancelled, its waiters load again instead of
+inheriting the cancellation.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from cachetools import TTLCache
+from prometheus_client import Counter
+
+credential_cache_total = Counter(
+    "credential_cache_total", "Platform credential lookups", ["result"]  # hit | miss | shared
+)
+
+
+@dataclass(frozen=True)
+class PlatformCredentials:
+    account_id: int
+    access_token: str
+    token_expires_at: Optional[datetime] = None
+    # Decoded `pages` JSON (Facebook)
+    pages: list = field(default_factory=list)
+
+
+Key = tuple[int, str]
+
+
+class CredentialCache:
+    def __init__(self, loader: Callable[[int, str], Awaitable[PlatformCredentials]],
+                 max_ttl: float, refresh_margin: float, maxsize: int = 10_000,
+                 versions=None):
+        self._loader = loader
+        # Async Redis client holding the invalidation counters (None: local only)
+        self._versions = versions
+        self._max_ttl = max_ttl
+        self._refresh_margin = refresh_margin
+        # Bounded by max_ttl/maxsize; each value also carries its own deadline
+        self._entries: TTLCache[Key, tuple[PlatformCredentials, float, Optional[str]]] = TTLCache(
+            maxsize=maxsize, ttl=max_ttl
+        )
+        self._inflight: dict[Key, asyncio.Future] = {}
+
+    def _ttl(self, creds: PlatformCredentials) -> float:
+        if not creds.token_expires_at:
+            return self._max_ttl
+        left = (creds.token_expires_at - datetime.now()).total_seconds() - self._refresh_margin
+        return max(0.0, min(self._max_ttl, left))
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"cred_version:{user_id}"
+
+    async def _version(self, user_id: int) -> Optional[str]:
+        """Current invalidation version of a user; None if it cannot be read."""
+        if self._versions is None:
+            return "0"
+        try:
+            return await self._versions.get(self._version_key(user_id)) or "0"
+        except Exception as e:
+            print(f"⚠️ Credential version lookup failed: {e}")
+            return None
+
+    async def get(self, user_id: int, platform: str) -> PlatformCredentials:
+        key = (user_id, platform)
+        entry = self._entries.get(key)
+        if entry and entry[1] > time.monotonic():
+            version = await self._version(user_id)
+            if version is not None and version == entry[2]:
+                credential_cache_total.labels(result="hit").inc()
+                return entry[0]
+            # Invalidated by another process (or unverifiable)
+            self._entries.pop(key, None)
+
+        loop = asyncio.get_running_loop()
+        pending = self._inflight.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            credential_cache_total.labels(result="shared").inc()
+            await asyncio.wait([pending])
+            if pending.cancelled():
+                return await self.get(user_id, platform)
+            return pending.result()
+
+        credential_cache_total.labels(result="miss").inc()
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            # Read before loading: an invalidation during the load wins
+            version = await self._version(user_id)
+            creds = await self._loader(user_id, platform)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+                future.exception()  # waiters re-raise; silence "never retrieved"
+            raise
+        except BaseException:
+            # Cancelled: free the slot, waiters retry the load themselves
+            future.cancel()
+            raise
+        else:
+            ttl = self._ttl(creds)
+            if ttl > 0 and version is not None:
+                self._entries[key] = (creds, time.monotonic() + ttl, version)
+            future.set_result(creds)
+            return creds
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def invalidate(self, user_id: int, platform: Optional[str] = None):
+        """
+        Drop one platform's entry for a user, or all of them, in this process;
+        every other process drops all of the user's entries on its next lookup.
+        """
+        for key in [k for k in self._entries if k[0] == user_id and (platform is None or k[1] == platform)]:
+            self._entries.pop(key, None)
+        if self._versions is None:
+            return
+        try:
+            async with self._versions.pipeline(transaction=True) as pipe:
+                pipe.incr(self._version_key(user_id))
+                # Older entries have expired everywhere by then
+                pipe.expire(self._version_key(user_id), int(self._max_ttl) + 60)
+                await pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Credential invalidation broadcast failed for user {user_id}: {e}")
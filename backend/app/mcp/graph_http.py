@@ -0,0 +1,164 @@
+# app/mcp/graph_http.py
+"""
+Shared, pooled async HTTP client for the Meta Graph API.
+
+InstagramClient / FacebookClient / facebook_poster all go through one
+keep-alive pool per process (per event loop), so Graph calls never block the
+loop and concurrent tool calls or multi-platform fan-out actually overlap.
+
+Calls are paced by the adaptive rate governor in rate_limit.py and throttled
+calls are retried after a backoff instead of failing straight away.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Optional
+from urllib.parse import urlencode
+
+import httpx
+from prometheus_client import Histogram
+
+from app.core.config import settings
+from app.mcp.rate_limit import THROTTLE_CODES, RateScope, graph_governor
+
+GRAPH_BASE = "https://graph.facebook.com"
+DEFAULT_TIMEOUT = httpx.Timeout(30, connect=5)
+# Graph API limit on sub-requests per batch call
+BATCH_LIMIT = 50
+
+graph_request_seconds = Histogram(
+    "graph_request_seconds",
+    "Meta Graph API request latency",
+    ["method", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_graph_client() -> httpx.AsyncClient:
+    """The process-wide pooled client (rebuilt if the running loop changed)."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=settings.GRAPH_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GRAPH_MAX_CONNECTIONS // 2,
+                keepalive_expiry=30,
+            ),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_graph_client():
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+async def _send(method: str, url: str, **kwargs) -> httpx.Response:
+    started = time.perf_counter()
+    status = "error"
+    try:
+        resp = await get_graph_client().request(method.upper(), url, **kwargs)
+        status = str(resp.status_code)
+        return resp
+    finally:
+        graph_request_seconds.labels(method=method.upper(), status=status).observe(time.perf_counter() - started)
+
+
+def _throttle_code(resp: httpx.Response) -> Optional[int]:
+    if resp.status_code == 200:
+        return None
+    try:
+        code = resp.json().get("error", {}).get("code")
+    except (ValueError, AttributeError):
+        return None
+    return code if code in THROTTLE_CODES else None
+
+
+def _throttled_response(method: str, url: str) -> httpx.Response:
+    return httpx.Response(429, request=httpx.Request(method.upper(), url), json={"error": {
+        "message": "Meta API rate limit reached, please try again later",
+        "type": "OAuthException",
+        "code": 4,
+    }})
+
+
+async def graph_request(method: str, url: str, rate_scope: RateScope = None, cost: int = 1,
+                        **kwargs) -> httpx.Response:
+    """
+    Send a Graph API request through the shared pool.
+
+    `rate_scope` names the page / IG account the call counts against, e.g.
+    ("page", page_id); `cost` is the number of Graph calls it represents.
+    """
+    resp = None
+    attempt = 0
+    while True:
+        wait = graph_governor.reserve(rate_scope, cost)
+        if wait is None:
+            return resp if resp is not None else _throttled_response(method, url)
+        if wait:
+            await asyncio.sleep(wait)
+
+        resp = await _send(method, url, **kwargs)
+        graph_governor.observe(rate_scope, resp.headers)
+        code = _throttle_code(resp)
+        if code is None or attempt >= settings.GRAPH_THROTTLE_MAX_RETRIES:
+            return resp
+        graph_governor.throttled(rate_scope, code, attempt)
+        attempt += 1
+        print(f"⏳ Graph API throttled (code {code}), retry {attempt}/{settings.GRAPH_THROTTLE_MAX_RETRIES}")
+
+
+def batch_get(endpoint: str, params: Optional[dict] = None) -> dict:
+    """A GET sub-request for graph_batch()."""
+    return {"method": "GET", "relative_url": f"{endpoint}?{urlencode(params)}" if params else endpoint}
+
+
+def _decode_batch_item(item: Optional[dict]) -> dict:
+    if item is None:
+        # Graph returns null for sub-requests that did not finish in time
+        return {"error": {"message": "Batch sub-request timed out"}}
+    try:
+        return json.loads(item.get("body") or "{}")
+    except ValueError:
+        return {"error": {"message": item.get("body")}}
+
+
+async def graph_batch(base_url: str, access_token: str, requests: list[dict],
+                      rate_scope: RateScope = None) -> list[dict]:
+    """
+    Run Graph sub-requests through the batch endpoint, BATCH_LIMIT per HTTP
+    call, with the calls themselves sent concurrently. Returns each
+    sub-request's decoded body in order; failures come back as
+    {"error": {...}} like a normal Graph response.
+    """
+    chunks = [requests[i:i + BATCH_LIMIT] for i in range(0, len(requests), BATCH_LIMIT)]
+
+    async def _send_chunk(chunk: list[dict]) -> list[dict]:
+        try:
+            resp = await graph_request("POST", f"{base_url}/", data={
+                "access_token": access_token,
+                "batch": json.dumps(chunk),
+                "include_headers": "false",
+            }, rate_scope=rate_scope, cost=len(chunk))
+            payload = resp.json()
+        except Exception as e:
+            return [{"error": {"message": str(e)}}] * len(chunk)
+        if isinstance(payload, dict):  # the whole batch was rejected
+            return [payload] * len(chunk)
+        return [_decode_batch_item(item) for item in payload]
+
+    results = await asyncio.gather(*(_send_chunk(c) for c in chunks))
+    return [body for chunk in results for body in chunk]
@@ -1,19 +1,26 @@
 # app/mcp/instagram.py
 
-import requests
 from typing import Optional, Dict, Any, List
 import json
+import asyncio
 import sys
 import time
 
+from app.core.config import settings
+
+from app.mcp.graph_http import batch_get, graph_batch, graph_request
+
 class InstagramClient:
     def __init__(self, access_token: str, page_id: Optional[str] = None, api_version: str = "v19.0"):
         self.token = access_token
         self.page_id = page_id
         self.api_version = api_version
         self.base_url = f"https://graph.facebook.com/{self.api_version}"
+        # Rate-limit bucket this client's calls count against (see rate_limit.py);
+        # keyed by the page because each page links exactly one IG account
+        self.rate_scope = ("instagram", self.page_id)
 
-    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, params: Optional[Dict] = None) -> Dict[str, Any]:
+    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, params: Optional[Dict] = None) -> Dict[str, Any]:
         """Make a request to the Facebook Graph API."""
         url = f"{self.base_url}/{endpoint}"
         
@@ -23,12 +30,8 @@ class InstagramClient:
         params["access_token"] = self.token
         
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, params=params, timeout=30)
-            elif method.upper() == "POST":
-                response = requests.post(url, data=data, params=params, timeout=30)
-            else:
-                return {"error": {"message": f"Unsupported method: {method}"}}
+            # Shared async pool — never blocks the event loop
+            response = await graph_request(method, url, data=data, params=params, rate_scope=self.rate_scope)
             
             print(f"[DEBUG] {method} {url} - Status: {response.status_code}", file=sys.stderr)
             
@@ -40,29 +43,33 @@ class InstagramClient:
             print(f"[DEBUG] Request exception: {e}", file=sys.stderr)
             return {"error": {"message": str(e)}}
 
-    def get_instagram_business_account(self) -> Dict[str, Any]:
+    async def batch(self, requests: List[Dict]) -> List[Dict[str, Any]]:
+        """Send several sub-requests in one Graph batch call (see graph_batch)."""
+        return await graph_batch(self.base_url, self.token, requests, rate_scope=self.rate_scope)
+
+    async def get_instagram_business_account(self) -> Dict[str, Any]:
         """Get Instagram Business Account ID from a Facebook Page."""
         if not self.page_id:
             return {"error": "page_id is required"}
         
-        return self._make_request("GET", self.page_id, params={
+        return await self._make_request("GET", self.page_id, params={
             "fields": "instagram_business_account{id,username}"
         })
 
-    def get_profile(self, instagram_id: str) -> Dict[str, Any]:
+    async def get_profile(self, instagram_id: str) -> Dict[str, Any]:
         """Get Instagram profile information."""
-        return self._make_request("GET", instagram_id, params={
+        return await self._make_request("GET", instagram_id, params={
             "fields": "id,username,name,followers_count,media_count,biography,website,profile_picture_url"
         })
 
-    def get_posts(self, instagram_id: str, limit: int = 5) -> Dict[str, Any]:
+    async def get_posts(self, instagram_id: str, limit: int = 5) -> Dict[str, Any]:
         """Get recent Instagram posts."""
-        return self._make_request("GET", f"{instagram_id}/media", params={
+        return await self._make_request("GET", f"{instagram_id}/media", params={
             "fields": "id,caption,media_type,media_url,permalink,timestamp,like_count,comments_count",
             "limit": min(limit, 25)
         })
 
-    def create_image_post(self, instagram_id: str, image_url: str, caption: str = "") -> Dict[str, Any]:
+    async def create_image_post(self, instagram_id: str, image_url: str, caption: str = "") -> Dict[str, Any]:
         """
         Create a single image post.
         
@@ -76,7 +83,7 @@ class InstagramClient:
         print(f"[DEBUG] Creating image post for {instagram_id}", file=sys.stderr)
         
         # Step 1: Create media container
-        container = self._make_request("POST", f"{instagram_id}/media", data={
+        container = await self._make_request("POST", f"{instagram_id}/media", data={
             "image_url": image_url,
             "caption": caption
         })
@@ -88,13 +95,13 @@ class InstagramClient:
         print(f"[DEBUG] Container created: {container_id}", file=sys.stderr)
         
         # Step 2: Publish the container
-        result = self._make_request("POST", f"{instagram_id}/media_publish", data={
+        result = await self._make_request("POST", f"{instagram_id}/media_publish", data={
             "creation_id": container_id
         })
         
         return result
 
-    def create_video_post(self, instagram_id: str, video_url: str, caption: str = "", cover_url: Optional[str] = None) -> Dict[str, Any]:
+    async def create_video_post(self, instagram_id: str, video_url: str, caption: str = "", cover_url: Optional[str] = None) -> Dict[str, Any]:
         """
         Create a video post.
         
@@ -118,7 +125,7 @@ class InstagramClient:
             data["cover_url"] = cover_url
         
         # Step 1: Create media container
-        container = self._make_request("POST", f"{instagram_id}/media", data=data)
+        container = await self._make_request("POST", f"{instagram_id}/media", data=data)
         
         if "error" in container:
             return container
@@ -126,18 +133,20 @@ class InstagramClient:
         container_id = container.get("id")
         print(f"[DEBUG] Video container created: {container_id}", file=sys.stderr)
         
-        # Videos need time to process, so we'll check status
+        # Videos need time to process — publish as soon as Meta reports it ready
         print(f"[DEBUG] Waiting for video processing...", file=sys.stderr)
-        time.sleep(5)  # Brief pause
+        status = await self.wait_for_container(container_id)
+        if "error" in status:
+            return status
         
         # Step 2: Publish the container
-        result = self._make_request("POST", f"{instagram_id}/media_publish", data={
+        result = await self._make_request("POST", f"{instagram_id}/media_publish", data={
             "creation_id": container_id
         })
         
         return result
 
-    def create_carousel_post(self, instagram_id: str, media_urls: List[str], media_types: List[str], caption: str = "") -> Dict[str, Any]:
+    async def create_carousel_post(self, instagram_id: str, media_urls: List[str], media_types: List[str], caption: str = "") -> Dict[str, Any]:
         """
         Create a carousel post with multiple images/videos.
         
@@ -157,12 +166,9 @@ class InstagramClient:
         if len(media_urls) != len(media_types):
             return {"error": {"message": "Number of URLs must match number of types"}}
         
-        # Step 1: Create individual containers for each media item
-        children = []
-        
-        for i, (media_url, media_type) in enumerate(zip(media_urls, media_types)):
-            print(f"[DEBUG] Creating container {i+1} for {media_type}", file=sys.stderr)
-            
+        # Step 1: Create individual containers for each media item (concurrently)
+        items = []
+        for media_url, media_type in zip(media_urls, media_types):
             data = {
                 "media_type": media_type,
                 "is_carousel_item": "true"
@@ -174,17 +180,26 @@ class InstagramClient:
                 data["video_url"] = media_url
             else:
                 return {"error": {"message": f"Invalid media type: {media_type}"}}
-            
-            container = self._make_request("POST", f"{instagram_id}/media", data=data)
-            
+            items.append(data)
+        
+        containers = await asyncio.gather(*(
+            self._make_request("POST", f"{instagram_id}/media", data=data) for data in items
+        ))
+        for container in containers:
             if "error" in container:
                 return container
-            
-            children.append(container.get("id"))
-            print(f"[DEBUG] Container {i+1} created: {children[-1]}", file=sys.stderr)
+        
+        children = [c.get("id") for c in containers]
+        print(f"[DEBUG] Child containers created: {children}", file=sys.stderr)
+        
+        # Children (videos especially) must be FINISHED before the carousel is built
+        statuses = await asyncio.gather(*(self.wait_for_container(c) for c in children))
+        for status in statuses:
+            if "error" in status:
+                return status
         
         # Step 2: Create carousel container
-        carousel = self._make_request("POST", f"{instagram_id}/media", data={
+        carousel = await self._make_request("POST", f"{instagram_id}/media", data={
             "media_type": "CAROUSEL",
             "children": ",".join(children),
             "caption": caption
@@ -196,14 +211,18 @@ class InstagramClient:
         carousel_id = carousel.get("id")
         print(f"[DEBUG] Carousel container created: {carousel_id}", file=sys.stderr)
         
+        status = await self.wait_for_container(carousel_id)
+        if "error" in status:
+            return status
+        
         # Step 3: Publish the carousel
-        result = self._make_request("POST", f"{instagram_id}/media_publish", data={
+        result = await self._make_request("POST", f"{instagram_id}/media_publish", data={
             "creation_id": carousel_id
         })
         
         return result
 
-    def create_story(self, instagram_id: str, media_url: str, media_type: str = "IMAGE") -> Dict[str, Any]:
+    async def create_story(self, instagram_id: str, media_url: str, media_type: str = "IMAGE") -> Dict[str, Any]:
         """
         Create an Instagram story.
         
@@ -226,9 +245,9 @@ class InstagramClient:
             data["video_url"] = media_url
         
         # Stories are created directly, no separate publish step
-        return self._make_request("POST", f"{instagram_id}/media", data=data)
+        return await self._make_request("POST", f"{instagram_id}/media", data=data)
 
-    def create_post_with_location(self, instagram_id: str, image_url: str, location_id: str, caption: str = "") -> Dict[str, Any]:
+    async def create_post_with_location(self, instagram_id: str, image_url: str, location_id: str, caption: str = "") -> Dict[str, Any]:
         """
         Create a post with location tag.
         
@@ -243,7 +262,7 @@ class InstagramClient:
         print(f"[DEBUG] Creating post with location {location_id}", file=sys.stderr)
         
         # Step 1: Create media container with location
-        container = self._make_request("POST", f"{instagram_id}/media", data={
+        container = await self._make_request("POST", f"{instagram_id}/media", data={
             "image_url": image_url,
             "caption": caption,
             "location_id": location_id
@@ -255,13 +274,13 @@ class InstagramClient:
         container_id = container.get("id")
         
         # Step 2: Publish
-        result = self._make_request("POST", f"{instagram_id}/media_publish", data={
+        result = await self._make_request("POST", f"{instagram_id}/media_publish", data={
             "creation_id": container_id
         })
         
         return result
 
-    def get_media_status(self, container_id: str) -> Dict[str, Any]:
+    async def get_media_status(self, container_id: str) -> Dict[str, Any]:
         """
         Check the status of a media container.
         Useful for checking if video processing is complete.
@@ -271,23 +290,53 @@ class InstagramClient:
         
         Returns: Status information
         """
-        return self._make_request("GET", container_id, params={
+        return await self._make_request("GET", container_id, params={
             "fields": "status_code,status"
         })
 
-    def get_comments(self, media_id: str) -> Dict[str, Any]:
+    async def wait_for_container(self, container_id: str, timeout: float = settings.IG_CONTAINER_TIMEOUT_SECONDS,
+                                 initial_delay: float = 1.0, max_delay: float = 15.0) -> Dict[str, Any]:
+        """
+        Poll a media container until Meta reports it FINISHED.
+        
+        Polls with exponential backoff (initial_delay doubling up to max_delay)
+        and gives up after `timeout` seconds.
+        
+        Returns: The last status response, or an error dict on ERROR/EXPIRED/timeout
+        """
+        deadline = time.monotonic() + timeout
+        delay = initial_delay
+        while True:
+            status = await self.get_media_status(container_id)
+            if "error" in status:
+                return status
+            
+            code = status.get("status_code")
+            if code in ("FINISHED", "PUBLISHED"):
+                return status
+            if code in ("ERROR", "EXPIRED"):
+                return {"error": {"message": f"Media container {container_id} {code}: {status.get('status', '')}"}}
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return {"error": {"message": f"Media container {container_id} not ready after {timeout:.0f}s (status: {code})"}}
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
+    async def get_comments(self, media_id: str) -> Dict[str, Any]:
         """Get comments on a specific media post."""
-        return self._make_request("GET", f"{media_id}/comments", params={
+        return await self._make_request("GET", f"{media_id}/comments", params={
             "fields": "text,username,timestamp"
         })
 
-    def reply_to_comment(self, comment_id: str, message: str) -> Dict[str, Any]:
+    async def reply_to_comment(self, comment_id: str, message: str) -> Dict[str, Any]:
         """Reply to a comment."""
-        return self._make_request("POST", f"{comment_id}/replies", data={
+        return await self._make_request("POST", f"{comment_id}/replies", data={
             "message": message
         })
 
-    def get_insights(self, instagram_id: str, metrics: str = "impressions,reach,profile_views", period: str = "day") -> Dict[str, Any]:
+    async def get_insights(self, instagram_id: str, metrics: str = "impressions,reach,profile_views", period: str = "day",
+                           days: int = 30) -> Dict[str, Any]:
         """
         Get account insights.
         
@@ -295,31 +344,60 @@ class InstagramClient:
             instagram_id: Instagram Business Account ID
             metrics: Comma-separated list of metrics
             period: 'day', 'week', 'month', or 'days_28'
+            days: How many days back (Graph allows at most 30)
         
         Returns: Insights data
         """
+        return await self._make_request("GET", f"{instagram_id}/insights", params=self._insights_params(metrics, period, days))
+
+    @staticmethod
+    def _insights_params(metrics: str, period: str, days: int = 30) -> Dict[str, Any]:
         from datetime import datetime, timedelta
         
-        since = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        since = (datetime.now() - timedelta(days=max(1, min(days, 30)))).strftime("%Y-%m-%d")
         until = datetime.now().strftime("%Y-%m-%d")
         
-        return self._make_request("GET", f"{instagram_id}/insights", params={
+        return {
             "metric": metrics,
             "period": period,
             "since": since,
             "until": until
-        })
+        }
 
-    def get_media_insights(self, media_id: str) -> Dict[str, Any]:
+    async def get_media_insights(self, media_id: str) -> Dict[str, Any]:
         """Get insights for a specific media post."""
-        return self._make_request("GET", f"{media_id}/insights", params={
+        return await self._make_request("GET", f"{media_id}/insights", params={
             "metric": "engagement,impressions,reach,saved"
         })
 
-    def get_hashtag_info(self, hashtag_name: str) -> Dict[str, Any]:
+    async def get_media_insights_batch(self, media_ids: List[str], metric: str = "engagement,impressions,reach,saved") -> Dict[str, Dict[str, Any]]:
+        """Insights for many media posts in one round trip (media_id -> insights response)."""
+        results = await self.batch([batch_get(f"{m}/insights", {"metric": metric}) for m in media_ids])
+        return dict(zip(media_ids, results))
+
+    async def get_account_overview(self, instagram_id: str, limit: int = 5, days: int = 30) -> Dict[str, Dict[str, Any]]:
+        """
+        Profile, recent posts, account insights and follower history in one
+        batch call. Each value is the raw Graph response for that part.
+        """
+        parts = {
+            "profile": batch_get(instagram_id, {
+                "fields": "id,username,name,followers_count,follows_count,media_count,biography,website,profile_picture_url"
+            }),
+            "posts": batch_get(f"{instagram_id}/media", {
+                "fields": "id,caption,media_type,media_url,permalink,timestamp,like_count,comments_count",
+                "limit": min(limit, 25)
+            }),
+            "insights": batch_get(f"{instagram_id}/insights", self._insights_params("impressions,reach,profile_views", "day", days)),
+            "followers": batch_get(f"{instagram_id}/insights", self._insights_params("follower_count", "day", days)),
+        }
+        results = await self.batch(list(parts.values()))
+        return dict(zip(parts.keys(), results))
+
+    async def get_hashtag_info(self, hashtag_name: str) -> Dict[str, Any]:
         """Get information about a hashtag."""
         # First, search for the hashtag
-        search_result = self._make_request("GET", "ig_hashtag_search", params={
+        search_result = await self._make_request("GET", "ig_hashtag_search", params={
             "user_id": self.page_id,
             "q": hashtag_name
         })
@@ -332,12 +410,12 @@ class InstagramClient:
             return {"error": {"message": "Hashtag not found"}}
         
         # Get hashtag info
-        return self._make_request("GET", hashtag_id)
+        return await self._make_request("GET", hashtag_id)
 
-    def get_hashtag_media(self, hashtag_name: str, limit: int = 25) -> Dict[str, Any]:
+    async def get_hashtag_media(self, hashtag_name: str, limit: int = 25) -> Dict[str, Any]:
         """Get recent media for a hashtag."""
         # First, search for the hashtag
-        search_result = self._make_request("GET", "ig_hashtag_search", params={
+        search_result = await self._make_request("GET", "ig_hashtag_search", params={
             "user_id": self.page_id,
             "q": hashtag_name
         })
@@ -350,27 +428,27 @@ class InstagramClient:
             return {"error": {"message": "Hashtag not found"}}
         
         # Get recent media
-        return self._make_request("GET", f"{hashtag_id}/recent_media", params={
+        return await self._make_request("GET", f"{hashtag_id}/recent_media", params={
             "user_id": self.page_id,
             "fields": "id,caption,media_type,media_url,permalink,timestamp",
             "limit": min(limit, 25)
         })
 
-    def get_mentions(self, instagram_id: str, limit: int = 25) -> Dict[str, Any]:
+    async def get_mentions(self, instagram_id: str, limit: int = 25) -> Dict[str, Any]:
         """Get recent mentions of the account."""
-        return self._make_request("GET", f"{instagram_id}/mentions", params={
+        return await self._make_request("GET", f"{instagram_id}/mentions", params={
             "fields": "id,media_id,username,text,timestamp",
             "limit": min(limit, 25)
         })
 
-    def get_followed_hashtags(self, instagram_id: str) -> Dict[str, Any]:
+    async def get_followed_hashtags(self, instagram_id: str) -> Dict[str, Any]:
         """Get hashtags followed by the account."""
-        return self._make_request("GET", f"{instagram_id}/followed_hashtags")
+        return await self._make_request("GET", f"{instagram_id}/followed_hashtags")
 
-    def follow_hashtag(self, instagram_id: str, hashtag_name: str) -> Dict[str, Any]:
+    async def follow_hashtag(self, instagram_id: str, hashtag_name: str) -> Dict[str, Any]:
         """Follow a hashtag."""
         # First, get hashtag ID
-        search_result = self._make_request("GET", "ig_hashtag_search", params={
+        search_result = await self._make_request("GET", "ig_hashtag_search", params={
             "user_id": self.page_id,
             "q": hashtag_name
         })
@@ -383,12 +461,12 @@ class InstagramClient:
             return {"error": {"message": "Hashtag not found"}}
         
         # Follow the hashtag
-        return self._make_request("POST", f"{instagram_id}/followed_hashtags", data={
+        return await self._make_request("POST", f"{instagram_id}/followed_hashtags", data={
             "hashtag_id": hashtag_id
         })
 
-    def unfollow_hashtag(self, instagram_id: str, hashtag_id: str) -> Dict[str, Any]:
+    async def unfollow_hashtag(self, instagram_id: str, hashtag_id: str) -> Dict[str, Any]:
         """Unfollow a hashtag by ID."""
-        return self._make_request("DELETE", f"{instagram_id}/followed_hashtags", data={
+        return await self._make_request("DELETE", f"{instagram_id}/followed_hashtags", data={
             "hashtag_id": hashtag_id
         })
\ No newline at end of file
@@ -2,26 +2,49 @@
 
 import json
 from typing import Tuple
+
+from cachetools import TTLCache
+
+from app.core.config import settings
 from app.core.database import AsyncSessionLocal
 from app.mcp.instagram import InstagramClient
+from app.mcp.platform_clients import get_facebook_page_credentials
 from sqlalchemy import select
 from app.oauth.models.social import SocialAccount
 from app.oauth.services.social_account_service import get_active_facebook_account
 
+# user_id -> (page_id, instagram_id). Only the stable ids are kept here; the
+# page token always comes from the credential cache, which the token refresh
+# invalidates. The IG business id is also persisted on the Facebook
+# SocialAccount row, so a cold cache costs one DB read and no Graph call.
+_client_cache: TTLCache = TTLCache(maxsize=10_000, ttl=settings.IG_CLIENT_CACHE_TTL_SECONDS)
+
+
+def invalidate_instagram_client(user_id: int):
+    """Forget the cached page/IG ids for a user (pages reconnected or unlinked)."""
+    _client_cache.pop(user_id, None)
+
 
 async def get_instagram_client(user_id: int) -> Tuple[InstagramClient, str]:
     """Get Instagram client using Facebook page token."""
-    
-  
-    
+    cached = _client_cache.get(user_id)
+    if cached:
+        page_id, instagram_id = cached
+        try:
+            current_page_id, page_token = await get_facebook_page_credentials(user_id)
+        except ValueError:
+            current_page_id = None
+        if current_page_id == page_id:
+            return InstagramClient(access_token=page_token, page_id=page_id, api_version="v19.0"), instagram_id
+        # Page changed (or is gone): resolve from scratch below
+        _client_cache.pop(user_id, None)
+
     async with AsyncSessionLocal() as db:
         # Get Facebook account
-   
         facebook_account = await get_active_facebook_account(db, user_id)
-        
+
         if not facebook_account:
             # Double-check with direct query
-           
             result = await db.execute(
                 select(SocialAccount).where(
                     SocialAccount.user_id == user_id,
@@ -30,73 +53,58 @@ async def get_instagram_client(user_id: int) -> Tuple[InstagramClient, str]:
             )
             facebook_account = result.scalars().first()
             if facebook_account:
-               
                 if not facebook_account.is_active:
                     raise ValueError("Facebook account exists but is inactive. Please reactivate it.")
             else:
                 raise ValueError("No Facebook account found. Please connect your Facebook page first.")
-        
-    
-        
+
         if not facebook_account.pages:
             raise ValueError("Facebook account has no pages data")
-        
+
         # Parse the pages JSON
         try:
-            
             pages = json.loads(facebook_account.pages)
-         
-            
+
             if not pages:
                 raise ValueError("No pages found in Facebook account")
-            
+
             # Get the first page
             page = pages[0]
-            page_name = page.get('name', 'Unknown')
             page_id = page.get('id')
-            
-                                       
-            
+
             # Get the page token (your working token)
             page_token = page.get('access_token')
             if not page_token:
-              
                 page_token = facebook_account.access_token
-            
-           
-            
+
             # Create client with page token
             client = InstagramClient(
                 access_token=page_token,
                 page_id=page_id,
                 api_version="v19.0"
             )
-            
-            # Get Instagram Business Account ID from Facebook
-           
-            ig_info = client.get_instagram_business_account()
-            
-          
-            
-            if "error" in ig_info:
-                error_msg = ig_info["error"].get("message", "Unknown error")
-             
-                raise ValueError(f"Facebook API error: {error_msg}")
-            
-            if "instagram_business_account" not in ig_info:
-              
-                raise ValueError("No Instagram Business Account linked to this page")
-            
-            instagram_data = ig_info["instagram_business_account"]
-            instagram_id = instagram_data.get("id")
-            instagram_username = instagram_data.get("username")
-            
-          
+
+            # Reuse the IG business id resolved on an earlier call
+            instagram_id = facebook_account.instagram_account_id
+            if not instagram_id:
+                # Get Instagram Business Account ID from Facebook
+                ig_info = await client.get_instagram_business_account()
+
+                if "error" in ig_info:
+                    error_msg = ig_info["error"].get("message", "Unknown error")
+                    raise ValueError(f"Facebook API error: {error_msg}")
+
+                if "instagram_business_account" not in ig_info:
+                    raise ValueError("No Instagram Business Account linked to this page")
+
+                instagram_id = ig_info["instagram_business_account"].get("id")
+                facebook_account.instagram_account_id = instagram_id
+                await db.commit()
+
+            _client_cache[user_id] = (page_id, instagram_id)
             return client, instagram_id
-            
+
         except json.JSONDecodeError as e:
-            
             raise ValueError("Failed to parse pages data")
         except Exception as e:
-          
-            raise ValueError(f"Failed to get Instagram client: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Failed to get Instagram client: {str(e)}")
@@ -4,13 +4,22 @@ DB-backed credential helpers for each platform.
 All MCP tools call these instead of accepting credentials as parameters.
 
 Pattern mirrors get_instagram_client() in instagram_client.py.
+
+Lookups go through `credential_cache` (see credential_cache.py); anything
+that changes a SocialAccount's tokens or pages must call
+`await credential_cache.invalidate(user_id, platform)`, which reaches every
+process through Redis.
 """
 import json
+from datetime import datetime, timedelta
+
 from sqlalchemy import select
+from app.core.config import settings
 from app.core.database import AsyncSessionLocal
+from app.core.redis_client import redis_client
+from app.mcp.credential_cache import CredentialCache, PlatformCredentials
 from app.oauth.models.social import SocialAccount
 from app.oauth.services.oauth_service import OAuthService
-from datetime import datetime
 
 oauth_service = OAuthService()
 
@@ -42,7 +51,6 @@ async def _get_account(user_id: int, platform: str) -> SocialAccount:
                     # Update in DB
                     account.access_token = refresh_data['access_token']
                     if 'expires_in' in refresh_data:
-                        from datetime import timedelta
                         account.token_expires_at = datetime.now() + timedelta(seconds=refresh_data['expires_in'])
                     db.add(account)
                     await db.commit()
@@ -54,20 +62,50 @@ async def _get_account(user_id: int, platform: str) -> SocialAccount:
     return account
 
 
+async def _load_credentials(user_id: int, platform: str) -> PlatformCredentials:
+    account = await _get_account(user_id, platform)
+    pages = []
+    if account.pages:
+        try:
+            pages = json.loads(account.pages) or []
+        except json.JSONDecodeError:
+            raise ValueError(f"Failed to parse {platform} pages data. Please reconnect your account.")
+    expires_at = account.token_expires_at
+    if expires_at and expires_at <= datetime.now():
+        # Refresh failed above; don't pin the stale token in the cache
+        expires_at = datetime.now()
+    return PlatformCredentials(
+        account_id=account.id,
+        access_token=account.access_token,
+        token_expires_at=expires_at,
+        pages=pages,
+    )
+
+
+credential_cache = CredentialCache(
+    _load_credentials,
+    max_ttl=settings.CREDENTIAL_CACHE_TTL_SECONDS,
+    refresh_margin=settings.TOKEN_REFRESH_MARGIN_SECONDS,
+    versions=redis_client,
+)
+
+
+async def get_platform_credentials(user_id: int, platform: str) -> PlatformCredentials:
+    """Cached, decoded credentials for a user's active account on a platform."""
+    return await credential_cache.get(user_id, platform)
+
+
 async def get_facebook_page_credentials(user_id: int) -> tuple[str, str]:
     """
     Returns (page_id, page_token) from the stored Facebook SocialAccount.
     Uses the first page in the pages JSON array.
     """
-    account = await _get_account(user_id, "facebook")
-    if not account.pages:
+    creds = await get_platform_credentials(user_id, "facebook")
+    if not creds.pages:
         raise ValueError("Facebook account has no pages. Please reconnect your Facebook account.")
-    pages = json.loads(account.pages)
-    if not pages:
-        raise ValueError("No Facebook pages found.")
-    page = pages[0]
+    page = creds.pages[0]
     page_id    = page.get("id")
-    page_token = page.get("access_token") or account.access_token
+    page_token = page.get("access_token") or creds.access_token
     if not page_id or not page_token:
         raise ValueError("Invalid Facebook page data (missing id or token).")
-    return page_id, page_token
\ No newline at end of file
+    return page_id, page_token
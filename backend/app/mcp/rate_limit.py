@@ -0,0 +1,171 @@
+# app/mcp/rate_limit.py
+"""
+Adaptive client-side rate limiting for the Meta Graph API.
+
+Every Graph call made through graph_http.graph_request() takes a token from
+the app-wide bucket and, when the caller names one, from the bucket of the
+page or Instagram account it acts on. Calls that find a bucket empty are
+delayed (not failed) until it refills.
+
+Bucket rates adapt to what Meta reports back:
+  - X-App-Usage                 -> app bucket
+  - X-Business-Use-Case-Usage   -> page / instagram bucket of the request
+The closer the reported usage gets to 100%, the slower the bucket refills;
+`estimated_time_to_regain_access` and throttle error codes (4, 17, 32, 613,
+80001, 80002) block the bucket outright for a while.
+
+Meta counts every sub-request of a batch call, but a batch larger than a
+bucket's burst only drains that bucket instead of putting it into debt: the
+usage headers of the batch response slow the bucket down if it matters.
+
+State is per process; every process adapts independently from the same
+headers. `graph_rate_headroom{scope}` exposes the remaining quota in percent.
+"""
+from __future__ import annotations
+
+import json
+import time
+from typing import Mapping, Optional
+
+from cachetools import TTLCache
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+
+# Graph error codes that mean "slow down": app (4), user (17), page (32),
+# per-endpoint (613) and business use case limits for pages / IG (80001/80002)
+THROTTLE_CODES = {4, 17, 32, 613, 80001, 80002}
+_APP_CODES = {4}
+
+# Scope of a rate-limited call: ("page", page_id) or ("instagram", key)
+RateScope = Optional[tuple[str, str]]
+
+graph_rate_headroom = Gauge(
+    "graph_rate_headroom", "Remaining Meta API quota (percent) last reported, by scope", ["scope"]
+)
+graph_throttled_total = Counter(
+    "graph_throttled_total", "Graph API calls rejected by Meta rate limits", ["code"]
+)
+
+
+def _usage_pct(entry: Mapping) -> float:
+    return float(max(entry.get(k) or 0 for k in ("call_count", "total_cputime", "total_time")))
+
+
+def _rate_factor(usage: float) -> float:
+    """Full speed below 50% usage, then linearly down to 5% at 100%."""
+    if usage < 50:
+        return 1.0
+    return max(0.05, 1.0 - 0.95 * (usage - 50) / 50)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst_seconds: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = max(1.0, rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        # Last usage Meta reported for this scope, in percent
+        self.usage = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost: float) -> float:
+        """Take `cost` tokens (possibly going into debt); returns seconds to wait."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= min(cost, self.capacity)
+        return max(0.0, -self.tokens / self.rate, self.blocked_until - now)
+
+    def refund(self, cost: float):
+        self.tokens = min(self.capacity, self.tokens + min(cost, self.capacity))
+
+    def adapt(self, usage: float):
+        self._refill(time.monotonic())
+        self.usage = usage
+        self.rate = self.base_rate * _rate_factor(usage)
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class GraphRateGovernor:
+    def __init__(self):
+        burst = settings.GRAPH_RATE_BURST_SECONDS
+        self._rates = {
+            "page": settings.GRAPH_RATE_PAGE_PER_SECOND,
+            "instagram": settings.GRAPH_RATE_IG_PER_SECOND,
+        }
+        self._burst = burst
+        self._app = TokenBucket(settings.GRAPH_RATE_APP_PER_SECOND, burst)
+        # Idle page / IG buckets are dropped after an hour
+        self._buckets: TTLCache = TTLCache(maxsize=10_000, ttl=3600)
+
+    def _bucket(self, scope: RateScope) -> Optional[TokenBucket]:
+        if not scope or not scope[1] or scope[0] not in self._rates:
+            return None
+        bucket = self._buckets.get(scope)
+        if bucket is None:
+            bucket = self._buckets[scope] = TokenBucket(self._rates[scope[0]], self._burst)
+        return bucket
+
+    def _chain(self, scope: RateScope) -> list[TokenBucket]:
+        bucket = self._bucket(scope)
+        return [self._app, bucket] if bucket else [self._app]
+
+    def reserve(self, scope: RateScope, cost: int = 1) -> Optional[float]:
+        """
+        Seconds the caller must wait before sending, or None if that is more
+        than GRAPH_THROTTLE_MAX_WAIT_SECONDS (the reservation is then undone).
+        """
+        chain = self._chain(scope)
+        wait = max(b.reserve(cost) for b in chain)
+        if wait > settings.GRAPH_THROTTLE_MAX_WAIT_SECONDS:
+            for b in chain:
+                b.refund(cost)
+            return None
+        return wait
+
+    def observe(self, scope: RateScope, headers: Mapping[str, str]):
+        """Adapt buckets to the usage headers of a Graph response."""
+        app_usage = headers.get("x-app-usage")
+        if app_usage:
+            try:
+                self._app.adapt(_usage_pct(json.loads(app_usage)))
+            except (ValueError, TypeError, AttributeError):
+                pass
+            else:
+                graph_rate_headroom.labels(scope="app").set(100 - self._app.usage)
+
+        bucket = self._bucket(scope)
+        buc_usage = headers.get("x-business-use-case-usage")
+        if bucket and buc_usage:
+            try:
+                entries = [e for items in json.loads(buc_usage).values() for e in items]
+            except (ValueError, TypeError, AttributeError):
+                entries = []
+            wanted = "pages" if scope[0] == "page" else scope[0]
+            entries = [e for e in entries if e.get("type") == wanted]
+            if entries:
+                bucket.adapt(max(_usage_pct(e) for e in entries))
+                graph_rate_headroom.labels(scope=scope[0]).set(100 - bucket.usage)
+                regain = max(e.get("estimated_time_to_regain_access") or 0 for e in entries)
+                if regain:
+                    bucket.block(regain * 60)  # reported in minutes
+
+    def throttled(self, scope: RateScope, code: int, attempt: int):
+        """Block the throttled scope after Meta rejected a call."""
+        graph_throttled_total.labels(code=str(code)).inc()
+        bucket = None if code in _APP_CODES else self._bucket(scope)
+        backoff = min(
+            settings.GRAPH_THROTTLE_BACKOFF_SECONDS * 2 ** attempt,
+            settings.GRAPH_THROTTLE_MAX_WAIT_SECONDS,
+        )
+        (bucket or self._app).block(backoff)
+
+
+graph_governor = GraphRateGovernor()
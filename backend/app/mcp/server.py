@@ -1,21 +1,21 @@
 # app/mcp/server.py
 import asyncio
 import urllib.parse
-import requests
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Awaitable
 from datetime import datetime, timedelta
 from mcp.server.fastmcp import FastMCP
+from pydantic import validate_call
 
 from app.mcp.instagram_client import get_instagram_client
 from app.mcp.facebook import FacebookClient
+from app.mcp.graph_http import get_graph_client
 from app.mcp.platform_clients import (
     get_facebook_page_credentials,
 )
 from app.core.config import settings
 from app.mcp.services.cloudinary_service import cloudinary_service
 
-from app.platforms.whatsapp_downloader import download_whatsapp_media
-from app.core.s3_service import s3_service
+from app.platforms.media_mirror import mirror_whatsapp_media
 from app.platforms.validators import Platform, validate_for_platform, truncate_caption
 from app.platforms.facebook_poster import post_image_to_facebook as _fb_post
 
@@ -28,21 +28,34 @@ import dateutil.parser
 
 mcp = FastMCP("Easy-Post MCP")
 
+# In-process entry points of the tools below, by tool name (see
+# app/chat/services/tool_dispatch.py). Arguments are validated and coerced
+# against the signature, like FastMCP does for MCP calls.
+local_tools: Dict[str, Callable[..., Awaitable[Any]]] = {}
+
+
+def tool(fn):
+    """Register `fn` as an MCP tool and as a local tool."""
+    local_tools[fn.__name__] = validate_call(fn)
+    return mcp.tool()(fn)
+
 
 # ============================================================================
 # SHARED HELPER
 # ============================================================================
 
 async def _whatsapp_to_s3(media_id: str, user_id: int):
-    """Download WhatsApp media and upload to S3. Returns (s3_url, bytes, mime) or error dict."""
+    """
+    Resolve WhatsApp media to its S3 copy, mirroring it on first use.
+    Returns (s3_url, size_bytes, mime) or error dict.
+    """
     try:
-        image_bytes, mime_type = await download_whatsapp_media(media_id)
+        media = await mirror_whatsapp_media(media_id, user_id)
     except Exception as e:
         return {"success": False, "error": f"WhatsApp download failed: {e}"}
-    s3_url = await s3_service.upload_image(image_bytes, mime_type, folder=f"user_{user_id}/posts")
-    if not s3_url:
+    if not media.url:
         return {"success": False, "error": "S3 upload failed"}
-    return s3_url, image_bytes, mime_type
+    return media.url, media.size, media.mime_type
 
 
 async def _handle_scheduling(user_id: int, platform: str, media_url: str, caption: str, schedule_at: Optional[str]) -> Optional[dict]:
@@ -85,16 +98,63 @@ async def _handle_scheduling(user_id: int, platform: str, media_url: str, captio
         return {"success": False, "error": f"Scheduling failed: {str(e)}"}
 
 
+# ============================================================================
+# RESPONSE SHAPING (shared by the single-call tools and the batch bundles)
+# ============================================================================
+
+def _format_profile(profile: dict) -> dict:
+    return {"username": profile.get("username"), "name": profile.get("name"),
+            "followers": profile.get("followers_count", 0), "following": profile.get("follows_count", 0),
+            "posts": profile.get("media_count", 0), "bio": profile.get("biography", ""),
+            "website": profile.get("website", ""), "profile_picture": profile.get("profile_picture_url")}
+
+
+def _format_posts(result: dict) -> list[dict]:
+    return [{"id": p.get("id"), "caption": p.get("caption", "")[:100], "type": p.get("media_type"),
+             "media_url": p.get("media_url"), "likes": p.get("like_count", 0),
+             "comments": p.get("comments_count", 0), "url": p.get("permalink"), "timestamp": p.get("timestamp")}
+            for p in result.get("data", [])]
+
+
+def _format_account_insights(result: dict) -> dict:
+    insights = {}
+    for metric in result.get("data", []):
+        values = metric.get("values", [])
+        if values:
+            insights[metric.get("name")] = {
+                "total": sum(v.get("value", 0) for v in values),
+                "daily": [{"date": v.get("end_time"), "value": v.get("value")} for v in values]}
+    return insights
+
+
+def _format_media_insights(result: dict) -> dict:
+    return {m.get("name"): m.get("values", [{}])[0].get("value", 0) for m in result.get("data", [])}
+
+
+def _format_follower_growth(result: dict) -> dict:
+    values = result.get("data", [{}])[0].get("values", [])
+    start, end = (values[0].get("value", 0) if values else 0), (values[-1].get("value", 0) if values else 0)
+    change = end - start
+    return {"current_followers": end,
+            "growth": {"change": change, "percentage": round((change / start * 100), 2) if start > 0 else 0,
+                       "daily": [{"date": v.get("end_time"), "followers": v.get("value")} for v in values]}}
+
+
+def _graph_error(result: dict) -> str:
+    error = result.get("error")
+    return error.get("message") if isinstance(error, dict) else str(error)
+
+
 # ============================================================================
 # CONNECTION & PROFILE
 # ============================================================================
 
-@mcp.tool()
+@tool
 async def verify_instagram_connection(user_id: int) -> dict:
     """Verify Instagram connection status."""
     try:
         client, instagram_id = await get_instagram_client(user_id)
-        profile = client.get_profile(instagram_id)
+        profile = await client.get_profile(instagram_id)
         if "error" in profile:
             return {"success": False, "error": profile["error"].get("message")}
         return {"success": True, "message": "✅ Instagram connected",
@@ -104,18 +164,15 @@ async def verify_instagram_connection(user_id: int) -> dict:
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def get_instagram_profile(user_id: int) -> dict:
     """Get Instagram profile information."""
     try:
         client, instagram_id = await get_instagram_client(user_id)
-        profile = client.get_profile(instagram_id)
+        profile = await client.get_profile(instagram_id)
         if "error" in profile:
             return {"success": False, "error": profile["error"].get("message")}
-        return {"success": True, "username": profile.get("username"), "name": profile.get("name"),
-                "followers": profile.get("followers_count", 0), "following": profile.get("follows_count", 0),
-                "posts": profile.get("media_count", 0), "bio": profile.get("biography", ""),
-                "website": profile.get("website", ""), "profile_picture": profile.get("profile_picture_url")}
+        return {"success": True, **_format_profile(profile)}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -124,18 +181,25 @@ async def get_instagram_profile(user_id: int) -> dict:
 # POSTS (read)
 # ============================================================================
 
-@mcp.tool()
-async def get_instagram_posts(user_id: int, limit: int = 5) -> dict:
-    """Get recent Instagram posts."""
+@tool
+async def get_instagram_posts(user_id: int, limit: int = 5, include_insights: bool = False) -> dict:
+    """
+    Get recent Instagram posts.
+
+    Args:
+        include_insights: Also attach each post's insights (one extra batched Graph call for all posts)
+    """
     try:
         client, instagram_id = await get_instagram_client(user_id)
-        result = client.get_posts(instagram_id, limit)
+        result = await client.get_posts(instagram_id, limit)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
-        posts = [{"id": p.get("id"), "caption": p.get("caption", "")[:100], "type": p.get("media_type"),
-                  "media_url": p.get("media_url"), "likes": p.get("like_count", 0),
-                  "comments": p.get("comments_count", 0), "url": p.get("permalink"), "timestamp": p.get("timestamp")}
-                 for p in result.get("data", [])]
+        posts = _format_posts(result)
+        if include_insights and posts:
+            insights = await client.get_media_insights_batch([p["id"] for p in posts])
+            for p in posts:
+                r = insights.get(p["id"], {})
+                p["insights"] = {"error": _graph_error(r)} if "error" in r else _format_media_insights(r)
         return {"success": True, "posts": posts, "count": len(posts)}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -145,54 +209,72 @@ async def get_instagram_posts(user_id: int, limit: int = 5) -> dict:
 # INSIGHTS
 # ============================================================================
 
-@mcp.tool()
+@tool
 async def get_account_insights(user_id: int, days: int = 7) -> dict:
     """Get Instagram account insights for the last X days."""
     try:
         client, instagram_id = await get_instagram_client(user_id)
-        result = client.get_insights(instagram_id, metrics="impressions,reach,profile_views", period="day")
+        result = await client.get_insights(instagram_id, metrics="impressions,reach,profile_views", period="day", days=days)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
-        insights = {}
-        for metric in result.get("data", []):
-            values = metric.get("values", [])
-            if values:
-                insights[metric.get("name")] = {
-                    "total": sum(v.get("value", 0) for v in values),
-                    "daily": [{"date": v.get("end_time"), "value": v.get("value")} for v in values]}
-        return {"success": True, "period": f"Last {days} days", "insights": insights}
+        return {"success": True, "period": f"Last {days} days", "insights": _format_account_insights(result)}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def get_post_insights(user_id: int, media_id: str) -> dict:
     """Get insights for a specific Instagram post."""
     try:
         client, _ = await get_instagram_client(user_id)
-        result = client.get_media_insights(media_id)
+        result = await client.get_media_insights(media_id)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
-        return {"success": True, "media_id": media_id,
-                "insights": {m.get("name"): m.get("values", [{}])[0].get("value", 0) for m in result.get("data", [])}}
+        return {"success": True, "media_id": media_id, "insights": _format_media_insights(result)}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def get_follower_growth(user_id: int, days: int = 7) -> dict:
     """Get follower count growth over time."""
     try:
         client, instagram_id = await get_instagram_client(user_id)
-        result = client.get_insights(instagram_id, metrics="follower_count", period="day")
+        result = await client.get_insights(instagram_id, metrics="follower_count", period="day", days=days)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
-        values = result.get("data", [{}])[0].get("values", [])
-        start, end = (values[0].get("value", 0) if values else 0), (values[-1].get("value", 0) if values else 0)
-        change = end - start
-        return {"success": True, "current_followers": end,
-                "growth": {"change": change, "percentage": round((change / start * 100), 2) if start > 0 else 0,
-                           "daily": [{"date": v.get("end_time"), "followers": v.get("value")} for v in values]}}
+        return {"success": True, **_format_follower_growth(result)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@tool
+async def get_posts_insights(user_id: int, media_ids: list[str]) -> dict:
+    """Get insights for several Instagram posts at once (batched, up to 50 per Graph call)."""
+    try:
+        client, _ = await get_instagram_client(user_id)
+        results = await client.get_media_insights_batch(media_ids)
+        return {"success": True, "insights": {
+            media_id: {"error": _graph_error(r)} if "error" in r else _format_media_insights(r)
+            for media_id, r in results.items()}}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@tool
+async def get_instagram_overview(user_id: int, days: int = 7, limit: int = 5) -> dict:
+    """
+    Profile, recent posts, account insights and follower growth in one call.
+    Prefer this over calling the four tools separately.
+    """
+    try:
+        client, instagram_id = await get_instagram_client(user_id)
+        parts = await client.get_account_overview(instagram_id, limit, days)
+        formatters = {"profile": _format_profile, "posts": _format_posts,
+                      "insights": _format_account_insights, "followers": _format_follower_growth}
+        overview = {name: {"error": _graph_error(r)} if "error" in r else formatters[name](r)
+                    for name, r in parts.items()}
+        return {"success": True, "period": f"Last {days} days", **overview}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -201,7 +283,7 @@ async def get_follower_growth(user_id: int, days: int = 7) -> dict:
 # POST IMAGE — INSTAGRAM
 # ============================================================================
 
-@mcp.tool()
+@tool
 async def post_image_to_instagram(user_id: int, media_id: str, caption: str = "", schedule_at: Optional[str] = None) -> dict:
     """
     Post a WhatsApp image with caption to Instagram (or schedule it).
@@ -215,20 +297,20 @@ async def post_image_to_instagram(user_id: int, media_id: str, caption: str = ""
     result = await _whatsapp_to_s3(media_id, user_id)
     if isinstance(result, dict):
         return result
-    s3_url, image_bytes, mime_type = result
+    s3_url, size_bytes, mime_type = result
 
     # If scheduling requested, handle and return early
     schedule_result = await _handle_scheduling(user_id, "instagram", s3_url, caption, schedule_at)
     if schedule_result:
         return schedule_result
 
-    v = validate_for_platform(Platform.INSTAGRAM, image_bytes, mime_type, caption)
+    v = validate_for_platform(Platform.INSTAGRAM, size_bytes, mime_type, caption)
     if not v.valid:
         return {"success": False, "platform": "instagram", "errors": v.errors}
     cap = truncate_caption(caption, Platform.INSTAGRAM)
     try:
         client, instagram_id = await get_instagram_client(user_id)
-        r = client.create_image_post(instagram_id, s3_url, cap)
+        r = await client.create_image_post(instagram_id, s3_url, cap)
         if "error" in r:
             return {"success": False, "platform": "instagram", "error": r["error"].get("message")}
         return {"success": True, "platform": "instagram", "post_id": r.get("id"), "image_url": s3_url}
@@ -240,39 +322,50 @@ async def post_image_to_instagram(user_id: int, media_id: str, caption: str = ""
 # FACEBOOK TOOLS
 # ============================================================================
 
-@mcp.tool()
+@tool
 async def get_facebook_page_info(user_id: int) -> dict:
     """Get basic information and follower count about the connected Facebook Page."""
     try:
         page_id, page_token = await get_facebook_page_credentials(user_id)
         client = FacebookClient(access_token=page_token, page_id=page_id)
-        result = client.get_page_info()
+        result = await client.get_page_info()
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "page_info": result}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-@mcp.tool()
-async def get_facebook_recent_posts(user_id: int, limit: int = 10) -> dict:
-    """Get recent posts from the Facebook Page feed."""
+@tool
+async def get_facebook_recent_posts(user_id: int, limit: int = 10, include_insights: bool = False) -> dict:
+    """
+    Get recent posts from the Facebook Page feed.
+
+    Args:
+        include_insights: Also attach each post's insights (one extra batched Graph call for all posts)
+    """
     try:
         page_id, page_token = await get_facebook_page_credentials(user_id)
         client = FacebookClient(access_token=page_token, page_id=page_id)
-        result = client.get_recent_posts(limit=limit)
+        result = await client.get_recent_posts(limit=limit)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
-        return {"success": True, "posts": result.get("data", [])}
+        posts = result.get("data", [])
+        if include_insights and posts:
+            insights = await client.get_post_analytics_batch([p["id"] for p in posts])
+            for p in posts:
+                r = insights.get(p["id"], {})
+                p["insights"] = {"error": _graph_error(r)} if "error" in r else _format_media_insights(r)
+        return {"success": True, "posts": posts}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-@mcp.tool()
+@tool
 async def get_facebook_page_analytics(user_id: int, period: str = "day") -> dict:
     """Get analytics (insights) for the Facebook Page."""
     try:
         page_id, page_token = await get_facebook_page_credentials(user_id)
         client = FacebookClient(access_token=page_token, page_id=page_id)
-        result = client.get_page_analytics(period=period)
+        result = await client.get_page_analytics(period=period)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         
@@ -287,20 +380,20 @@ async def get_facebook_page_analytics(user_id: int, period: str = "day") -> dict
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-@mcp.tool()
+@tool
 async def create_facebook_text_post(user_id: int, message: str) -> dict:
     """Create a text-only post on the Facebook Page."""
     try:
         page_id, page_token = await get_facebook_page_credentials(user_id)
         client = FacebookClient(access_token=page_token, page_id=page_id)
-        result = client.create_text_post(message)
+        result = await client.create_text_post(message)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "post_id": result.get("id")}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-@mcp.tool()
+@tool
 async def schedule_facebook_post(user_id: int, message: str, schedule_at: str) -> dict:
     """
     Schedule a text post for a future time on Facebook Page using Celery.
@@ -316,7 +409,7 @@ async def schedule_facebook_post(user_id: int, message: str, schedule_at: str) -
 # POST IMAGE — FACEBOOK
 # ============================================================================
 
-@mcp.tool()
+@tool
 async def post_image_to_facebook(user_id: int, media_id: str, caption: str, schedule_at: Optional[str] = None) -> dict:
     """
     Post a WhatsApp image with caption to the connected Facebook Page (or schedule it).
@@ -330,14 +423,14 @@ async def post_image_to_facebook(user_id: int, media_id: str, caption: str, sche
     result = await _whatsapp_to_s3(media_id, user_id)
     if isinstance(result, dict):
         return result
-    s3_url, image_bytes, mime_type = result
+    s3_url, size_bytes, mime_type = result
 
     # If scheduling requested, handle and return early
     schedule_result = await _handle_scheduling(user_id, "facebook", s3_url, caption, schedule_at)
     if schedule_result:
         return schedule_result
 
-    v = validate_for_platform(Platform.FACEBOOK, image_bytes, mime_type, caption)
+    v = validate_for_platform(Platform.FACEBOOK, size_bytes, mime_type, caption)
     if not v.valid:
         return {"success": False, "platform": "facebook", "errors": v.errors}
     cap = truncate_caption(caption, Platform.FACEBOOK)
@@ -353,7 +446,7 @@ async def post_image_to_facebook(user_id: int, media_id: str, caption: str, sche
 # POST IMAGE — ALL PLATFORMS
 # ============================================================================
 
-@mcp.tool()
+@tool
 async def post_image_to_all_platforms(user_id: int, media_id: str, caption: str, platforms: list[str], schedule_at: Optional[str] = None) -> dict:
     """
     Post a WhatsApp image to Meta platforms in one call (or schedule it).
@@ -369,7 +462,7 @@ async def post_image_to_all_platforms(user_id: int, media_id: str, caption: str,
     result = await _whatsapp_to_s3(media_id, user_id)
     if isinstance(result, dict):
         return {p: result for p in platforms}
-    s3_url, image_bytes, mime_type = result
+    s3_url, size_bytes, mime_type = result
 
     # If scheduling requested, handle and return early
     # For "all platforms", we use "all" as the platform in DB
@@ -378,13 +471,13 @@ async def post_image_to_all_platforms(user_id: int, media_id: str, caption: str,
         return schedule_result
 
     async def _do_instagram():
-        v = validate_for_platform(Platform.INSTAGRAM, image_bytes, mime_type, caption)
+        v = validate_for_platform(Platform.INSTAGRAM, size_bytes, mime_type, caption)
         if not v.valid:
             return {"success": False, "platform": "instagram", "errors": v.errors}
         cap = truncate_caption(caption, Platform.INSTAGRAM)
         try:
             client, ig_id = await get_instagram_client(user_id)
-            r = client.create_image_post(ig_id, s3_url, cap)
+            r = await client.create_image_post(ig_id, s3_url, cap)
             if "error" in r:
                 return {"success": False, "platform": "instagram", "error": r["error"].get("message")}
             return {"success": True, "platform": "instagram", "post_id": r.get("id")}
@@ -392,7 +485,7 @@ async def post_image_to_all_platforms(user_id: int, media_id: str, caption: str,
             return {"success": False, "platform": "instagram", "error": str(e)}
 
     async def _do_facebook():
-        v = validate_for_platform(Platform.FACEBOOK, image_bytes, mime_type, caption)
+        v = validate_for_platform(Platform.FACEBOOK, size_bytes, mime_type, caption)
         if not v.valid:
             return {"success": False, "platform": "facebook", "errors": v.errors}
         cap = truncate_caption(caption, Platform.FACEBOOK)
@@ -407,7 +500,7 @@ async def post_image_to_all_platforms(user_id: int, media_id: str, caption: str,
     platform_results = await asyncio.gather(*[fn_map[p]() for p in valid_platforms])
 
     results = dict(zip(valid_platforms, platform_results))
-    results["_meta"] = {"s3_url": s3_url, "mime_type": mime_type, "size_bytes": len(image_bytes)}
+    results["_meta"] = {"s3_url": s3_url, "mime_type": mime_type, "size_bytes": size_bytes}
     return results
 
 
@@ -415,12 +508,12 @@ async def post_image_to_all_platforms(user_id: int, media_id: str, caption: str,
 # LEGACY / URL-BASED TOOLS
 # ============================================================================
 
-@mcp.tool()
+@tool
 async def create_instagram_post(user_id: int, image_url: str, caption: str = "") -> dict:
     """Create an Instagram post from a direct image URL (not from WhatsApp)."""
     try:
         client, instagram_id = await get_instagram_client(user_id)
-        result = client.create_image_post(instagram_id, image_url, caption)
+        result = await client.create_image_post(instagram_id, image_url, caption)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "message": "✅ Post created", "post_id": result.get("id")}
@@ -428,7 +521,7 @@ async def create_instagram_post(user_id: int, image_url: str, caption: str = "")
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def create_facebook_post(user_id: int, image_url: str, caption: str) -> dict:
     """Create a Facebook Page post from an image URL."""
     try:
@@ -442,12 +535,12 @@ async def create_facebook_post(user_id: int, image_url: str, caption: str) -> di
 
 
 
-@mcp.tool()
+@tool
 async def create_video_post(user_id: int, video_url: str, caption: str = "", cover_url: str = None) -> dict:
     """Create a new Instagram video post."""
     try:
         client, instagram_id = await get_instagram_client(user_id)
-        result = client.create_video_post(instagram_id, video_url, caption, cover_url)
+        result = await client.create_video_post(instagram_id, video_url, caption, cover_url)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "message": "✅ Video post created", "post_id": result.get("id")}
@@ -455,12 +548,12 @@ async def create_video_post(user_id: int, video_url: str, caption: str = "", cov
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def create_carousel_post(user_id: int, media_urls: list, media_types: list, caption: str = "") -> dict:
     """Create a carousel post with multiple images/videos."""
     try:
         client, instagram_id = await get_instagram_client(user_id)
-        result = client.create_carousel_post(instagram_id, media_urls, media_types, caption)
+        result = await client.create_carousel_post(instagram_id, media_urls, media_types, caption)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "message": "✅ Carousel post created", "post_id": result.get("id")}
@@ -468,7 +561,7 @@ async def create_carousel_post(user_id: int, media_urls: list, media_types: list
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def create_text_post(user_id: int, text: str, background_color: str = "white", text_color: str = "black") -> dict:
     """Create a text-only Instagram post using Cloudinary."""
     if not settings.CLOUDINARY_CLOUD_NAME:
@@ -480,14 +573,14 @@ async def create_text_post(user_id: int, text: str, background_color: str = "whi
             f"c_fill,w_1080,h_1080/b_rgb:{background_color.lstrip('#')}/"
             f"l_text:Arial_60:{encoded_text},co_rgb:{text_color.lstrip('#')},g_center/v1/instagram_post"
         )
-        response = requests.get(cloudinary_url, timeout=30)
+        response = await get_graph_client().get(cloudinary_url, timeout=30)
         if response.status_code != 200:
             return {"success": False, "error": "Failed to generate image"}
         image_url = await cloudinary_service.upload_image(response.content, folder=f"user_{user_id}/text_posts")
         if not image_url:
             return {"success": False, "error": "Failed to upload image"}
         client, instagram_id = await get_instagram_client(user_id)
-        result = client.create_image_post(instagram_id, image_url, text)
+        result = await client.create_image_post(instagram_id, image_url, text)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "message": "✅ Text post created", "post_id": result.get("id")}
@@ -495,12 +588,12 @@ async def create_text_post(user_id: int, text: str, background_color: str = "whi
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def get_post_comments(user_id: int, media_id: str) -> dict:
     """Get comments on a specific post."""
     try:
         client, _ = await get_instagram_client(user_id)
-        result = client.get_comments(media_id)
+        result = await client.get_comments(media_id)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "comments": result.get("data", [])}
@@ -508,12 +601,12 @@ async def get_post_comments(user_id: int, media_id: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def reply_to_comment(user_id: int, comment_id: str, message: str) -> dict:
     """Reply to a comment."""
     try:
         client, _ = await get_instagram_client(user_id)
-        result = client.reply_to_comment(comment_id, message)
+        result = await client.reply_to_comment(comment_id, message)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "message": "✅ Reply posted", "reply_id": result.get("id")}
@@ -521,12 +614,12 @@ async def reply_to_comment(user_id: int, comment_id: str, message: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def search_hashtag(user_id: int, hashtag: str) -> dict:
     """Search for a hashtag."""
     try:
         client, _ = await get_instagram_client(user_id)
-        result = client.get_hashtag_info(hashtag)
+        result = await client.get_hashtag_info(hashtag)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "hashtag": result}
@@ -534,12 +627,12 @@ async def search_hashtag(user_id: int, hashtag: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def get_hashtag_media(user_id: int, hashtag: str, limit: int = 25) -> dict:
     """Get recent media for a hashtag."""
     try:
         client, _ = await get_instagram_client(user_id)
-        result = client.get_hashtag_media(hashtag, limit)
+        result = await client.get_hashtag_media(hashtag, limit)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "hashtag": hashtag, "media": result.get("data", [])}
@@ -547,12 +640,12 @@ async def get_hashtag_media(user_id: int, hashtag: str, limit: int = 25) -> dict
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def check_media_status(user_id: int, container_id: str) -> dict:
     """Check the status of a media container."""
     try:
         client, _ = await get_instagram_client(user_id)
-        result = client.get_media_status(container_id)
+        result = await client.get_media_status(container_id)
         if "error" in result:
             return {"success": False, "error": result["error"].get("message")}
         return {"success": True, "container_id": container_id, "status": result.get("status_code", "UNKNOWN")}
@@ -560,7 +653,7 @@ async def check_media_status(user_id: int, container_id: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+@tool
 async def debug_database(user_id: int) -> dict:
     """Check database for troubleshooting."""
     from sqlalchemy import create_engine, text
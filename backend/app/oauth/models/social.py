@@ -14,7 +14,7 @@ class SocialAccount(Base):
     platform_user_id = Column(String(100), nullable=False)
     access_token = Column(Text, nullable=False)
     refresh_token = Column(Text, nullable=True)
-    token_expires_at = Column(DateTime, nullable=True)
+    token_expires_at = Column(DateTime, nullable=True, index=True)
     pages = Column(Text, nullable=True)
     instagram_account_id = Column(String(100), nullable=True)
     scopes = Column(Text, nullable=True)
@@ -10,6 +10,8 @@ from ...auth.services.auth_services import get_current_user
 from ...core.database import get_db
 from ...core.config import settings
 from ...user.models.user import User
+from ...mcp.instagram_client import invalidate_instagram_client
+from ...mcp.platform_clients import credential_cache
 
 from ..models.social import SocialAccount
 from ..services.oauth_service import OAuthService
@@ -124,6 +126,7 @@ async def exchange_facebook_code(
         account = await social_service.create_social_account(
             db, current_user.id, token_data, "facebook"
         )
+        await credential_cache.invalidate(current_user.id, "facebook")
 
         return {
             "success": True,
@@ -195,6 +198,7 @@ async def oauth_callback(
         account = await social_service.create_social_account(
             db, user_id, token_data, actual_platform
         )
+        await credential_cache.invalidate(user_id, actual_platform)
 
         print(f"✅ Account saved with ID: {account.id}")
 
@@ -271,5 +275,7 @@ async def unlink_account(
 
     await db.delete(account)
     await db.commit()
+    invalidate_instagram_client(current_user.id)
+    await credential_cache.invalidate(current_user.id, platform)
 
     return {"message": f"{platform} account unlinked successfully"}
\ No newline at end of file
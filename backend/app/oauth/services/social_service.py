@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from datetime import datetime, timedelta
 from  ..models.social import SocialAccount
+from ...mcp.instagram_client import invalidate_instagram_client
 
 class SocialAccountService:
 
@@ -56,10 +57,14 @@ class SocialAccountService:
 
             if platform == 'instagram':
                 existing.instagram_account_id = data.get('instagram_account_id')
+            elif platform == 'facebook':
+                # Pages may have changed; the IG business id is re-resolved on next use
+                existing.instagram_account_id = None
 
             existing.updated_at = datetime.now()
             await db.commit()
             await db.refresh(existing)
+            invalidate_instagram_client(user_id)
             return existing
 
         # Create new account
@@ -0,0 +1,117 @@
+# app/oauth/services/token_refresh_service.py
+"""
+Proactive refresh of platform tokens that are about to expire.
+
+Run periodically by the `refresh_expiring_tokens` beat task. Scans
+social_accounts in token_expires_at order (ix_social_accounts_token_expires_at)
+and refreshes every active token expiring within the window, a batch at a
+time with bounded concurrency, so publishing never has to refresh inline.
+The lazy refresh in platform_clients._get_account stays as a fallback.
+Tokens that have already expired cannot be exchanged any more and are skipped
+(the user has to reconnect the account), so they are not retried every run.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from prometheus_client import Counter
+from sqlalchemy import select, update, and_, or_
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.oauth.models.social import SocialAccount
+from app.oauth.services.oauth_service import OAuthService
+
+oauth_service = OAuthService()
+
+# Platforms whose tokens go through the fb_exchange_token flow
+REFRESHABLE_PLATFORMS = ("facebook", "instagram")
+
+token_refresh_total = Counter(
+    "token_refresh_total", "Proactive platform token refreshes", ["platform", "result"]
+)
+
+
+async def _refresh_one(account_id: int, user_id: int, platform: str, token: str) -> bool:
+    from app.mcp.platform_clients import credential_cache
+
+    try:
+        data = await oauth_service.refresh_facebook_token(token)
+    except Exception as e:
+        print(f"[!] Token refresh failed for account {account_id} ({platform}): {e}")
+        token_refresh_total.labels(platform=platform, result="error").inc()
+        return False
+
+    # Graph omits expires_in for tokens that do not expire
+    expires_at = (
+        datetime.now() + timedelta(seconds=int(data["expires_in"])) if data.get("expires_in") else None
+    )
+    async with AsyncSessionLocal() as db:
+        # Only overwrite the token we refreshed; a reconnect in the meantime wins
+        result = await db.execute(
+            update(SocialAccount)
+            .where(SocialAccount.id == account_id, SocialAccount.access_token == token)
+            .values(access_token=data["access_token"], token_expires_at=expires_at)
+        )
+        await db.commit()
+    await credential_cache.invalidate(user_id, platform)
+    token_refresh_total.labels(
+        platform=platform, result="refreshed" if result.rowcount else "superseded"
+    ).inc()
+    return bool(result.rowcount)
+
+
+async def refresh_expiring_tokens(
+    window_seconds: int = settings.TOKEN_REFRESH_WINDOW_SECONDS,
+    batch_size: int = settings.TOKEN_REFRESH_BATCH_SIZE,
+    concurrency: int = settings.TOKEN_REFRESH_CONCURRENCY,
+) -> dict:
+    """Refresh all active, still valid tokens expiring within `window_seconds`."""
+    now = datetime.now()
+    cutoff = now + timedelta(seconds=window_seconds)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    stats = {"scanned": 0, "refreshed": 0, "unchanged": 0}
+
+    async def _bounded(row) -> bool:
+        async with semaphore:
+            return await _refresh_one(row.id, row.user_id, row.platform, row.access_token)
+
+    # Keyset pagination on (token_expires_at, id) so refreshed rows, which
+    # move past the cutoff, never shift the next page
+    last = None
+    while True:
+        stmt = (
+            select(
+                SocialAccount.id,
+                SocialAccount.user_id,
+                SocialAccount.platform,
+                SocialAccount.access_token,
+                SocialAccount.token_expires_at,
+            )
+            .where(
+                SocialAccount.token_expires_at > now,
+                SocialAccount.token_expires_at <= cutoff,
+                SocialAccount.is_active == True,
+                SocialAccount.platform.in_(REFRESHABLE_PLATFORMS),
+            )
+            .order_by(SocialAccount.token_expires_at, SocialAccount.id)
+            .limit(batch_size)
+        )
+        if last is not None:
+            stmt = stmt.where(or_(
+                SocialAccount.token_expires_at > last[0],
+                and_(SocialAccount.token_expires_at == last[0], SocialAccount.id > last[1]),
+            ))
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(stmt)).all()
+        if not rows:
+            break
+
+        results = await asyncio.gather(*(_bounded(row) for row in rows))
+        stats["scanned"] += len(rows)
+        stats["refreshed"] += sum(results)
+        stats["unchanged"] += len(results) - sum(results)
+        last = (rows[-1].token_expires_at, rows[-1].id)
+        if len(rows) < batch_size:
+            break
+
+    return stats
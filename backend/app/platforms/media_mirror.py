@@ -0,0 +1,140 @@
+# app/platforms/media_mirror.py
+"""
+Streaming, content-addressed WhatsApp → S3 mirroring.
+
+The WAHA response body is piped straight into S3Service.put_stream, so a
+transfer holds at most a couple of multipart parts in memory and never blocks
+the event loop on boto3.
+
+Objects are stored per user under their SHA-256 (`user_{id}/media/{sha256}.ext`)
+and indexed in Redis:
+
+    media:id:{user_id}:{media_id}   -> sha256
+    media:obj:{user_id}:{sha256}    -> {"url", "mime", "size"}
+
+so the webhook mirror and every later posting tool that receives the same
+media id resolve it with one Redis lookup instead of a download and upload.
+Redis is an accelerator only: when it is unavailable the media is streamed
+again and lands on the same S3 key.
+"""
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from prometheus_client import Counter
+
+from app.core.redis_client import redis_client
+from app.core.s3_service import s3_service
+from app.platforms.whatsapp_downloader import (
+    MediaTooLargeError,
+    UnsupportedMediaError,
+    media_size_cap,
+    open_whatsapp_media,
+)
+
+# WAHA media ids are only re-sent for a few days; keep the index a bit longer
+MEDIA_INDEX_TTL = 30 * 24 * 3600
+
+media_mirror_total = Counter(
+    "media_mirror_total",
+    "WhatsApp media mirror requests by outcome",
+    ["result"],  # index_hit | uploaded | deduplicated
+)
+
+
+@dataclass
+class MirroredMedia:
+    url: Optional[str]
+    mime_type: str
+    size: int
+    sha256: Optional[str] = None
+
+
+def media_folder(user_id: int) -> str:
+    return f"user_{user_id}/media"
+
+
+def _id_key(user_id: int, media_id: str) -> str:
+    return f"media:id:{user_id}:{media_id}"
+
+
+def _obj_key(user_id: int, sha256: str) -> str:
+    return f"media:obj:{user_id}:{sha256}"
+
+
+async def _lookup(user_id: int, media_id: str) -> Optional[MirroredMedia]:
+    try:
+        sha256 = await redis_client.get(_id_key(user_id, media_id))
+        if not sha256:
+            return None
+        raw = await redis_client.get(_obj_key(user_id, sha256))
+    except Exception as e:
+        print(f"⚠️ Media index lookup failed: {e}")
+        return None
+    if not raw:
+        return None
+    obj = json.loads(raw)
+    return MirroredMedia(obj["url"], obj["mime"], obj["size"], sha256)
+
+
+async def _remember(user_id: int, media_id: str, media: MirroredMedia):
+    try:
+        pipe = redis_client.pipeline()
+        pipe.set(_id_key(user_id, media_id), media.sha256, ex=MEDIA_INDEX_TTL)
+        pipe.set(
+            _obj_key(user_id, media.sha256),
+            json.dumps({"url": media.url, "mime": media.mime_type, "size": media.size}),
+            ex=MEDIA_INDEX_TTL,
+        )
+        await pipe.execute()
+    except Exception as e:
+        print(f"⚠️ Media index write failed: {e}")
+
+
+async def mirror_whatsapp_media(media_id: str, user_id: int, max_bytes: Optional[int] = None) -> MirroredMedia:
+    """
+    Return the S3 copy of a WAHA media file, uploading it on first sight.
+    `url` is None when the S3 upload failed. Downloads are capped at
+    `max_bytes` (default: the cap for the content type, see media_size_cap).
+    Raises UnsupportedMediaError for content types S3Service does not store.
+    """
+    cached = await _lookup(user_id, media_id)
+    if cached:
+        media_mirror_total.labels(result="index_hit").inc()
+        print(f"♻️ Media already mirrored: {cached.url}")
+        return cached
+
+    async with open_whatsapp_media(media_id) as resp:
+        mime_type = resp.headers.get("content-type", "image/jpeg").split(";")[0].strip()
+        # Checked before any byte is read, so nothing is downloaded for it
+        if mime_type not in s3_service.ALLOWED_MIME_TYPES:
+            raise UnsupportedMediaError(f"Unsupported media type: {mime_type}")
+        if max_bytes is None:
+            max_bytes = media_size_cap(mime_type)
+
+        declared = int(resp.headers.get("content-length") or 0)
+        if max_bytes and declared > max_bytes:
+            raise MediaTooLargeError(f"Media is {declared // 1024}KB (max {max_bytes // 1024}KB)")
+
+        size = 0
+
+        async def _chunks():
+            nonlocal size
+            async for chunk in resp.aiter_bytes():
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise MediaTooLargeError(f"Media exceeds {max_bytes // 1024}KB")
+                yield chunk
+
+        stored = await s3_service.put_stream(
+            _chunks(), mime_type, folder=media_folder(user_id), content_addressed=True
+        )
+
+    if not stored:
+        return MirroredMedia(None, mime_type, size)
+
+    media = MirroredMedia(stored.url, mime_type, stored.size, stored.sha256)
+    await _remember(user_id, media_id, media)
+    media_mirror_total.labels(result="deduplicated" if stored.deduplicated else "uploaded").inc()
+    print(f"✅ Streamed {stored.size} bytes to S3 | MIME: {mime_type} | sha256: {stored.sha256[:12]}")
+    return media
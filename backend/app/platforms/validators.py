@@ -28,13 +28,13 @@ class ValidationResult:
     errors: list[str]
 
 
-def validate_for_platform(platform: Platform, image_bytes: bytes, mime_type: str, caption: str) -> ValidationResult:
+def validate_for_platform(platform: Platform, size_bytes: int, mime_type: str, caption: str) -> ValidationResult:
     lim = LIMITS[platform]
     errors = []
     if mime_type not in lim.allowed_mime_types:
         errors.append(f"{platform.value} does not support {mime_type}. Allowed: {lim.allowed_mime_types}")
-    if len(image_bytes) > lim.max_size_bytes:
-        errors.append(f"Image too large for {platform.value}: {len(image_bytes)//1024}KB (max {lim.max_size_bytes//1024}KB)")
+    if size_bytes > lim.max_size_bytes:
+        errors.append(f"Image too large for {platform.value}: {size_bytes//1024}KB (max {lim.max_size_bytes//1024}KB)")
     if len(caption) > lim.caption_max_length:
         errors.append(f"Caption too long for {platform.value}: {len(caption)} chars (max {lim.caption_max_length})")
     return ValidationResult(valid=not errors, errors=errors)
@@ -1,69 +1,93 @@
 # app/platforms/whatsapp_downloader.py
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
 import httpx
+
 from app.core.config import settings
+from app.core.waha_client import waha_client
 
 WAHA_URL = settings.WAHA_URL or "http://localhost:3000"
 
-async def download_whatsapp_media(media_id: str) -> tuple[bytes, str]:
-    """
-    Download media from WAHA Node with authentication.
-    Tries multiple authentication methods.
-    """
-    # Construct URL
+# Auth scheme the configured WAHA instance accepted last time. Learned on the
+# first download and only re-probed when WAHA answers 401 with it.
+_preferred_auth: Optional[str] = None
+
+
+class MediaTooLargeError(ValueError):
+    """Raised when a WAHA media file exceeds the configured download cap."""
+
+
+class UnsupportedMediaError(ValueError):
+    """Raised when a WAHA media file has a content type we cannot store."""
+
+
+def media_size_cap(mime_type: str) -> int:
+    """Download cap (bytes) for a WAHA media file of this content type."""
+    kind = mime_type.split("/", 1)[0]
+    if kind == "image":
+        return settings.WAHA_MEDIA_MAX_IMAGE_BYTES
+    if kind == "video":
+        return settings.WAHA_MEDIA_MAX_VIDEO_BYTES
+    return settings.WAHA_MEDIA_MAX_BYTES
+
+
+def _media_url(media_id: str) -> str:
     if media_id and media_id.startswith("http"):
-        url = media_id
-    elif not media_id:
+        return media_id
+    if not media_id:
         raise ValueError("media_id or URL must be provided to download media")
-    else:
-        url = f"{WAHA_URL}/api/files/{media_id}"
+    return f"{WAHA_URL}/api/files/{media_id}"
 
-    print(f"📥 Downloading media from: {url}")
-    
-    # ── Try different authentication methods ──────────────────────────────
-    auth_methods = []
-    
-    # Method 1: X-Api-Key header (most common)
+
+def _auth_methods() -> list[tuple[str, dict]]:
+    """Candidate auth schemes, the learned one first."""
+    methods = []
     if settings.WAHA_API_KEY:
-        auth_methods.append({
-            "name": "X-Api-Key",
-            "headers": {"X-Api-Key": settings.WAHA_API_KEY}
-        })
-        
+        # Method 1: X-Api-Key header (most common)
+        methods.append(("X-Api-Key", {"X-Api-Key": settings.WAHA_API_KEY}))
         # Method 2: Authorization Bearer
-        auth_methods.append({
-            "name": "Bearer Token",
-            "headers": {"Authorization": f"Bearer {settings.WAHA_API_KEY}"}
-        })
-    
+        methods.append(("Bearer Token", {"Authorization": f"Bearer {settings.WAHA_API_KEY}"}))
     # Method 3: No authentication (fallback)
-    auth_methods.append({
-        "name": "No Auth",
-        "headers": {}
-    })
-    
+    methods.append(("No Auth", {}))
+
+    if _preferred_auth:
+        methods.sort(key=lambda m: m[0] != _preferred_auth)
+    return methods
+
+
+@asynccontextmanager
+async def open_whatsapp_media(media_id: str) -> AsyncIterator[httpx.Response]:
+    """
+    Open a streaming download of a WAHA media file.
+    Yields the 200 response with the body not yet read.
+    """
+    global _preferred_auth
+    url = _media_url(media_id)
+    print(f"📥 Downloading media from: {url}")
+
     last_error = None
-    
-    for method in auth_methods:
-        try:
-            print(f"🔑 Trying auth: {method['name']}")
-            async with httpx.AsyncClient(follow_redirects=True, timeout=60) as client:
-                resp = await client.get(url, headers=method["headers"])
-                
-                if resp.status_code == 200:
-                    content = resp.content
-                    mime_type = resp.headers.get("content-type", "image/jpeg")
-                    print(f"✅ Downloaded {len(content)} bytes using {method['name']}")
-                    print(f"   MIME: {mime_type}")
-                    return content, mime_type
-                elif resp.status_code == 401:
-                    print(f"⚠️ Auth method '{method['name']}' failed with 401")
-                    last_error = f"Authentication failed with {method['name']}"
-                else:
-                    print(f"⚠️ Auth method '{method['name']}' failed with {resp.status_code}")
-                    last_error = f"HTTP {resp.status_code}: {resp.text[:100]}"
-        except Exception as e:
-            print(f"⚠️ Auth method '{method['name']}' error: {e}")
-            last_error = str(e)
-    
+    for name, headers in _auth_methods():
+        async with waha_client.stream("GET", url, endpoint="files", headers=headers) as resp:
+            if resp.status_code == 200:
+                if _preferred_auth != name:
+                    print(f"🔑 WAHA media auth learned: {name}")
+                    _preferred_auth = name
+                yield resp
+                return
+
+            detail = (await resp.aread())[:100].decode(errors="replace")
+            if resp.status_code == 401:
+                print(f"⚠️ Auth method '{name}' failed with 401")
+                last_error = f"Authentication failed with {name}"
+                if name == _preferred_auth:
+                    # Credentials changed on the WAHA side — forget and re-probe
+                    _preferred_auth = None
+                continue
+
+            # Anything but 401 is not an auth problem; other schemes won't help
+            raise Exception(f"WhatsApp download error: HTTP {resp.status_code}: {detail}")
+
     # If we get here, all methods failed
-    raise Exception(f"WhatsApp download error: All authentication methods failed. Last error: {last_error}")
\ No newline at end of file
+    raise Exception(f"WhatsApp download error: All authentication methods failed. Last error: {last_error}")
+
@@ -0,0 +1,150 @@
+# app/user/services/sender_cache.py
+"""
+Two-tier cache for WhatsApp sender → user resolution.
+
+Every inbound WAHA message used to cost a Postgres lookup, and unknown LIDs
+also paid for a payload walk and a WAHA contacts call. Resolutions are now
+cached per identifier (phone number or LID):
+
+  - an in-process TTLCache (short TTL, it is not invalidated across replicas)
+  - Redis `wa_sender:{identifier}`, shared and invalidated explicitly by
+    user_service whenever a number, LID or profile field changes
+
+Unknown senders are cached too (negative entries) with a shorter TTL. Negative
+entries carry a generation number that is bumped whenever a number is
+registered or changed, so a freshly registered user is never locked out by a
+stale "unknown" entry.
+"""
+import json
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from cachetools import TTLCache
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+GENERATION_KEY = "wa_sender:gen"
+
+sender_cache_total = Counter(
+    "sender_cache_total",
+    "WhatsApp sender resolution cache lookups",
+    ["layer", "result"],  # layer: local | redis | miss; result: user | unknown | none
+)
+
+
+@dataclass
+class SenderIdentity:
+    """Snapshot of the User fields message handling needs."""
+    id: int
+    whatsapp_number: str
+    verification_status: Optional[str]
+    niche: Optional[str]
+    ai_tone: Optional[str]
+    # Identifier the sender resolved to (the real number for LIDs)
+    sender: str
+
+    @classmethod
+    def from_user(cls, user, sender: str) -> "SenderIdentity":
+        return cls(
+            id=user.id,
+            whatsapp_number=user.whatsapp_number,
+            verification_status=user.verification_status,
+            niche=user.niche,
+            ai_tone=user.ai_tone,
+            sender=sender,
+        )
+
+
+_local: TTLCache = TTLCache(maxsize=10_000, ttl=settings.SENDER_LOCAL_TTL_SECONDS)
+
+
+def _key(identifier: str) -> str:
+    return f"wa_sender:{identifier}"
+
+
+def _decode(entry: dict, generation: int) -> tuple[bool, Optional[SenderIdentity]]:
+    if entry.get("unknown"):
+        return entry.get("gen") == generation, None
+    return True, SenderIdentity(**entry)
+
+
+async def get_sender(identifier: str) -> tuple[bool, Optional[SenderIdentity]]:
+    """
+    Returns (hit, identity). A hit with identity None means the sender is
+    known to be unregistered.
+    """
+    local = _local.get(identifier)
+    if local is not None and not local.get("unknown"):
+        sender_cache_total.labels(layer="local", result="user").inc()
+        return True, SenderIdentity(**local)
+
+    try:
+        raw, generation = await redis_client.mget(_key(identifier), GENERATION_KEY)
+    except Exception as e:
+        print(f"⚠️ Sender cache unavailable: {e}")
+        if local is not None:
+            sender_cache_total.labels(layer="local", result="unknown").inc()
+            return True, None
+        return False, None
+
+    generation = int(generation or 0)
+    if local is not None:
+        hit, _ = _decode(local, generation)
+        if hit:
+            sender_cache_total.labels(layer="local", result="unknown").inc()
+            return True, None
+        _local.pop(identifier, None)
+
+    if raw:
+        entry = json.loads(raw)
+        hit, identity = _decode(entry, generation)
+        if hit:
+            _local[identifier] = entry
+            sender_cache_total.labels(layer="redis", result="user" if identity else "unknown").inc()
+            return True, identity
+
+    sender_cache_total.labels(layer="miss", result="none").inc()
+    return False, None
+
+
+async def set_sender(identifier: str, identity: Optional[SenderIdentity]):
+    """Cache a resolution; `None` records an unknown sender."""
+    try:
+        if identity:
+            entry = asdict(identity)
+            ttl = settings.SENDER_CACHE_TTL_SECONDS
+        else:
+            generation = await redis_client.get(GENERATION_KEY)
+            entry = {"unknown": True, "gen": int(generation or 0)}
+            ttl = settings.SENDER_NEGATIVE_TTL_SECONDS
+        await redis_client.set(_key(identifier), json.dumps(entry), ex=ttl)
+    except Exception as e:
+        print(f"⚠️ Sender cache write failed: {e}")
+        return
+    _local[identifier] = entry
+
+
+async def invalidate_senders(*identifiers: Optional[str]):
+    """Drop cached resolutions for the given numbers / LIDs (None is ignored)."""
+    keys = [i for i in identifiers if i]
+    for identifier in keys:
+        _local.pop(identifier, None)
+    if not keys:
+        return
+    try:
+        await redis_client.delete(*(_key(i) for i in keys))
+    except Exception as e:
+        print(f"⚠️ Sender cache invalidation failed: {e}")
+
+
+async def invalidate_unknown_senders():
+    """Expire every negative entry (a number was registered or changed)."""
+    for identifier, entry in list(_local.items()):
+        if entry.get("unknown"):
+            _local.pop(identifier, None)
+    try:
+        await redis_client.incr(GENERATION_KEY)
+    except Exception as e:
+        print(f"⚠️ Sender cache invalidation failed: {e}")
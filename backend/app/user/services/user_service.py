@@ -5,6 +5,7 @@ from ...auth.utils.auth_utils import get_password_hash
 from ...user.models.user import User
 from ...user.schemas.user import UserCreate
 from ...chat.services.whatsapp_service import send_verification_message
+from .sender_cache import invalidate_senders, invalidate_unknown_senders
 from sqlalchemy import select, or_
 
 
@@ -42,11 +43,13 @@ async def get_user_by_number_or_lid(db: AsyncSession, identifier: str):
 
 async def verify_user(db: AsyncSession, user: User, lid: str):
     """Mark user as verified and store their LID."""
+    old_lid = user.whatsapp_lid
     user.whatsapp_lid = lid
     user.verification_status = "verified"
     user.updated_at = datetime.utcnow()
     await db.commit()
     await db.refresh(user)
+    await invalidate_senders(user.whatsapp_number, old_lid, lid)
     print(f"✅ User {user.id} verified with LID {lid}")
     return user
 
@@ -54,9 +57,11 @@ async def verify_user(db: AsyncSession, user: User, lid: str):
 async def save_whatsapp_lid(db: AsyncSession, user: User, lid: str):
     """Permanently store the WAHA LID on the user so future lookups succeed."""
     if user.whatsapp_lid != lid:
+        old_lid = user.whatsapp_lid
         user.whatsapp_lid = lid
         user.updated_at = datetime.utcnow()
         await db.commit()
+        await invalidate_senders(user.whatsapp_number, old_lid, lid)
         print(f"✅ Stored WAHA LID '{lid}' for user ID={user.id}")
 
 
@@ -85,6 +90,9 @@ async def create_user(db: AsyncSession, user: UserCreate):
     await db.commit()
     await db.refresh(db_user)
 
+    # The number may have been cached as an unknown sender
+    await invalidate_unknown_senders()
+
     # Trigger verification message if phone number is provided and not "TBD"
     if db_user.whatsapp_number and db_user.whatsapp_number != "TBD":
         await send_verification_message(db_user.whatsapp_number)
@@ -100,6 +108,7 @@ async def delete_user(db: AsyncSession, user_id: int):
     if db_user:
         await db.delete(db_user)
         await db.commit()
+        await invalidate_senders(db_user.whatsapp_number, db_user.whatsapp_lid)
     
     return db_user
 
@@ -119,6 +128,7 @@ async def update_user(db: AsyncSession, user_id: int, user_data: dict):
         # Check if whatsapp_number is being changed
         new_number = user_data.get("whatsapp_number")
         number_changed = new_number and new_number != db_user.whatsapp_number
+        old_number, old_lid = db_user.whatsapp_number, db_user.whatsapp_lid
 
         for key, value in user_data.items():
             if hasattr(db_user, key):
@@ -133,6 +143,11 @@ async def update_user(db: AsyncSession, user_id: int, user_data: dict):
         await db.commit()
         await db.refresh(db_user)
 
+        # Cached sender snapshots carry the number, LID, niche and tone
+        await invalidate_senders(old_number, old_lid, db_user.whatsapp_number)
+        if number_changed:
+            await invalidate_unknown_senders()
+
         # Trigger verification message if number changed
         if number_changed and db_user.whatsapp_number != "TBD":
             await send_verification_message(db_user.whatsapp_number)
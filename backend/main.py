@@ -1,6 +1,7 @@
 # main.py or at the end of your main app file
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import make_asgi_app
 
 from app.auth.routes.auth_router import auth_router
 from app.user.routes.user_router import user_router
@@ -46,6 +47,9 @@ app.include_router(knowledge_router, prefix="/api/ai/knowledge", tags=["RAG Know
 app.include_router(media_router, prefix="/api/media", tags=["Media Storage"])
 app.include_router(dashboard_router, prefix="/api/dashboard", tags=["Dashboard"])
 
+# Prometheus metrics (queue depth, cache hit rates, latency histograms)
+app.mount("/metrics", make_asgi_app())
+
 
 @app.get("/")
 async def root():
@@ -0,0 +1,139 @@
+# tests/test_credential_cache.py
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("cachetools")
+pytest.importorskip("prometheus_client")
+
+from app.mcp.credential_cache import CredentialCache, PlatformCredentials
+
+
+def _cache(loader, **kw):
+    return CredentialCache(loader, **{"max_ttl": 600, "refresh_margin": 300, **kw})
+
+
+def test_concurrent_misses_share_one_load():
+    calls = 0
+
+    async def loader(user_id, platform):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return PlatformCredentials(account_id=1, access_token="tok")
+
+    cache = _cache(loader)
+
+    async def run():
+        results = await asyncio.gather(*(cache.get(1, "facebook") for _ in range(5)))
+        await cache.get(1, "facebook")
+        return results
+
+    assert {r.access_token for r in asyncio.run(run())} == {"tok"}
+    assert calls == 1
+
+
+def test_errors_reach_waiters_and_are_not_cached():
+    calls = 0
+
+    async def loader(user_id, platform):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("no account")
+
+    cache = _cache(loader)
+
+    async def run():
+        results = await asyncio.gather(*(cache.get(1, "facebook") for _ in range(3)), return_exceptions=True)
+        with pytest.raises(ValueError):
+            await cache.get(1, "facebook")
+        return results
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(run()))
+    assert calls == 2
+
+
+def test_cancelled_loader_makes_waiters_retry():
+    calls = 0
+
+    async def loader(user_id, platform):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05 if calls == 1 else 0)
+        return PlatformCredentials(account_id=1, access_token=f"tok{calls}")
+
+    cache = _cache(loader)
+
+    async def run():
+        first = asyncio.create_task(cache.get(1, "facebook"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get(1, "facebook"))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await waiter, first
+
+    creds, first = asyncio.run(run())
+    assert first.cancelled()
+    assert creds.access_token == "tok2"
+
+
+def test_entries_expire_before_the_token():
+    async def loader(user_id, platform):
+        return PlatformCredentials(
+            account_id=1, access_token="tok", token_expires_at=datetime.now() + timedelta(seconds=100)
+        )
+
+    cache = _cache(loader)
+    asyncio.run(cache.get(1, "facebook"))
+    # 100s left is inside the 300s refresh margin: nothing is cached
+    assert (1, "facebook") not in cache._entries
+
+
+def test_invalidation_reaches_other_processes():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    loads = 0
+
+    async def loader(user_id, platform):
+        nonlocal loads
+        loads += 1
+        return PlatformCredentials(account_id=1, access_token="old" if loads == 1 else "new")
+
+    # Two processes with their own caches, sharing Redis
+    api, worker = _cache(loader, versions=redis), _cache(loader, versions=redis)
+
+    async def run():
+        first = await worker.get(1, "facebook")
+        await api.invalidate(1, "facebook")
+        second = await worker.get(1, "facebook")
+        third = await worker.get(1, "facebook")
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert (first.access_token, second.access_token) == ("old", "new")
+    assert third is second
+    assert loads == 2
+
+
+def test_unverifiable_entries_are_reloaded():
+    class DownRedis:
+        async def get(self, key):
+            raise ConnectionError("redis down")
+
+    loads = 0
+
+    async def loader(user_id, platform):
+        nonlocal loads
+        loads += 1
+        return PlatformCredentials(account_id=1, access_token="tok")
+
+    cache = _cache(loader, versions=DownRedis())
+
+    async def run():
+        await cache.get(1, "facebook")
+        await cache.get(1, "facebook")
+
+    asyncio.run(run())
+    assert loads == 2
@@ -0,0 +1,84 @@
+# tests/test_embedding_service.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("openai")
+pytest.importorskip("prometheus_client")
+pytest.importorskip("pydantic_settings")
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.chat.services.embedding_service import EmbeddingService
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.requests: list[list[str]] = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def create(self, model: str, input: list[str]):
+        self.requests.append(list(input))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        # Out of order on purpose: results are matched by index
+        data = [SimpleNamespace(index=i, embedding=[float(len(t)), float(i)]) for i, t in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+def _service(**kw):
+    embeddings = FakeEmbeddings()
+    service = EmbeddingService(
+        client=SimpleNamespace(embeddings=embeddings),
+        redis=fakeredis.FakeAsyncRedis(),
+        **{"batch_size": 2, "concurrency": 2, "ttl": 60, **kw},
+    )
+    return service, embeddings
+
+
+def test_keys_depend_on_model_and_text():
+    service, _ = _service()
+    other = EmbeddingService(client=object(), model="other-model", redis=None)
+    assert service._key("hello") == service._key("hello")
+    assert service._key("hello") != service._key("hello ")
+    assert service._key("hello") != other._key("hello")
+    assert service._key("hello").startswith(f"emb:{service.model}:")
+
+
+def test_results_follow_input_order_with_duplicates():
+    service, embeddings = _service()
+    texts = ["aaa", "b", "aaa", "cc"]
+    vectors = asyncio.run(service.embed_many(texts))
+    assert [v[0] for v in vectors] == [3.0, 1.0, 3.0, 2.0]
+    # Duplicates are embedded once
+    assert sorted(t for r in embeddings.requests for t in r) == ["aaa", "b", "cc"]
+
+
+def test_misses_are_batched_with_bounded_concurrency():
+    service, embeddings = _service(batch_size=2, concurrency=2)
+    asyncio.run(service.embed_many([f"text {i}" for i in range(7)]))
+    assert [len(r) for r in embeddings.requests] == [2, 2, 2, 1]
+    assert embeddings.peak == 2
+
+
+def test_cached_embeddings_skip_the_api():
+    service, embeddings = _service()
+
+    async def run():
+        first = await service.embed_many(["a", "b"])
+        second = await service.embed_many(["b", "a", "c"])
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert embeddings.requests[-1] == ["c"]
+    assert np.allclose(second[0], first[1]) and np.allclose(second[1], first[0])
+
+
+def test_empty_input_makes_no_request():
+    service, embeddings = _service()
+    assert asyncio.run(service.embed_many([])) == []
+    assert embeddings.requests == []
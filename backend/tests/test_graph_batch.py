@@ -0,0 +1,79 @@
+# tests/test_graph_batch.py
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("cachetools")
+pytest.importorskip("prometheus_client")
+pytest.importorskip("pydantic_settings")
+
+from app.mcp import graph_http
+from app.mcp.graph_http import BATCH_LIMIT, batch_get, graph_batch
+from app.mcp.rate_limit import GraphRateGovernor
+
+BASE = "https://graph.facebook.com/v19.0"
+
+
+class FakeGraph:
+    """Batch endpoint: sub-requests to missing*/slow* fail, the rest echo their path."""
+
+    def __init__(self):
+        self.calls: list[list[dict]] = []
+
+    def reply(self, chunk: list[dict]) -> "httpx.Response":
+        items = []
+        for sub in chunk:
+            path = sub["relative_url"].split("?")[0]
+            if path.startswith("missing"):
+                items.append({"code": 400, "body": json.dumps({"error": {"message": f"{path} not found"}})})
+            elif path.startswith("slow"):
+                items.append(None)
+            else:
+                items.append({"code": 200, "body": json.dumps({"id": path})})
+        return httpx.Response(200, json=items)
+
+    async def send(self, method: str, url: str, **kwargs):
+        chunk = json.loads(kwargs["data"]["batch"])
+        self.calls.append(chunk)
+        return self.reply(chunk)
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    fake = FakeGraph()
+    monkeypatch.setattr(graph_http, "_send", fake.send)
+    monkeypatch.setattr(graph_http, "graph_governor", GraphRateGovernor())
+    return fake
+
+
+def test_requests_are_chunked_and_results_keep_their_order(graph):
+    requests = [batch_get(f"item{i}", {"fields": "id"}) for i in range(2 * BATCH_LIMIT + 20)]
+    results = asyncio.run(graph_batch(BASE, "tok", requests))
+    assert [len(c) for c in graph.calls] == [BATCH_LIMIT, BATCH_LIMIT, 20]
+    assert [r["id"] for r in results] == [f"item{i}" for i in range(len(requests))]
+    assert parse_qs(graph.calls[0][0]["relative_url"].split("?")[1]) == {"fields": ["id"]}
+
+
+def test_failed_sub_requests_map_to_graph_errors(graph):
+    requests = [batch_get("item1"), batch_get("missing1"), batch_get("slow1")]
+    results = asyncio.run(graph_batch(BASE, "tok", requests))
+    assert results[0] == {"id": "item1"}
+    assert results[1] == {"error": {"message": "missing1 not found"}}
+    assert "timed out" in results[2]["error"]["message"]
+
+
+def test_rejected_or_failed_batch_errors_every_item(graph):
+    rejection = {"error": {"message": "Invalid OAuth access token", "code": 190}}
+    graph.reply = lambda chunk: httpx.Response(400, json=rejection)
+    results = asyncio.run(graph_batch(BASE, "tok", [batch_get("a"), batch_get("b")]))
+    assert results == [rejection, rejection]
+
+    def broken(chunk):
+        raise httpx.ConnectError("connection refused")
+
+    graph.reply = broken
+    results = asyncio.run(graph_batch(BASE, "tok", [batch_get("a"), batch_get("b")]))
+    assert results == [{"error": {"message": "connection refused"}}] * 2
@@ -0,0 +1,112 @@
+# tests/test_history_compactor.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain_openai")
+pytest.importorskip("pydantic_settings")
+
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from app.chat.services import history_compactor
+from app.chat.services.history_compactor import (
+    TRUNCATION_MARKER, _elide_tool_results, _window_start, compact_node,
+)
+
+
+def _turn(i: int, payload: str = "x" * 2000):
+    return [
+        HumanMessage(content=f"post number {i}", id=f"h{i}"),
+        AIMessage(content="", id=f"a{i}", tool_calls=[{"name": "create_post", "args": {}, "id": f"c{i}"}]),
+        ToolMessage(content=payload, tool_call_id=f"c{i}", id=f"t{i}"),
+        AIMessage(content=f"done {i}", id=f"r{i}"),
+    ]
+
+
+def test_elided_results_fit_the_limit():
+    updates = _elide_tool_results(_turn(1), max_chars=500)
+    assert len(updates) == 1
+    assert updates[0].id == "t1"
+    assert len(updates[0].content) <= 500
+    assert updates[0].content.endswith(TRUNCATION_MARKER)
+
+
+def test_compacting_twice_changes_nothing_the_second_time():
+    history = _turn(1) + _turn(2)
+    updates = {m.id: m for m in _elide_tool_results(history, max_chars=500)}
+    compacted = [updates.get(m.id, m) for m in history]
+    assert _elide_tool_results(compacted, max_chars=500) == []
+
+
+def test_short_results_are_left_alone():
+    assert _elide_tool_results(_turn(1, payload="ok"), max_chars=500) == []
+
+
+def test_window_starts_at_a_human_turn():
+    history = [m for i in range(50) for m in _turn(i, payload="y" * 400)]
+    start = _window_start(history, keep_tokens=1000)
+    assert 0 < start < len(history)
+    assert isinstance(history[start], HumanMessage)
+
+
+def test_compact_node_is_idempotent_below_budget():
+    history = _turn(1) + _turn(2) + [HumanMessage(content="next", id="h3")]
+    first = asyncio.run(compact_node({"messages": history}))
+    assert [m.id for m in first["messages"]] == ["t1", "t2"]
+
+    by_id = {m.id: m for m in first["messages"]}
+    compacted = [by_id.get(m.id, m) for m in history]
+    assert asyncio.run(compact_node({"messages": compacted})) == {}
+
+
+def _apply(history, updates):
+    """What add_messages does with the node's update."""
+    removed = {m.id for m in updates.get("messages", []) if isinstance(m, RemoveMessage)}
+    replaced = {m.id: m for m in updates.get("messages", []) if not isinstance(m, RemoveMessage)}
+    return [replaced.get(m.id, m) for m in history if m.id not in removed]
+
+
+def test_long_thread_stays_within_budget(monkeypatch):
+    monkeypatch.setattr(history_compactor.settings, "AGENT_HISTORY_TOKEN_BUDGET", 8000)
+    monkeypatch.setattr(history_compactor.settings, "AGENT_HISTORY_KEEP_TOKENS", 4000)
+    summarized = []
+
+    async def fake_summarize(previous, messages):
+        summarized.append(len(messages))
+        return f"{previous or ''}+{len(messages)}"
+
+    monkeypatch.setattr(history_compactor, "summarize", fake_summarize)
+
+    async def run():
+        state = {"messages": [], "summary": None}
+        peak = 0
+        for i in range(500):
+            state["messages"] = state["messages"] + _turn(i)
+            updates = await compact_node(state)
+            state = {
+                "messages": _apply(state["messages"], updates),
+                "summary": updates.get("summary", state["summary"]),
+            }
+            peak = max(peak, count_tokens_approximately(state["messages"]))
+        return state, peak
+
+    state, peak = asyncio.run(run())
+    assert peak <= 8000 + count_tokens_approximately(_turn(0))
+    assert isinstance(state["messages"][0], HumanMessage)
+    assert state["messages"][-1].id == "r499"
+    assert state["summary"] and sum(summarized) + len(state["messages"]) == 500 * 4
+
+
+def test_failed_summary_keeps_the_history(monkeypatch):
+    monkeypatch.setattr(history_compactor.settings, "AGENT_HISTORY_TOKEN_BUDGET", 100)
+
+    async def broken(previous, messages):
+        raise ConnectionError("model unavailable")
+
+    monkeypatch.setattr(history_compactor, "summarize", broken)
+    history = [m for i in range(10) for m in _turn(i, payload="ok")]
+    updates = asyncio.run(compact_node({"messages": history}))
+    assert "summary" not in updates
+    assert not any(isinstance(m, RemoveMessage) for m in updates.get("messages", []))
@@ -0,0 +1,193 @@
+# tests/test_media_mirror.py
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("prometheus_client")
+pytest.importorskip("pydantic_settings")
+fakeredis = pytest.importorskip("fakeredis")
+
+from botocore.exceptions import ClientError
+
+from app.core import s3_service as s3_module
+from app.core.s3_service import S3Service
+from app.platforms import media_mirror
+from app.platforms.media_mirror import mirror_whatsapp_media
+from app.platforms.whatsapp_downloader import MediaTooLargeError, UnsupportedMediaError
+
+PART = 8
+
+
+class FakeS3:
+    """The boto3 calls put_stream makes, recording what was sent."""
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self.parts: list[bytes] = []
+        self.uploaded = 0
+        self.aborted = False
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body
+        self.uploaded += len(Body)
+
+    def create_multipart_upload(self, Bucket, Key, ContentType):
+        return {"UploadId": "u1"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.parts.append(Body)
+        self.uploaded += len(Body)
+        return {"ETag": f"e{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.objects[Key] = b"".join(self.parts)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted = True
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self.objects[Key] = self.objects[CopySource["Key"]]
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    service = S3Service()
+    service.client = FakeS3()
+    service.PART_SIZE = PART
+    monkeypatch.setattr(s3_module, "s3_service", service)
+    monkeypatch.setattr(media_mirror, "s3_service", service)
+    monkeypatch.setattr(media_mirror, "redis_client", fakeredis.FakeAsyncRedis(decode_responses=True))
+    return service
+
+
+def test_large_stream_is_uploaded_in_parts_without_buffering(s3):
+    read = 0
+    peak_held = 0
+
+    async def source():
+        nonlocal read, peak_held
+        for i in range(20):
+            chunk = bytes([i]) * 3
+            read += len(chunk)
+            # Bytes taken from the source but not yet handed to S3
+            peak_held = max(peak_held, read - s3.client.uploaded)
+            yield chunk
+
+    stored = asyncio.run(s3.put_stream(source(), "image/png", "media", content_addressed=True))
+    assert [len(p) for p in s3.client.parts] == [PART] * 7 + [4]
+    assert peak_held <= 2 * PART + 3
+    assert stored.size == 60 and stored.key == f"media/{stored.sha256}.png"
+    assert list(s3.client.objects) == [stored.key]
+
+
+def test_identical_small_content_is_stored_once(s3):
+    async def source():
+        yield b"abc"
+
+    async def run():
+        first = await s3.put_stream(source(), "image/jpeg", "media", content_addressed=True)
+        second = await s3.put_stream(source(), "image/jpeg", "media", content_addressed=True)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert (first.deduplicated, second.deduplicated) == (False, True)
+    assert first.key == second.key
+    assert s3.client.uploaded == 3
+
+
+class FakeMedia:
+    def __init__(self, mime_type: str, chunks: list[bytes]):
+        self.headers = {"content-type": mime_type}
+        self.chunks = chunks
+        self.read = 0
+
+    async def aiter_bytes(self):
+        for chunk in self.chunks:
+            self.read += len(chunk)
+            yield chunk
+
+
+def _serve(monkeypatch, media: FakeMedia):
+    @asynccontextmanager
+    async def fake_open(media_id):
+        yield media
+
+    monkeypatch.setattr(media_mirror, "open_whatsapp_media", fake_open)
+
+
+def test_unsupported_media_is_rejected_before_download(s3, monkeypatch):
+    media = FakeMedia("image/heic", [b"x" * 4])
+    _serve(monkeypatch, media)
+    with pytest.raises(UnsupportedMediaError):
+        asyncio.run(mirror_whatsapp_media("m1", 1))
+    assert media.read == 0
+    assert s3.client.objects == {}
+
+
+def test_oversized_media_aborts_the_upload(s3, monkeypatch):
+    _serve(monkeypatch, FakeMedia("image/png", [b"x" * PART] * 4))
+    with pytest.raises(MediaTooLargeError):
+        asyncio.run(mirror_whatsapp_media("m1", 1, max_bytes=3 * PART))
+    assert s3.client.aborted
+    assert s3.client.objects == {}
+
+
+def test_mirrored_media_is_reused_by_id(s3, monkeypatch):
+    media = FakeMedia("image/png", [b"abc"])
+    _serve(monkeypatch, media)
+
+    async def run():
+        first = await mirror_whatsapp_media("m1", 1)
+        second = await mirror_whatsapp_media("m1", 1)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.url == second.url and second.sha256 == first.sha256
+    assert media.read == 3
+
+
+def test_handler_replies_instead_of_passing_unusable_media(s3, monkeypatch):
+    from types import SimpleNamespace
+
+    from app.chat.services import whatsapp_handler
+
+    sent = []
+    user = SimpleNamespace(id=1, verification_status="verified", whatsapp_number="1", niche=None, ai_tone=None)
+
+    async def resolve(sender_full, db, payload):
+        return user, None
+
+    async def send_text(chat_id, text):
+        sent.append(text)
+
+    class Scheduler:
+        async def submit(self, turn):
+            raise AssertionError("the agent must not see unusable media")
+
+    monkeypatch.setattr(whatsapp_handler, "_resolve_sender", resolve)
+    monkeypatch.setattr(whatsapp_handler, "send_text", send_text)
+    _serve(monkeypatch, FakeMedia("image/png", [b"x" * PART] * 4))
+    monkeypatch.setattr(whatsapp_handler.settings, "WAHA_MEDIA_MAX_IMAGE_BYTES", PART)
+
+    def event(mimetype):
+        media = {"id": "m1", "url": "http://localhost:3000/api/files/m1", "mimetype": mimetype}
+        return {"payload": {"from": "1@c.us", "body": "post this", "hasMedia": True, "media": media}}
+
+    async def run():
+        heic = await whatsapp_handler.handle_waha_event(Scheduler(), event("image/heic"), db=None)
+        large = await whatsapp_handler.handle_waha_event(Scheduler(), event("image/png"), db=None)
+        return heic, large
+
+    heic, large = asyncio.run(run())
+    assert heic["status"] == large["status"] == "media_rejected"
+    assert "image/heic" in heic["reason"]
+    assert len(sent) == 2
@@ -0,0 +1,80 @@
+# tests/test_rate_limit.py
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("cachetools")
+pytest.importorskip("prometheus_client")
+pytest.importorskip("pydantic_settings")
+
+from app.mcp import rate_limit
+from app.mcp.rate_limit import GraphRateGovernor, TokenBucket, _rate_factor
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(t=1000.0)
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: now.t))
+    return now
+
+
+def test_bucket_serves_a_burst_then_waits(clock):
+    bucket = TokenBucket(rate=2, burst_seconds=5)
+    assert bucket.capacity == 10
+    assert all(bucket.reserve(1) == 0 for _ in range(10))
+    assert bucket.reserve(1) == pytest.approx(0.5)
+    clock.t += 0.5
+    assert bucket.reserve(1) == pytest.approx(0.5)
+
+
+def test_large_batch_drains_the_bucket_without_debt(clock):
+    bucket = TokenBucket(rate=2, burst_seconds=5)
+    assert bucket.reserve(50) == 0
+    assert bucket.reserve(1) == pytest.approx(0.5)
+
+
+def test_refund_undoes_a_reservation(clock):
+    bucket = TokenBucket(rate=2, burst_seconds=5)
+    bucket.reserve(10)
+    bucket.refund(10)
+    assert bucket.reserve(10) == 0
+
+
+def test_rate_slows_down_with_reported_usage(clock):
+    assert _rate_factor(30) == 1.0
+    assert _rate_factor(75) == pytest.approx(0.525)
+    assert _rate_factor(100) == pytest.approx(0.05)
+    bucket = TokenBucket(rate=4, burst_seconds=5)
+    bucket.adapt(100)
+    assert bucket.rate == pytest.approx(0.2)
+
+
+def test_governor_gives_up_beyond_max_wait(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "GRAPH_THROTTLE_MAX_WAIT_SECONDS", 1.0)
+    governor = GraphRateGovernor()
+    scope = ("instagram", "ig1")
+    governor._bucket(scope).block(5)
+    assert governor.reserve(scope) is None
+    # The app bucket got its token back
+    assert governor._app.tokens == governor._app.capacity
+    assert governor.reserve(("page", "p1")) == 0
+
+
+def test_governor_blocks_scope_from_business_usage_header(clock):
+    governor = GraphRateGovernor()
+    scope = ("page", "p1")
+    header = {"p1": [{"type": "pages", "call_count": 96, "estimated_time_to_regain_access": 2}]}
+    governor.observe(scope, {"x-business-use-case-usage": json.dumps(header)})
+    bucket = governor._bucket(scope)
+    assert bucket.usage == 96
+    assert bucket.blocked_until == clock.t + 120
+    # Other pages are unaffected
+    assert governor.reserve(("page", "p2")) == 0
+
+
+def test_app_throttle_code_blocks_every_scope(clock):
+    governor = GraphRateGovernor()
+    governor.throttled(("page", "p1"), code=4, attempt=0)
+    assert governor._app.blocked_until > clock.t
+    assert governor._bucket(("page", "p1")).blocked_until == 0
@@ -0,0 +1,94 @@
+# tests/test_semantic_cache.py
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("prometheus_client")
+pytest.importorskip("pydantic_settings")
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.chat.services import semantic_cache
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch):
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(semantic_cache, "redis_client", fake)
+    monkeypatch.setattr(semantic_cache.settings, "GEN_CACHE_SIMILARITY", 0.95)
+    return fake
+
+
+def _vector(angle: float) -> list[float]:
+    # Unnormalized on purpose; cosine(angle a, angle b) == cos(a - b)
+    return [3 * np.cos(angle), 3 * np.sin(angle), 0.0]
+
+
+async def _cache(topic_vector, platforms=("instagram",), tone="casual", niche=None):
+    result = await semantic_cache.lookup(1, topic_vector, list(platforms), tone, niche)
+    await semantic_cache.store(1, result, "topic", list(platforms), tone, niche, [{"caption": "cached"}])
+
+
+def test_vectors_are_stored_unit_length_and_round_trip():
+    v = semantic_cache._normalize(_vector(0.3))
+    assert np.linalg.norm(v) == pytest.approx(1.0)
+    assert np.allclose(semantic_cache._decode(semantic_cache._encode(v)), v)
+
+
+def test_similar_topic_hits_and_dissimilar_misses():
+    async def run():
+        await _cache(_vector(0.0))
+        near = await semantic_cache.lookup(1, _vector(0.1), ["instagram"], "casual", None)
+        far = await semantic_cache.lookup(1, _vector(0.5), ["instagram"], "casual", None)
+        return near, far
+
+    near, far = asyncio.run(run())
+    assert near.hit and near.suggestions == [{"caption": "cached"}]
+    assert near.similarity == pytest.approx(np.cos(0.1), abs=1e-5)
+    assert not far.hit and far.suggestions is None
+
+
+def test_best_match_wins():
+    async def run():
+        await _cache(_vector(0.3))
+        await _cache(_vector(0.05))
+        return await semantic_cache.lookup(1, _vector(0.0), ["instagram"], "casual", None)
+
+    assert asyncio.run(run()).similarity == pytest.approx(np.cos(0.05), abs=1e-5)
+
+
+def test_scope_must_match_ignoring_case_and_order():
+    async def run():
+        await _cache(_vector(0.0), platforms=("instagram", "facebook"), tone="Casual")
+        same = await semantic_cache.lookup(1, _vector(0.0), ["Facebook ", "instagram"], "casual", None)
+        other_tone = await semantic_cache.lookup(1, _vector(0.0), ["instagram", "facebook"], "formal", None)
+        other_user = await semantic_cache.lookup(2, _vector(0.0), ["instagram", "facebook"], "casual", None)
+        return same, other_tone, other_user
+
+    same, other_tone, other_user = asyncio.run(run())
+    assert same.hit
+    assert not other_tone.hit
+    assert not other_user.hit
+
+
+def test_bypass_skips_the_lookup_but_keeps_the_vector():
+    async def run():
+        await _cache(_vector(0.0))
+        return await semantic_cache.lookup(1, _vector(0.0), ["instagram"], "casual", None, bypass=True)
+
+    result = asyncio.run(run())
+    assert not result.hit
+    assert np.linalg.norm(result.vector) == pytest.approx(1.0)
+
+
+def test_invalidation_and_hit_rate():
+    async def run():
+        await _cache(_vector(0.0))  # miss
+        await semantic_cache.lookup(1, _vector(0.0), ["instagram"], "casual", None)  # hit
+        await semantic_cache.invalidate_generation_cache(1)
+        after = await semantic_cache.lookup(1, _vector(0.0), ["instagram"], "casual", None)  # miss
+        return after, await semantic_cache.hit_rate(1)
+
+    after, stats = asyncio.run(run())
+    assert not after.hit
+    assert stats == {"hits": 1, "misses": 2, "hit_rate": 0.333}
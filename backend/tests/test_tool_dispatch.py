@@ -0,0 +1,74 @@
+# tests/test_tool_dispatch.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp")
+pytest.importorskip("langchain_mcp_adapters")
+pytest.importorskip("langgraph")
+
+from app.chat.services import agent_service, tool_dispatch
+from app.chat.services.tool_dispatch import ToolNotFoundError, call_tool, invoke_tool, parse_tool_content
+from app.mcp import server
+
+
+class McpTool:
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: list[dict] = []
+
+    async def ainvoke(self, arguments: dict):
+        self.calls.append(arguments)
+        return [{"type": "text", "text": '{"success": true, "via": "mcp"}'}]
+
+
+class Registry:
+    def __init__(self, *tools):
+        self.tools = {t.name: t for t in tools}
+
+    async def get_tool(self, name):
+        return self.tools.get(name)
+
+
+@pytest.fixture
+def tools(monkeypatch):
+    async def local_post(user_id: int):
+        return {"success": True, "via": "inprocess", "user_id": user_id}
+
+    remote = McpTool("remote_only")
+    shadowed = McpTool("local_post")
+    monkeypatch.setitem(server.local_tools, "local_post", local_post)
+    monkeypatch.setattr(agent_service, "tool_registry", Registry(remote, shadowed))
+    return remote, shadowed
+
+
+def test_local_tools_skip_mcp(tools):
+    remote, shadowed = tools
+    assert asyncio.run(call_tool("local_post", {"user_id": 3})) == {"success": True, "via": "inprocess", "user_id": 3}
+    assert shadowed.calls == []
+
+
+def test_other_tools_go_through_mcp(tools):
+    remote, _ = tools
+    assert asyncio.run(call_tool("remote_only", {"x": 1})) == {"success": True, "via": "mcp"}
+    assert remote.calls == [{"x": 1}]
+
+
+def test_inprocess_can_be_turned_off(tools, monkeypatch):
+    _, shadowed = tools
+    monkeypatch.setattr(tool_dispatch.settings, "MCP_INPROCESS_TOOLS", False)
+    assert asyncio.run(call_tool("local_post", {"user_id": 3}))["via"] == "mcp"
+    assert shadowed.calls == [{"user_id": 3}]
+
+
+def test_unknown_tools(tools):
+    with pytest.raises(ToolNotFoundError):
+        asyncio.run(call_tool("nope", {}))
+    assert asyncio.run(invoke_tool("nope", {})) == {"success": False, "error": "Tool nope not found"}
+
+
+def test_parse_tool_content():
+    assert parse_tool_content('{"a": 1}') == {"a": 1}
+    assert parse_tool_content("plain") == {"success": True, "raw": "plain"}
+    assert parse_tool_content("")["success"] is False
+    assert parse_tool_content({"a": 1}) == {"a": 1}
@@ -0,0 +1,122 @@
+# tests/test_tool_registry.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("cachetools")
+pytest.importorskip("langchain_core")
+
+from app.chat.services.tool_registry import ToolRegistry
+
+
+class FakeClient:
+    def __init__(self, *names):
+        self.names = list(names)
+        self.calls = 0
+
+    async def get_tools(self):
+        self.calls += 1
+        return [SimpleNamespace(name=n) for n in self.names]
+
+
+def test_tools_are_listed_once_and_sorted():
+    client = FakeClient("b", "a")
+    registry = ToolRegistry(client)
+
+    async def run():
+        first = await registry.get_tools()
+        await registry.get_tools()
+        return [t.name for t in first]
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert client.calls == 1
+
+
+def test_unknown_tool_relists_once_then_is_remembered():
+    client = FakeClient("a")
+    registry = ToolRegistry(client)
+
+    async def run():
+        assert await registry.get_tool("nope") is None
+        assert await registry.get_tool("nope") is None
+
+    asyncio.run(run())
+    assert client.calls == 2
+
+
+def test_tool_added_on_the_server_is_found_after_a_miss():
+    client = FakeClient("a")
+    registry = ToolRegistry(client)
+
+    async def run():
+        await registry.get_tools()
+        client.names.append("b")
+        return await registry.get_tool("b")
+
+    assert asyncio.run(run()).name == "b"
+
+
+def test_failed_listing_is_retried_on_the_next_call():
+    client = FakeClient("a")
+    registry = ToolRegistry(client)
+    listed = client.get_tools
+
+    async def down():
+        client.calls += 1
+        raise ConnectionError("server did not start")
+
+    client.get_tools = down
+
+    async def run():
+        first = await registry.get_tools()
+        client.get_tools = listed
+        return first, await registry.get_tools()
+
+    first, second = asyncio.run(run())
+    assert first == [] and [t.name for t in second] == ["a"]
+    assert client.calls == 2
+
+
+def test_bound_model_is_reused_until_reload():
+    client = FakeClient("a")
+    registry = ToolRegistry(client)
+    binds = []
+
+    class Model:
+        def bind_tools(self, tools):
+            binds.append([t.name for t in tools])
+            return object()
+
+    model = Model()
+
+    async def run():
+        first = await registry.bind(model)
+        assert await registry.bind(model) is first
+        client.names.append("b")
+        await registry.reload()
+        return await registry.bind(model)
+
+    asyncio.run(run())
+    assert binds == [["a"], ["a", "b"]]
+    assert client.calls == 2
+
+
+def test_local_tool_source_lists_and_runs_tools_in_process(monkeypatch):
+    pytest.importorskip("mcp")
+    from app.chat.services.tool_dispatch import LocalToolSource
+    from app.mcp import server
+
+    async def fake_verify(user_id: int):
+        return {"success": True, "user_id": user_id}
+
+    monkeypatch.setitem(server.local_tools, "verify_instagram_connection", fake_verify)
+
+    async def run():
+        tools = {t.name: t for t in await LocalToolSource().get_tools()}
+        return tools, await tools["verify_instagram_connection"].ainvoke({"user_id": 7})
+
+    tools, result = asyncio.run(run())
+    assert set(tools) == set(server.local_tools)
+    assert tools["verify_instagram_connection"].args == {"user_id": {"title": "User Id", "type": "integer"}}
+    assert result == '{"success": true, "user_id": 7}'
@@ -0,0 +1,56 @@
+# tests/test_turn_mailbox.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("pydantic_settings")
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from app.chat.services import turn_mailbox
+from app.chat.services.agent_turn import AgentTurn
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(turn_mailbox, "redis_client", fake)
+    monkeypatch.setattr(turn_mailbox, "_RELEASE", fake.register_script(turn_mailbox._RELEASE.script))
+    return fake
+
+
+def _turn(content: str) -> AgentTurn:
+    return AgentTurn(user_id=1, thread_id="t1", chat_id="t1@c.us", content=content)
+
+
+def test_only_the_first_push_starts_a_task(redis):
+    async def run():
+        return [await turn_mailbox.push(_turn(c)) for c in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == [True, False, False]
+
+
+def test_take_returns_turns_in_arrival_order(redis):
+    async def run():
+        for c in ("a", "b"):
+            await turn_mailbox.push(_turn(c))
+        taken = await turn_mailbox.take("t1")
+        return [t.content for t in taken], await turn_mailbox.take("t1")
+
+    assert asyncio.run(run()) == (["a", "b"], [])
+
+
+def test_release_keeps_the_thread_busy_while_turns_wait(redis):
+    async def run():
+        await turn_mailbox.push(_turn("a"))
+        await turn_mailbox.take("t1")
+        # Arrives while "a" runs: joins the running thread
+        started = await turn_mailbox.push(_turn("b"))
+        more = await turn_mailbox.release("t1")
+        await turn_mailbox.take("t1")
+        idle = await turn_mailbox.release("t1")
+        restarted = await turn_mailbox.push(_turn("c"))
+        return started, more, idle, restarted
+
+    assert asyncio.run(run()) == (False, True, False, True)
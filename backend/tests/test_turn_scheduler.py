@@ -0,0 +1,72 @@
+# tests/test_turn_scheduler.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("prometheus_client")
+pytest.importorskip("pydantic_settings")
+
+from app.chat.services.agent_turn import AgentTurn
+from app.chat.services.turn_scheduler import TurnScheduler, coalesce_turns
+
+
+def _turn(content: str, thread: str = "t1", **kw) -> AgentTurn:
+    return AgentTurn(user_id=1, thread_id=thread, chat_id=f"{thread}@c.us", content=content, **kw)
+
+
+def test_single_turn_is_returned_as_is():
+    turn = _turn("hi")
+    assert coalesce_turns([turn]) is turn
+
+
+def test_coalesced_turn_joins_messages_in_order_with_latest_profile():
+    merged = coalesce_turns([
+        _turn("first", niche="food"),
+        _turn(""),
+        _turn("second", niche="travel", ai_tone="casual"),
+    ])
+    assert merged.content == "first\n\nsecond"
+    assert (merged.niche, merged.ai_tone) == ("travel", "casual")
+
+
+def test_messages_arriving_while_busy_share_one_turn():
+    seen: list[str] = []
+
+    async def runner(turn: AgentTurn) -> dict:
+        seen.append(turn.content)
+        await asyncio.sleep(0.01)
+        return {"status": "ok", "content": turn.content}
+
+    async def run():
+        scheduler = TurnScheduler(runner, max_concurrency=4)
+        first = asyncio.create_task(scheduler.submit(_turn("a")))
+        await asyncio.sleep(0)
+        rest = [asyncio.create_task(scheduler.submit(_turn(c))) for c in ("b", "c")]
+        results = await asyncio.gather(first, *rest)
+        await scheduler.aclose()
+        return results
+
+    results = asyncio.run(run())
+    assert seen == ["a", "b\n\nc"]
+    assert results[1] is results[2]
+
+
+def test_threads_run_in_parallel_up_to_the_limit():
+    running = 0
+    peak = 0
+
+    async def runner(turn: AgentTurn) -> dict:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"status": "ok"}
+
+    async def run():
+        scheduler = TurnScheduler(runner, max_concurrency=2)
+        await asyncio.gather(*(scheduler.submit(_turn("x", thread=f"t{i}")) for i in range(5)))
+
+    asyncio.run(run())
+    assert peak == 2
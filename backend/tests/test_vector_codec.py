@@ -0,0 +1,20 @@
+# tests/test_vector_codec.py
+import struct
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("asyncpg")
+
+from app.core.database import decode_vector, encode_vector
+
+
+def test_round_trip():
+    vector = [0.5, -1.25, 3.0]
+    assert decode_vector(encode_vector(vector)) == vector
+
+
+def test_pgvector_wire_layout():
+    data = encode_vector([1.0, 2.0])
+    assert struct.unpack(">HH", data[:4]) == (2, 0)
+    assert len(data) == 4 + 2 * 4
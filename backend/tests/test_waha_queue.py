@@ -0,0 +1,143 @@
+# tests/test_waha_queue.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+pytest.importorskip("pydantic_settings")
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.chat.services import waha_queue, webhook_dedup
+from app.chat.services.waha_queue import CONSUMER_GROUP, WahaQueueConsumer, enqueue_waha_event
+
+EVENT = {"event": "message", "session": "default", "payload": {"id": "m1", "from": "1@c.us", "body": "hi"}}
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(waha_queue, "redis_client", fake)
+    monkeypatch.setattr(webhook_dedup, "redis_client", fake)
+    monkeypatch.setattr(waha_queue.settings, "WAHA_QUEUE_STREAM", "test:events")
+    monkeypatch.setattr(waha_queue.settings, "WAHA_QUEUE_CLAIM_IDLE_MS", 0)
+    monkeypatch.setattr(waha_queue.settings, "WAHA_QUEUE_MAX_DELIVERIES", 2)
+    return fake
+
+
+async def _deliver(consumer: WahaQueueConsumer, first: bool):
+    """One delivery: a fresh read, or a takeover of the pending entry."""
+    if first:
+        response = await waha_queue.redis_client.xreadgroup(
+            CONSUMER_GROUP, "c1", {consumer.stream: ">"}, count=1
+        )
+        entries = response[0][1]
+    else:
+        entries = await consumer._claim_stale("c2")
+    for entry_id, fields in entries:
+        await consumer._process("c1", entry_id, fields)
+    return len(entries)
+
+
+async def _setup(handler) -> WahaQueueConsumer:
+    consumer = WahaQueueConsumer(handler, concurrency=1)
+    await waha_queue.redis_client.xgroup_create(consumer.stream, CONSUMER_GROUP, id="0", mkstream=True)
+    await enqueue_waha_event(EVENT)
+    return consumer
+
+
+def test_transient_failure_is_redelivered_then_dead_lettered(redis):
+    calls = 0
+
+    async def handler(data):
+        nonlocal calls
+        calls += 1
+        raise ConnectionError("database unavailable")
+
+    async def run():
+        consumer = await _setup(handler)
+        await _deliver(consumer, first=True)
+        pending_after_first = (await redis.xpending(consumer.stream, CONSUMER_GROUP))["pending"]
+        await _deliver(consumer, first=False)
+        return (
+            pending_after_first,
+            (await redis.xpending(consumer.stream, CONSUMER_GROUP))["pending"],
+            await redis.xrange(consumer.dead_letter_stream),
+        )
+
+    pending_after_first, pending_after_second, dead = asyncio.run(run())
+    assert calls == 2
+    assert pending_after_first == 1
+    assert pending_after_second == 0
+    assert len(dead) == 1 and "database unavailable" in dead[0][1]["error"]
+
+
+def test_retry_status_is_redelivered(redis):
+    results = [{"status": "retry", "error": "checkpointer down"}, {"status": "ok"}]
+
+    async def handler(data):
+        return results.pop(0)
+
+    async def run():
+        consumer = await _setup(handler)
+        await _deliver(consumer, first=True)
+        await _deliver(consumer, first=False)
+        return await redis.xlen(consumer.stream), await redis.exists(consumer.dead_letter_stream)
+
+    assert asyncio.run(run()) == (0, 0)
+    assert results == []
+
+
+def test_other_errors_are_acknowledged(redis):
+    async def handler(data):
+        raise ValueError("bad payload")
+
+    async def run():
+        consumer = await _setup(handler)
+        await _deliver(consumer, first=True)
+        return await redis.xlen(consumer.stream), await _deliver(consumer, first=False)
+
+    assert asyncio.run(run()) == (0, 0)
+
+
+def test_handled_event_is_not_run_again_after_a_lost_ack(redis):
+    calls = 0
+
+    async def handler(data):
+        nonlocal calls
+        calls += 1
+        return {"status": "ok"}
+
+    async def run():
+        consumer = await _setup(handler)
+
+        async def lost_ack(entry_id):
+            pass
+
+        consumer._ack = lost_ack
+        await _deliver(consumer, first=True)
+        del consumer._ack
+        await _deliver(consumer, first=False)
+        return await redis.xlen(consumer.stream)
+
+    assert asyncio.run(run()) == 0
+    assert calls == 1
+
+
+def test_stop_waits_for_in_flight_events(redis):
+    finished = []
+
+    async def handler(data):
+        await asyncio.sleep(0.05)
+        finished.append(data["payload"]["id"])
+        return {"status": "ok"}
+
+    async def run():
+        consumer = WahaQueueConsumer(handler, concurrency=1)
+        await consumer.start()
+        await enqueue_waha_event(EVENT)
+        await asyncio.sleep(0.02)
+        await consumer.stop()
+        return await redis.xlen(consumer.stream)
+
+    assert asyncio.run(run()) == 0
+    assert finished == ["m1"]